@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Synthetic-cohort benchmark for core_fastq_workflow.py
+
+Builds a fake cancer dir (sample_list.txt + tiny FASTQs / .sra / .sralite and
+deliberately broken files), then times the core phases:
+
+  parse_sample_list → inventory → plan_actions → write_status_snapshot
+
+Each phase is timed "cold" (empty fingerprint cache, file pages evicted with
+posix_fadvise where the OS allows it) and "warm" (cache populated, pages hot).
+Results go to JSON so runs can be compared across commits:
+
+  python bench_fastq_core.py --samples 5000 --out bench_$(git rev-parse --short HEAD).json
+  python bench_fastq_core.py --samples 5000 --compare bench_old.json
+
+--project-runs 50000 additionally builds a multi-cohort project and compares
+the single-cohort API (SRRInfo dicts kept for every cohort) with RunTable:
+wall time, retained/peak traced memory and GC collections.
+
+The cohort is rebuilt only when --dir is missing or --rebuild is given, so
+repeated runs against the same --dir measure the same tree. Only directories
+the bench created (they carry a .poseidon_bench marker) are ever deleted; an
+existing non-empty --dir without the marker is refused.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import core_fastq_workflow as core
+
+# Per-run layout mix (weights); one of these is drawn for every SRR
+LAYOUTS = {
+    "paired_done": 40,
+    "single_done": 10,
+    "sra_only": 15,
+    "sralite_only": 5,
+    "missing": 10,
+    "r2_missing": 5,
+    "broken_gzip": 5,      # truncated gzip stream
+    "not_fastq": 5,        # valid gzip, garbage content
+    "empty_fastq": 5,      # 0-byte R1/R2
+}
+
+FASTQ_RECORD = b"@r{}\nACGTACGTACGTACGTACGT\n+\nIIIIIIIIIIIIIIIIIIII\n"
+MARKER = ".poseidon_bench"
+
+
+def _fastq_bytes(records: int) -> bytes:
+    return gzip.compress(b"".join(FASTQ_RECORD.replace(b"{}", str(i).encode())
+                                  for i in range(records)), compresslevel=1)
+
+
+def reset_bench_dir(path: Path) -> None:
+    """Empty `path` for a rebuild; refuses directories the bench did not create."""
+    if path.exists():
+        if not (path / MARKER).exists() and (not path.is_dir() or any(path.iterdir())):
+            raise ValueError(f"{path} exists and has no {MARKER} marker; "
+                             "refusing to delete it (pick another --dir)")
+        shutil.rmtree(path)
+    path.mkdir(parents=True)
+    (path / MARKER).write_text("synthetic tree written by bench_fastq_core.py; safe to delete\n")
+
+
+def build_cohort(cancer_dir: Path, samples: int, max_runs: int = 3, records: int = 4,
+                 seed: int = 1, acc_start: int = 1000000) -> Dict[str, int]:
+    """Write a synthetic cohort; returns how many runs got each layout."""
+    rng = random.Random(seed)
+    reset_bench_dir(cancer_dir)
+    good = _fastq_bytes(records)
+    broken = good[: max(10, len(good) // 2)]
+    junk = gzip.compress(b"this is not a fastq file\n" * 4)
+    names, weights = zip(*LAYOUTS.items())
+    counts = {k: 0 for k in names}
+    lines: List[str] = []
+    acc = acc_start
+    for i in range(samples):
+        runs = []
+        for _ in range(rng.randint(1, max_runs)):
+            acc += 1
+            srr = f"SRR{acc}"
+            layout = rng.choices(names, weights)[0]
+            counts[layout] += 1
+            runs.append(srr)
+            r1, r2 = cancer_dir / f"{srr}_1.fastq.gz", cancer_dir / f"{srr}_2.fastq.gz"
+            if layout == "paired_done":
+                r1.write_bytes(good)
+                r2.write_bytes(good)
+            elif layout == "single_done":
+                r1.write_bytes(good)
+            elif layout == "sra_only":
+                (cancer_dir / f"{srr}.sra").write_bytes(b"\0" * 512)
+            elif layout == "sralite_only":
+                (cancer_dir / f"{srr}.sralite").write_bytes(b"\0" * 256)
+            elif layout == "r2_missing":
+                # R1 present, R2 never written: looks paired in sample_list
+                r1.write_bytes(good)
+                (cancer_dir / f"{srr}.sra").write_bytes(b"\0" * 512)
+            elif layout == "broken_gzip":
+                r1.write_bytes(broken)
+                r2.write_bytes(good)
+            elif layout == "not_fastq":
+                r1.write_bytes(junk)
+                r2.write_bytes(junk)
+            elif layout == "empty_fastq":
+                r1.write_bytes(b"")
+                r2.write_bytes(b"")
+        r1s = ",".join(f"{s}_1.fastq.gz" for s in runs)
+        r2s = ",".join(f"{s}_2.fastq.gz" for s in runs)
+        lines.append(f"S{i:06d}\t{r1s}\t{r2s}")
+    (cancer_dir / "sample_list.txt").write_text("\n".join(lines) + "\n")
+    return counts
+
+
+def evict_page_cache(cancer_dir: Path) -> bool:
+    """Best-effort: ask the kernel to drop cached pages of the cohort files."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    with os.scandir(cancer_dir) as it:
+        for e in it:
+            if not e.is_file():
+                continue
+            try:
+                fd = os.open(e.path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+    return True
+
+
+def _time(fn: Callable[[], object], repeat: int,
+          setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"min": min(runs), "median": statistics.median(runs), "runs": len(runs)}
+
+
+def run_bench(cancer_dir: Path, repeat: int, workers: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    sample_list = cancer_dir / "sample_list.txt"
+    cache_path = cancer_dir / core.CACHE_NAME
+    samples = core.parse_sample_list(sample_list)
+    srrs = [s for v in samples.values() for s in v]
+
+    def inv_with_cache() -> Dict[str, core.SRRInfo]:
+        cache = core.FingerprintCache.open(cancer_dir)
+        try:
+            return core.inventory(cancer_dir, srrs, workers=workers, cache=cache)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def make_cold() -> None:
+        cache_path.unlink(missing_ok=True)
+        evict_page_cache(cancer_dir)
+
+    inv = core.inventory(cancer_dir, srrs, workers=workers)
+    actions = core.plan_actions(inv)
+    phases: Dict[str, Callable[[], object]] = {
+        "parse_sample_list": lambda: core.parse_sample_list(sample_list),
+        "inventory": inv_with_cache,
+        "inventory_nocache": lambda: core.inventory(cancer_dir, srrs, workers=workers),
+        "plan_actions": lambda: core.plan_actions(inv),
+        "write_status_snapshot": lambda: core.write_status_snapshot(cancer_dir, samples, inv),
+    }
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, fn in phases.items():
+        print(f"  {name:<24}", end="", flush=True)
+        c = _time(fn, repeat, setup=make_cold)
+        fn()  # populate cache / page cache before the warm runs
+        w = _time(fn, repeat)
+        results[name] = {"cold": c, "warm": w}
+        print(f"cold {c['median'] * 1000:9.1f} ms   warm {w['median'] * 1000:9.1f} ms")
+    results["_counts"] = {"samples": len(samples), "srrs": len(srrs), "actions": len(actions)}
+    return results
+
+
+def build_project(root: Path, runs: int, cohort_runs: int, seed: int = 1) -> int:
+    """<root>/Tumors/Synth_NN cohorts totalling about `runs` runs (2 per sample on average)."""
+    reset_bench_dir(root)
+    n = max(1, -(-runs // cohort_runs))
+    for k in range(n):
+        build_cohort(root / "Tumors" / f"Synth_{k:02d}", cohort_runs // 2, max_runs=3,
+                     seed=seed + k, acc_start=10000000 + k * cohort_runs * 2)
+    return n
+
+
+def _project_dicts(cohorts: List[Path], workers: int) -> List[tuple]:
+    """Single-cohort API for every cohort, all inventories kept alive."""
+    out = []
+    for d in cohorts:
+        samples = core.parse_sample_list(d / "sample_list.txt")
+        inv = core.inventory(d, [s for v in samples.values() for s in v], workers=workers)
+        out.append((inv, core.plan_actions(inv)))
+    return out
+
+
+def _project_table(cohorts: List[Path], workers: int) -> tuple:
+    table = core.RunTable()
+    plans = []
+    for d in cohorts:
+        samples = core.parse_sample_list(d / "sample_list.txt")
+        ci = table.add_cohort(d, [s for v in samples.values() for s in v], workers=workers)
+        plans.append(table.plan_actions(ci))
+    return table, plans
+
+
+def run_project_bench(root: Path, workers: int) -> Dict[str, Dict[str, float]]:
+    """Time and memory of SRRInfo dicts vs RunTable for a whole project."""
+    cohorts = core.discover_cohorts(root)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in (("dict", _project_dicts), ("runtable", _project_table)):
+        gc.collect()
+        collections = sum(st["collections"] for st in gc.get_stats())
+        t0 = time.perf_counter()
+        kept = fn(cohorts, workers)
+        elapsed = time.perf_counter() - t0
+        gc_runs = sum(st["collections"] for st in gc.get_stats()) - collections
+        del kept
+        gc.collect()
+        tracemalloc.start()
+        kept = fn(cohorts, workers)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        runs = len(kept[0]) if name == "runtable" else sum(len(inv) for inv, _ in kept)
+        del kept
+        results[name] = {"seconds": elapsed, "retained_mb": retained / 1e6, "peak_mb": peak / 1e6,
+                         "gc_collections": gc_runs, "runs": runs}
+        print(f"  {name:<10} {elapsed:7.2f}s  retained {retained / 1e6:8.1f} MB  "
+              f"peak {peak / 1e6:8.1f} MB  gc {gc_runs:4d}  ({runs} runs)")
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        cp = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                            cwd=Path(__file__).resolve().parent)
+    except OSError:
+        return None
+    return cp.stdout.strip() or None
+
+
+def compare(new: Dict, old_path: Path, threshold: float, min_ms: float = 5.0) -> int:
+    """Print median ratios new/old; returns number of phases slower than threshold.
+
+    Phases that changed by less than min_ms are never flagged (timer noise).
+    """
+    old = json.loads(old_path.read_text())
+    print(f"\nvs {old_path} (commit {old.get('commit')})")
+    regressions = 0
+    for phase, modes in new["results"].items():
+        if phase.startswith("_") or phase not in old["results"] or "cold" not in modes:
+            continue
+        for mode in ("cold", "warm"):
+            a, b = modes[mode]["median"], old["results"][phase][mode]["median"]
+            ratio = a / b if b else float("inf")
+            flag = ""
+            if ratio > threshold and (a - b) * 1000 >= min_ms:
+                flag = "  ✗ REGRESSION"
+                regressions += 1
+            print(f"  {phase:<24}{mode:<5} {b * 1000:9.1f} → {a * 1000:9.1f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the FASTQ core on a synthetic cohort")
+    ap.add_argument("--dir", default="/tmp/poseidon_bench", help="Synthetic cancer dir (default %(default)s)")
+    ap.add_argument("--samples", type=int, default=2000, help="Samples to generate (default %(default)s)")
+    ap.add_argument("--max-runs", type=int, default=3, help="Max runs per sample (default %(default)s)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--rebuild", action="store_true", help="Regenerate --dir even if it exists")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per phase and mode (default %(default)s)")
+    ap.add_argument("--workers", type=int, default=core.SNIFF_WORKERS, help="Sniff threads for inventory()")
+    ap.add_argument("--project-runs", type=int, default=0,
+                    help="Also compare SRRInfo dicts vs RunTable on a synthetic project with "
+                         "this many runs, e.g. 50000 (built under <dir>_project)")
+    ap.add_argument("--cohort-runs", type=int, default=5000, help="Runs per synthetic cohort (default %(default)s)")
+    ap.add_argument("--out", help="Write results JSON here")
+    ap.add_argument("--compare", help="Previous results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=1.25,
+                    help="With --compare: exit 1 if any median is this many times slower (default %(default)s)")
+    args = ap.parse_args()
+
+    cancer_dir = Path(args.dir).resolve()
+    layouts = None
+    if args.rebuild or not (cancer_dir / "sample_list.txt").exists():
+        t0 = time.perf_counter()
+        try:
+            layouts = build_cohort(cancer_dir, args.samples, args.max_runs, seed=args.seed)
+        except ValueError as exc:
+            print(f"ERROR: {exc}")
+            sys.exit(1)
+        print(f"Built {cancer_dir} in {time.perf_counter() - t0:.1f}s: "
+              + ", ".join(f"{k}={v}" for k, v in layouts.items()))
+
+    print(f"Benchmarking {cancer_dir} (repeat={args.repeat}, workers={args.workers})")
+    results = run_bench(cancer_dir, args.repeat, args.workers)
+    if args.project_runs:
+        root = cancer_dir.with_name(cancer_dir.name + "_project")
+        if args.rebuild or not (root / "Tumors").is_dir():
+            t0 = time.perf_counter()
+            try:
+                n = build_project(root, args.project_runs, args.cohort_runs, seed=args.seed)
+            except ValueError as exc:
+                print(f"ERROR: {exc}")
+                sys.exit(1)
+            print(f"Built {root} ({n} cohorts) in {time.perf_counter() - t0:.1f}s")
+        print(f"Project inventory + plan, {root}")
+        results["_project"] = run_project_bench(root, args.workers)
+    doc = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "params": {"dir": str(cancer_dir), "samples": args.samples, "max_runs": args.max_runs,
+                   "seed": args.seed, "repeat": args.repeat, "workers": args.workers,
+                   "project_runs": args.project_runs, "cohort_runs": args.cohort_runs},
+        "layouts": layouts,
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(doc, indent=1) + "\n")
+        print(f"✓ wrote {args.out}")
+    if args.compare and compare(doc, Path(args.compare), args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
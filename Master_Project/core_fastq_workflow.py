@@ -10,7 +10,7 @@ Goal: drastically smaller, testable core that preserves essential behavior:
   • Safe cleanup of converted .sra once FASTQs exist (>0B)
 
 Non‑goals for the core (moved out / optional extensions):
-  – Deep gzip integrity scans / long timeouts
+  – Deep gzip integrity scans in the default path (opt‑in via `verify`)
   – lsof/pgrep heuristics
   – STAR progress detection
   – Complex stuck‑job detection
@@ -19,31 +19,102 @@ Non‑goals for the core (moved out / optional extensions):
 Subcommands
   poseidon_core.py plan   <cancer_dir>         # print action plan
   poseidon_core.py apply  <cancer_dir>         # execute plan (download/submit)
+  poseidon_core.py apply  <cancer_dir> --executor local --jobs 8 | --executor dry-run
+  poseidon_core.py plan|apply --root <POSEIDON> [--priority Tumors/Tongue=10]
+                                               # all cohorts, one ranked global queue
   poseidon_core.py status <cancer_dir>         # write sample_list.with_status.txt
   poseidon_core.py clean  <cancer_dir>         # delete .sra with completed FASTQs
+  poseidon_core.py watch  <cancer_dir>         # poll LSF, refresh status, clean up
+  poseidon_core.py verify <cancer_dir>         # full gzip/record scan + R1/R2 parity
+  poseidon_core.py manifest <cancer_dir>       # audit FASTQs against fastq_manifest.tsv
+  poseidon_core.py query  --root <POSEIDON> [summary|sra-no-fastq|missing|stale|SELECT …]
 
 Dependencies expected in PATH on HPC: prefetch, fastq-dump (or fasterq-dump), bsub, bjobs
 
 Design notes
   – Stateless “inventory()” + pure “plan_actions()” gives idempotent behavior and easy tests
   – Minimal validation: file existence/size + small FASTQ header sniff
-  – Job submission uses a standard job name: fastq_<SRR>
+  – Inventory does one os.scandir per cohort and sniffs headers in a thread pool
+    (POSEIDON_SNIFF_THREADS, default 16)
+  – Sniff results are cached in <cancer_dir>/.poseidon_cache.sqlite keyed by
+    (name, inode, size, mtime_ns); pass --no-cache to re-check everything
+  – `verify` streams every FASTQ in a process pool and stores record counts in
+    the same cache; failed SRRs come back from plan_actions() as re‑converts
+  – `apply` downloads through a bounded thread pool (--downloads, --retries with
+    exponential backoff); the queue persists in logs/prefetch_queue.json so an
+    interrupted run resumes. PREFETCH_BIN swaps in a stub prefetch for testing
+  – Job submission uses a standard job name: fastq_<SRR>; submissions are
+    journaled in logs/submit_journal.tsv and reconciled with one bjobs call per
+    plan/apply, so in‑flight SRRs show as RUNNING instead of being resubmitted;
+    only apply/watch write the reconciled journal back (plan writes nothing)
+  – --root plans every cohort in parallel and ranks them by --priority, then by
+    remaining work; --downloads / --max-conversions are project‑wide caps.
+    Project inventories go into a RunTable (typed columns + flag bits) rather
+    than one SRRInfo/Path object per run
+  – Conversions are released against a disk budget: footprint estimated from the
+    .sra size (or runinfo bases/size_MB), checked against free space, optional
+    POSEIDON_QUOTA_CMD quota and $LS_TMPDIR; the ledger is printed by plan/apply
+  – apply --source ena pulls {SRR}_1/_2.fastq.gz from ENA (ena_download.py:
+    ranged parallel HTTP, resumable .part files, streaming MD5 check) and only
+    prefetches runs ENA does not serve; those runs never need a conversion job
+  – FQD_ENGINE=pipe streams fastq-dump through FIFOs into pigz next to the
+    destination (atomic rename, no uncompressed FASTQ on disk); both engines log
+    per-stage seconds/bytes to logs/fastq_<SRR>.stages.tsv
+  – apply --executor picks the backend: lsf (bsub/bjobs), local (process pool of
+    --jobs workers on this host, LSF-style log files) or dry-run (prints every
+    prefetch/bsub/rm without touching the cohort). local/dry-run cannot see LSF,
+    so journal entries with an LSF job id are left for the next lsf run
+  – Every status snapshot is mirrored as typed per‑SRR rows (flags, bytes) into
+    <root>/poseidon_status.sqlite, rewriting only rows that changed; `query`
+    answers cross‑cohort questions from it without walking the tree
+  – --metrics appends one JSON line per run (phase seconds; files stat'ed/sniffed,
+    sniff bytes, cache hits, bsub/bjobs calls and latency) to
+    logs/core_metrics.jsonl; POSEIDON_PROFILE=1 writes a cProfile dump next to it
+  – Conversion jobs tee the compressed output through md5sum (FQD_MANIFEST_HASH)
+    and record file/bytes/mtime/digest/records/job in fastq_manifest.tsv; ENA
+    downloads record their checked MD5. inventory, clean and verify trust an
+    entry while size+mtime match, so unchanged files are never re‑read
+    (--no-cache re-sniffs them anyway). Jobs write per-file fragments; only
+    apply/watch and `manifest` fold them in, plan/status read them as they are
+  – Conversion jobs are sized from the .sra size: a tier table (FQD_TIERS) sets
+    threads, and -M/rusage/-W are learned from the LSF reports of finished jobs
+    (logs/fastq_resources.tsv); FQD_SIZE_JOBS=0 restores fixed FQD_THREADS
+  – Conversions go to LSF as one job array per cohort and resource tier
+    (lsf_submit.py; LSF_SUBMIT_MODE=array|pack|single, LSF_ARRAY_LIMIT caps
+    running elements). Elements are journaled as <jobid>[i] and mapped back
+    to fastq_<SRR> through logs/arrays/<array>.tsv. `fake_lsf.py install DIR`
+    puts a local bsub/bjobs/bkill simulator on PATH for testing without a cluster
   – You can swap the submit command with your bash wrapper if desired
 """
 from __future__ import annotations
 
+import abc
 import argparse
+import csv
+import fnmatch
 import gzip
+import hashlib
 import json
 import os
 import re
 import shlex
+import sqlite3
 import subprocess
-from dataclasses import dataclass
+import sys
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import shutil
 
+from lsf_accounting import last_report
+from lsf_submit import (ARRAY_NAME_RE, LSF_ACTIVE, LSF_SUBMIT_MODE, Resources, Task, array_tasks,
+                        submit as submit_tasks)
+
 # ----------------------------
 # Types
 # ----------------------------
@@ -56,14 +127,79 @@ class SRRInfo:
     r1_ok: bool
     r2_ok: bool
     sra_ok: bool
+    verify_failed: bool = False  # last `verify` of the current files failed
+    sra_bytes: int = 0
+    r1_bytes: int = 0
+    r2_bytes: int = 0
 
 @dataclass
 class Action:
-    kind: str  # "download" | "convert"
+    kind: str  # "download" | "convert" | "running"
     srr: str
     detail: str
     sra_path: Optional[Path] = None
 
+# ----------------------------
+# Metrics
+# ----------------------------
+METRICS_NAME = "core_metrics.jsonl"
+
+
+class Metrics:
+    """Wall time per phase plus operation counters for one CLI run.
+
+    Phases may nest (inventory contains sniff) and accumulate over repeated
+    calls. Counters are thread‑safe since sniffs and prefetches run in pools.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    class _Phase:
+        def __init__(self, metrics: "Metrics", name: str):
+            self.metrics, self.name = metrics, name
+
+        def __enter__(self):
+            self.t0 = time.perf_counter()
+
+        def __exit__(self, *exc):
+            self.metrics.add_time(self.name, time.perf_counter() - self.t0)
+            return False
+
+    def phase(self, name: str) -> "Metrics._Phase":
+        return Metrics._Phase(self, name)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, **fields) -> dict:
+        rec = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)), **fields,
+               "elapsed_s": round(time.time() - self.started, 4),
+               "phases": {k: {"s": round(v, 4), "calls": self.calls[k]}
+                          for k, v in sorted(self.phases.items())},
+               "counters": {k: (round(v, 4) if isinstance(v, float) else v)
+                            for k, v in sorted(self.counters.items())}}
+        return rec
+
+    def write(self, path: Path, **fields) -> None:
+        """Append one JSON line to path."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a") as f:
+            f.write(json.dumps(self.record(**fields)) + "\n")
+
+
+METRICS = Metrics()
+
 # ----------------------------
 # Parsing & inventory
 # ----------------------------
@@ -107,13 +243,14 @@ def _exists_nonempty(p: Optional[Path]) -> bool:
 def _fastq_header_ok(p: Path, n_lines: int = 8) -> bool:
     """Quick FASTQ sanity check – read a few lines and verify '@'/'+' pattern."""
     try:
-        with gzip.open(p, "rt") as fh:
+        with open(p, "rb") as raw, gzip.open(raw, "rt") as fh:
             lines = []
             for _ in range(n_lines):
                 s = fh.readline()
                 if not s:
                     break
                 lines.append(s)
+            METRICS.count("sniff_bytes", raw.tell())
         if len(lines) < 4:
             return False
         # Check first record pattern
@@ -130,42 +267,542 @@ def _find_sra(cancer_dir: Path, srr: str) -> Optional[Path]:
     return None
 
 
-def inventory(cancer_dir: Path, srrs: List[str]) -> Dict[str, SRRInfo]:
-    """Scan filesystem for each SRR and return a compact status structure."""
-    out: Dict[str, SRRInfo] = {}
-    for srr in srrs:
-        r1 = cancer_dir / f"{srr}_1.fastq.gz"
-        r2 = cancer_dir / f"{srr}_2.fastq.gz"
-        sra = _find_sra(cancer_dir, srr)
+@dataclass
+class InventoryStats:
+    """Counters for one inventory() pass (printed by the CLI)."""
+    statted: int = 0
+    sniffed: int = 0
+    cache_hits: int = 0
+
+    def summary(self) -> str:
+        return (f"{self.statted} files stat'ed, {self.sniffed} FASTQs sniffed, "
+                f"{self.cache_hits} cache hits")
+
+
+# Only these names matter to inventory(); everything else in the dir is ignored
+INVENTORY_SUFFIXES = (".fastq.gz", ".sra", ".sralite")
+# Header sniffs are I/O bound (GPFS latency), so a modest thread pool pays off
+SNIFF_WORKERS = int(os.environ.get("POSEIDON_SNIFF_THREADS", "16"))
+
+
+def _scan_dir(cancer_dir: Path, stats: InventoryStats) -> Dict[str, os.stat_result]:
+    """Single os.scandir pass → {file name: stat} for FASTQ/SRA files."""
+    found: Dict[str, os.stat_result] = {}
+    try:
+        it = os.scandir(cancer_dir)
+    except OSError:
+        return found
+    with it:
+        for entry in it:
+            if not entry.name.endswith(INVENTORY_SUFFIXES):
+                continue
+            try:
+                st = entry.stat()  # follows symlinks, like Path.exists()
+            except OSError:
+                continue
+            stats.statted += 1
+            found[entry.name] = st
+    return found
+
+
+def _sniff_many(paths: List[Path], workers: int) -> Dict[Path, bool]:
+    """Run _fastq_header_ok over paths with a bounded thread pool."""
+    if not paths:
+        return {}
+    if workers <= 1 or len(paths) == 1:
+        return {p: _fastq_header_ok(p) for p in paths}
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return dict(zip(paths, pool.map(_fastq_header_ok, paths)))
+
+
+# ----------------------------
+# Fingerprint cache
+# ----------------------------
+CACHE_NAME = ".poseidon_cache.sqlite"
+
+
+class FingerprintCache:
+    """Per‑cohort SQLite cache of FASTQ check results.
+
+    Rows are keyed by file name + validation level and only trusted while the
+    (inode, size, mtime_ns) fingerprint still matches the file on disk.
+    """
+
+    def __init__(self, cancer_dir: Path):
+        self.path = cancer_dir / CACHE_NAME
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fastq_check ("
+            " path TEXT NOT NULL, level TEXT NOT NULL,"
+            " inode INTEGER NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " ok INTEGER NOT NULL, checked_at REAL NOT NULL,"
+            " PRIMARY KEY (path, level))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fastq_verify ("
+            " path TEXT PRIMARY KEY,"
+            " inode INTEGER NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " ok INTEGER NOT NULL, records INTEGER NOT NULL, raw_bytes INTEGER NOT NULL,"
+            " elapsed REAL NOT NULL, error TEXT NOT NULL, checked_at REAL NOT NULL)")
+
+    @classmethod
+    def open(cls, cancer_dir: Path) -> Optional["FingerprintCache"]:
+        """Open the cohort cache, or None if the directory is not writable."""
+        try:
+            return cls(cancer_dir)
+        except sqlite3.Error as e:
+            print(f"WARNING: fingerprint cache disabled ({e})")
+            return None
+
+    def get(self, name: str, st: os.stat_result, level: str = "header") -> Optional[bool]:
+        row = self.conn.execute(
+            "SELECT ok FROM fastq_check WHERE path=? AND level=? AND inode=? AND size=? AND mtime_ns=?",
+            (name, level, st.st_ino, st.st_size, st.st_mtime_ns)).fetchone()
+        return None if row is None else bool(row[0])
+
+    def put(self, name: str, st: os.stat_result, ok: bool, level: str = "header") -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fastq_check VALUES (?,?,?,?,?,?,?)",
+            (name, level, st.st_ino, st.st_size, st.st_mtime_ns, int(ok), time.time()))
+
+    def verified(self, listing: Dict[str, os.stat_result]) -> Dict[str, "VerifyResult"]:
+        """Deep‑verify results whose fingerprint still matches the listing."""
+        out: Dict[str, VerifyResult] = {}
+        for name, ino, size, mtime_ns, ok, records, raw_bytes, elapsed, error in self.conn.execute(
+                "SELECT path, inode, size, mtime_ns, ok, records, raw_bytes, elapsed, error"
+                " FROM fastq_verify"):
+            st = listing.get(name)
+            if st is None or (st.st_ino, st.st_size, st.st_mtime_ns) != (ino, size, mtime_ns):
+                continue
+            out[name] = VerifyResult(name=name, ok=bool(ok), records=records, raw_bytes=raw_bytes,
+                                     elapsed=elapsed, error=error)
+        return out
+
+    def put_verified(self, st: os.stat_result, res: "VerifyResult") -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fastq_verify VALUES (?,?,?,?,?,?,?,?,?,?)",
+            (res.name, st.st_ino, st.st_size, st.st_mtime_ns, int(res.ok), res.records,
+             res.raw_bytes, res.elapsed, res.error, time.time()))
+
+    def close(self) -> None:
+        try:
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+
+# ----------------------------
+# FASTQ manifest
+# ----------------------------
+MANIFEST_NAME = "fastq_manifest.tsv"
+MANIFEST_HASH = os.environ.get("FQD_MANIFEST_HASH", "md5")  # md5 | sha256
+MANIFEST_COLUMNS = ["file", "bytes", "mtime", "md5", "sha256", "records", "producer", "recorded_at"]
+
+
+@dataclass
+class ManifestEntry:
+    file: str
+    bytes: int
+    mtime: int        # whole seconds, as `stat -c %Y` reports it
+    md5: str = ""
+    sha256: str = ""
+    records: int = 0  # 0 = unknown
+    producer: str = ""
+    recorded_at: int = 0
 
-        r1_ok = _exists_nonempty(r1) and _fastq_header_ok(r1)
-        r2_ok = _exists_nonempty(r2)
-        if r2_ok:
-            # light sniff for R2 if present
-            r2_ok = _fastq_header_ok(r2)
-        sra_ok = _exists_nonempty(sra)
+    def matches(self, st: os.stat_result) -> bool:
+        """True while the file on disk is still the one that was hashed."""
+        return st.st_size == self.bytes and int(st.st_mtime) == self.mtime
 
-        out[srr] = SRRInfo(srr=srr, sra=sra, r1=r1 if r1.exists() else None,
-                           r2=r2 if r2.exists() else None, r1_ok=r1_ok, r2_ok=r2_ok, sra_ok=sra_ok)
+    def row(self) -> List[str]:
+        return [self.file, str(self.bytes), str(self.mtime), self.md5, self.sha256,
+                str(self.records), self.producer, str(self.recorded_at)]
+
+    @classmethod
+    def parse(cls, parts: List[str]) -> Optional["ManifestEntry"]:
+        if len(parts) < 8 or parts[0] == "file":
+            return None
+        try:
+            return cls(parts[0], int(parts[1]), int(parts[2]), parts[3], parts[4],
+                       int(parts[5] or 0), parts[6], int(parts[7] or 0))
+        except ValueError:
+            return None
+
+
+class Manifest:
+    """<cancer_dir>/fastq_manifest.tsv – checksums computed while FASTQs were written.
+
+    Conversion jobs and ENA downloads each drop a one‑line fragment in
+    logs/manifest/<file>.tsv (no shared file to race on); load() folds the
+    fragments into the manifest. Read-only paths (plan, status, inventory) use
+    load(merge=False), which sees the fragments without rewriting anything; only
+    apply/watch and the manifest command fold them in. An entry is trusted only
+    while the file's size and mtime still match, so unchanged files never need
+    re‑reading.
+    """
+
+    def __init__(self, cancer_dir: Path):
+        self.path = cancer_dir / MANIFEST_NAME
+        self.fragments = cancer_dir / "logs" / "manifest"
+        self.entries: Dict[str, ManifestEntry] = {}
+
+    @classmethod
+    def load(cls, cancer_dir: Path, merge: bool = True) -> "Manifest":
+        m = cls(cancer_dir)
+        if m.path.exists():
+            for line in m.path.read_text().splitlines():
+                e = ManifestEntry.parse(line.split("\t"))
+                if e is not None:
+                    m.entries[e.file] = e
+        merged: List[Path] = []
+        if m.fragments.is_dir():
+            for frag in sorted(m.fragments.glob("*.tsv")):
+                try:
+                    lines = frag.read_text().splitlines()
+                except OSError:
+                    continue
+                for line in lines:
+                    e = ManifestEntry.parse(line.split("\t"))
+                    if e is not None:
+                        m.entries[e.file] = e
+                merged.append(frag)
+        if merge and merged and not get_executor().dry_run:
+            m.save()
+            for frag in merged:
+                frag.unlink(missing_ok=True)
+        return m
+
+    def trusted(self, name: str, st: os.stat_result) -> Optional[ManifestEntry]:
+        e = self.entries.get(name)
+        return e if e is not None and e.matches(st) else None
+
+    def add(self, entry: ManifestEntry) -> None:
+        self.entries[entry.file] = entry
+
+    def save(self) -> None:
+        lines = ["\t".join(MANIFEST_COLUMNS)]
+        lines += ["\t".join(e.row()) for _, e in sorted(self.entries.items())]
+        tmp = self.path.with_suffix(".tsv.tmp")
+        tmp.write_text("\n".join(lines) + "\n")
+        tmp.replace(self.path)
+
+    @staticmethod
+    def write_fragment(cancer_dir: Path, entry: ManifestEntry) -> None:
+        frag = cancer_dir / "logs" / "manifest" / f"{entry.file}.tsv"
+        frag.parent.mkdir(parents=True, exist_ok=True)
+        tmp = frag.with_suffix(".tsv.tmp")
+        tmp.write_text("\t".join(entry.row()) + "\n")
+        tmp.replace(frag)
+
+
+def hash_file(path: Path, algo: str = MANIFEST_HASH) -> Tuple[str, int, str]:
+    """(hexdigest, records, error) for an existing .fastq.gz – used to backfill
+    the manifest; a non‑empty error means the file failed the FASTQ check."""
+    h = hashlib.new(algo)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    res = _verify_fastq(path)
+    return h.hexdigest(), res.records, "" if res.ok else res.error
+
+
+def inventory(cancer_dir: Path, srrs: List[str], stats: Optional[InventoryStats] = None,
+              workers: int = SNIFF_WORKERS, cache: Optional[FingerprintCache] = None,
+              trust_manifest: bool = True) -> Dict[str, SRRInfo]:
+    """Scan filesystem for each SRR and return a compact status structure.
+
+    One directory listing provides every size; only non‑empty FASTQs are
+    header‑sniffed, in parallel. With a cache, files whose fingerprint is
+    unchanged since the last check are not reopened; with trust_manifest,
+    neither are files our own jobs recorded in fastq_manifest.tsv.
+    """
+    found, listing, sniffed, failed = _inventory_scan(cancer_dir, srrs, stats, workers, cache,
+                                                      trust_manifest)
+    out: Dict[str, SRRInfo] = {}
+    for srr, (sra, r1, r2) in found.items():
+        bad = srr in failed
+        out[srr] = SRRInfo(srr=srr, sra=sra, r1=r1, r2=r2,
+                           r1_ok=bool(r1 and sniffed.get(r1)) and not bad,
+                           r2_ok=bool(r2 and sniffed.get(r2)) and not bad,
+                           sra_ok=bool(sra and listing[sra.name].st_size > 0),
+                           verify_failed=bad,
+                           sra_bytes=listing[sra.name].st_size if sra else 0,
+                           r1_bytes=listing[r1.name].st_size if r1 else 0,
+                           r2_bytes=listing[r2.name].st_size if r2 else 0)
     return out
 
+
+def _inventory_scan(cancer_dir: Path, srrs: List[str], stats: Optional[InventoryStats],
+                    workers: int, cache: Optional[FingerprintCache], trust_manifest: bool = True):
+    """Shared core of inventory() and RunTable.add_cohort().
+
+    Returns (found: srr → (sra, r1, r2) paths or None, listing: name → stat,
+    sniffed: path → header ok, failed: srr → verify failure reason).
+    """
+    stats = stats if stats is not None else InventoryStats()
+    with METRICS.phase("scan"):
+        listing = _scan_dir(cancer_dir, stats)
+    METRICS.count("files_statted", len(listing))
+
+    def nonempty(name: str) -> bool:
+        st = listing.get(name)
+        return st is not None and st.st_size > 0
+
+    found: Dict[str, Tuple[Optional[Path], Optional[Path], Optional[Path]]] = {}
+    to_sniff: List[Path] = []
+    for srr in dict.fromkeys(srrs):
+        r1n, r2n = f"{srr}_1.fastq.gz", f"{srr}_2.fastq.gz"
+        sra = next((cancer_dir / f"{srr}{ext}" for ext in (".sra", ".sralite")
+                    if f"{srr}{ext}" in listing), None)
+        r1 = cancer_dir / r1n if r1n in listing else None
+        r2 = cancer_dir / r2n if r2n in listing else None
+        for p in (r1, r2):
+            if p is not None and nonempty(p.name):
+                to_sniff.append(p)
+        found[srr] = (sra, r1, r2)
+
+    known: Dict[Path, bool] = {}
+    # Read-only: fragments of running jobs are seen but never merged/deleted here
+    manifest = Manifest.load(cancer_dir, merge=False) if to_sniff and trust_manifest else None
+    if manifest is not None and manifest.entries:
+        # Written and hashed by our own jobs, unchanged since: no need to open it
+        for p in to_sniff:
+            if manifest.trusted(p.name, listing[p.name]):
+                known[p] = True
+        METRICS.count("manifest_hits", len(known))
+    if cache is not None:
+        hits = 0
+        for p in to_sniff:
+            if p in known:
+                continue
+            hit = cache.get(p.name, listing[p.name])
+            if hit is not None:
+                known[p] = hit
+                hits += 1
+        stats.cache_hits += hits
+    to_sniff = [p for p in to_sniff if p not in known]
+
+    with METRICS.phase("sniff"):
+        sniffed = _sniff_many(to_sniff, workers)
+    stats.sniffed += len(sniffed)
+    METRICS.count("files_sniffed", len(sniffed))
+    METRICS.count("cache_hits", len(known))
+    if cache is not None:
+        for p, ok in sniffed.items():
+            cache.put(p.name, listing[p.name], ok)
+    sniffed.update(known)
+
+    # Failed deep verification (on the same fingerprint) overrides a good sniff
+    verified = cache.verified(listing) if cache is not None else {}
+    failed = verify_failures(found, verified)
+    return found, listing, sniffed, failed
+
+# ----------------------------
+# Deep verification
+# ----------------------------
+
+@dataclass
+class VerifyResult:
+    name: str
+    ok: bool
+    records: int
+    raw_bytes: int
+    elapsed: float
+    error: str = ""
+
+
+VERIFY_CHUNK = 4 * 1024 * 1024
+
+
+def _verify_fastq(path: Path) -> VerifyResult:
+    """Stream a whole .fastq.gz: gzip must end cleanly and every record must be
+    4 lines with '@' header and '+' separator. Runs in a worker process."""
+    t0 = time.monotonic()
+    n_lines = 0
+    raw = 0
+    tail = b""
+    error = ""
+    try:
+        with gzip.open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(VERIFY_CHUNK)
+                if not chunk:
+                    break
+                raw += len(chunk)
+                lines = (tail + chunk).split(b"\n")
+                tail = lines.pop()
+                phase = n_lines % 4
+                if any(l[:1] != b"@" for l in lines[(-phase) % 4::4]):
+                    raise ValueError(f"record header without '@' near line {n_lines + 1}")
+                if any(l[:1] != b"+" for l in lines[(2 - phase) % 4::4]):
+                    raise ValueError(f"separator without '+' near line {n_lines + 1}")
+                n_lines += len(lines)
+        if tail:
+            n_lines += 1  # last line without trailing newline
+        if n_lines % 4:
+            raise ValueError(f"truncated record ({n_lines} lines)")
+        if n_lines == 0:
+            raise ValueError("no records")
+    except (OSError, EOFError, ValueError, zlib.error) as e:
+        error = str(e) or type(e).__name__
+    return VerifyResult(name=path.name, ok=not error, records=n_lines // 4, raw_bytes=raw,
+                        elapsed=time.monotonic() - t0, error=error)
+
+
+def verify_failures(found: Dict[str, Tuple[Optional[Path], Optional[Path], Optional[Path]]],
+                    verified: Dict[str, VerifyResult]) -> Dict[str, str]:
+    """SRR → reason for SRRs whose verified FASTQs are broken or disagree in record count."""
+    failed: Dict[str, str] = {}
+    for srr, (_sra, r1, r2) in found.items():
+        v1 = verified.get(r1.name) if r1 else None
+        v2 = verified.get(r2.name) if r2 else None
+        for v in (v1, v2):
+            if v is not None and not v.ok:
+                failed[srr] = f"{v.name}: {v.error}"
+                break
+        else:
+            if v1 and v2 and v1.records != v2.records:
+                failed[srr] = f"R1/R2 record count mismatch ({v1.records} vs {v2.records})"
+    return failed
+
+
 # ----------------------------
 # Planning
 # ----------------------------
 
-def plan_actions(inv: Dict[str, SRRInfo]) -> List[Action]:
-    """Derive a minimal plan: download if no SRA; convert if SRA ok and FASTQ incomplete."""
+def plan_actions(inv: Dict[str, SRRInfo], running: Optional[Dict[str, str]] = None) -> List[Action]:
+    """Derive a minimal plan: download if no SRA; convert if SRA ok and FASTQ incomplete.
+
+    SRRs whose FASTQs failed `verify` are re‑converted (or re‑downloaded first).
+    SRRs with a conversion job in flight (``running``: srr → job detail) are
+    reported as "running" instead of being planned again.
+    """
+    running = running or {}
     actions: List[Action] = []
     for srr, info in inv.items():
         fastq_done = info.r1_ok and (info.r2 is None or info.r2_ok)
         if fastq_done:
             continue
-        if not info.sra_ok:
+        if srr in running:
+            actions.append(Action(kind="running", srr=srr, detail=f"LSF {running[srr]}"))
+        elif not info.sra_ok:
             actions.append(Action(kind="download", srr=srr, detail="prefetch"))
         else:
-            actions.append(Action(kind="convert", srr=srr, detail="fastq-dump", sra_path=info.sra))
+            detail = "fastq-dump, verify failed" if info.verify_failed else "fastq-dump"
+            actions.append(Action(kind="convert", srr=srr, detail=detail, sra_path=info.sra))
     return actions
 
+# ----------------------------
+# Project run table
+# ----------------------------
+# RunTable flag bits
+F_SRA, F_SRALITE, F_SRA_OK, F_R1, F_R1_OK, F_R2, F_R2_OK, F_VERIFY_FAILED = (1 << i for i in range(8))
+
+
+class RunTable:
+    """Column store of inventories for many cohorts at once (--root).
+
+    One row per SRR: interned accession, cohort index, a flag byte and three
+    byte sizes in typed arrays – a few tens of bytes per run plus the accession
+    string, against several hundred for an SRRInfo with its Path objects. Paths
+    are rebuilt on demand from the cohort directory and the accession. Rows of
+    one cohort are contiguous.
+    """
+
+    def __init__(self):
+        self.cohorts: List[Path] = []
+        self.spans: List[Tuple[int, int]] = []  # cohort index -> [start, stop) rows
+        self.srr: List[str] = []
+        self.cohort = array("H")
+        self.flags = array("B")
+        self.sra_bytes = array("q")
+        self.r1_bytes = array("q")
+        self.r2_bytes = array("q")
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.srr)
+
+    def add_cohort(self, cancer_dir: Path, srrs: List[str], stats: Optional[InventoryStats] = None,
+                   workers: int = SNIFF_WORKERS, cache: Optional[FingerprintCache] = None,
+                   trust_manifest: bool = True) -> int:
+        """Inventory one cohort straight into the table; returns its cohort index.
+
+        Thread‑safe: the scan runs unlocked, only the column appends are serialised.
+        """
+        found, listing, sniffed, failed = _inventory_scan(cancer_dir, srrs, stats, workers, cache,
+                                                          trust_manifest)
+        names, flags = [], array("B")
+        sizes = (array("q"), array("q"), array("q"))
+        for srr, (sra, r1, r2) in found.items():
+            f = 0
+            if sra is not None:
+                f |= F_SRA | (F_SRALITE if sra.suffix == ".sralite" else 0)
+                f |= F_SRA_OK if listing[sra.name].st_size > 0 else 0
+            bad = srr in failed
+            if r1 is not None:
+                f |= F_R1 | (F_R1_OK if sniffed.get(r1) and not bad else 0)
+            if r2 is not None:
+                f |= F_R2 | (F_R2_OK if sniffed.get(r2) and not bad else 0)
+            f |= F_VERIFY_FAILED if bad else 0
+            names.append(sys.intern(srr))
+            flags.append(f)
+            for col, p in zip(sizes, (sra, r1, r2)):
+                col.append(listing[p.name].st_size if p is not None else 0)
+        with self.lock:
+            ci = len(self.cohorts)
+            start = len(self.srr)
+            self.cohorts.append(cancer_dir)
+            self.spans.append((start, start + len(names)))
+            self.srr.extend(names)
+            self.cohort.extend([ci] * len(names))
+            self.flags.extend(flags)
+            self.sra_bytes.extend(sizes[0])
+            self.r1_bytes.extend(sizes[1])
+            self.r2_bytes.extend(sizes[2])
+        return ci
+
+    def rows(self, ci: int) -> range:
+        return range(*self.spans[ci])
+
+    def sra_path(self, i: int) -> Optional[Path]:
+        f = self.flags[i]
+        if not f & F_SRA:
+            return None
+        return self.cohorts[self.cohort[i]] / f"{self.srr[i]}{'.sralite' if f & F_SRALITE else '.sra'}"
+
+    def info(self, i: int) -> SRRInfo:
+        """Materialise one row as the SRRInfo inventory() would have returned."""
+        f, d, srr = self.flags[i], self.cohorts[self.cohort[i]], self.srr[i]
+        return SRRInfo(srr=srr, sra=self.sra_path(i),
+                       r1=d / f"{srr}_1.fastq.gz" if f & F_R1 else None,
+                       r2=d / f"{srr}_2.fastq.gz" if f & F_R2 else None,
+                       r1_ok=bool(f & F_R1_OK), r2_ok=bool(f & F_R2_OK), sra_ok=bool(f & F_SRA_OK),
+                       verify_failed=bool(f & F_VERIFY_FAILED), sra_bytes=self.sra_bytes[i],
+                       r1_bytes=self.r1_bytes[i], r2_bytes=self.r2_bytes[i])
+
+    def inventory(self, ci: int) -> Dict[str, SRRInfo]:
+        """One cohort as a regular inventory() dict."""
+        return {self.srr[i]: self.info(i) for i in self.rows(ci)}
+
+    def plan_actions(self, ci: int, running: Optional[Dict[str, str]] = None) -> List[Action]:
+        """plan_actions() over the flag column, without building SRRInfo rows."""
+        running = running or {}
+        actions: List[Action] = []
+        flags, srrs = self.flags, self.srr
+        for i in self.rows(ci):
+            f = flags[i]
+            if f & F_R1_OK and (not f & F_R2 or f & F_R2_OK):
+                continue
+            srr = srrs[i]
+            if srr in running:
+                actions.append(Action(kind="running", srr=srr, detail=f"LSF {running[srr]}"))
+            elif not f & F_SRA_OK:
+                actions.append(Action(kind="download", srr=srr, detail="prefetch"))
+            else:
+                detail = "fastq-dump, verify failed" if f & F_VERIFY_FAILED else "fastq-dump"
+                actions.append(Action(kind="convert", srr=srr, detail=detail, sra_path=self.sra_path(i)))
+        return actions
+
 # ----------------------------
 # Executors
 # ----------------------------
@@ -175,12 +812,12 @@ def run(cmd: List[str], cwd: Optional[Path] = None, capture: bool = False) -> su
                           text=True, capture_output=capture)
 
 
-def prefetch(cancer_dir: Path, srr: str) -> bool:
-    # -X cap keeps downloads bounded similar to legacy script; adjust if needed
-    cp = run(["prefetch", srr, "-X", "35000000"], cwd=cancer_dir, capture=True)
-    if cp.returncode != 0:
-        return False
-    # move out of SRR/ subdir if created
+# Override with a stub executable for local testing (e.g. PREFETCH_BIN=./fake_prefetch)
+PREFETCH_BIN = os.environ.get("PREFETCH_BIN", "prefetch")
+
+
+def _normalise_prefetch_output(cancer_dir: Path, srr: str) -> None:
+    """Move <srr>.sra* out of the SRR/ subdir prefetch creates, then drop the subdir."""
     sub = cancer_dir / srr
     if sub.is_dir():
         for p in sub.glob("*.sra*"):
@@ -195,24 +832,281 @@ def prefetch(cancer_dir: Path, srr: str) -> bool:
                 sub.rmdir()
         except Exception:
             pass
+
+
+def prefetch(cancer_dir: Path, srr: str) -> bool:
+    # -X cap keeps downloads bounded similar to legacy script; adjust if needed
+    executor = get_executor()
+    with METRICS.phase("prefetch"):
+        cp = executor.run([PREFETCH_BIN, srr, "-X", "35000000"], cwd=cancer_dir)
+    METRICS.count("prefetch_calls")
+    if executor.dry_run:
+        return True
+    if cp.returncode != 0:
+        return False
+    _normalise_prefetch_output(cancer_dir, srr)
     got = _find_sra(cancer_dir, srr)
     return bool(got and _exists_nonempty(got))
 
 
+# Download sources (apply --source):
+#   sra – prefetch the .sra, convert with an LSF fastq-dump job (default)
+#   ena – FASTQs straight from ENA (ena_download.py); prefetch when ENA has none
+DOWNLOAD_SOURCES = ("sra", "ena")
+
+
+def download_run(cancer_dir: Path, srr: str, source: str = "sra", ena_source=None) -> bool:
+    """Fetch one run from the chosen source; True once .sra or FASTQs are on disk.
+
+    ena_source is an ena_download.MetadataSource shared across runs (built from
+    ENA_SOURCE when omitted).
+    """
+    if source == "ena":
+        if get_executor().dry_run:
+            print(f"[dry-run] ENA fetch {srr} (prefetch fallback)")
+            return True
+        import ena_download
+
+        def record(dest: Path, f) -> None:
+            st = dest.stat()
+            Manifest.write_fragment(cancer_dir, ManifestEntry(
+                dest.name, st.st_size, int(st.st_mtime), md5=f.md5, producer="ena",
+                recorded_at=int(time.time())))
+
+        with METRICS.phase("ena"):
+            state = ena_download.fetch_run(cancer_dir, srr, ena_source, on_file=record)
+        METRICS.count(f"ena_{state}")
+        if state == "ok":
+            return True
+        if state == "failed":
+            return False
+    return prefetch(cancer_dir, srr)
+
+# ----------------------------
+# Download scheduler
+# ----------------------------
+PREFETCH_QUEUE = "prefetch_queue.json"  # under <cancer_dir>/logs/
+
+
+class PrefetchQueue:
+    """Persistent SRR download queue: logs/prefetch_queue.json.
+
+    Entries are {srr: {"state": pending|failed, "attempts": n, "error": str}};
+    finished downloads are dropped. Anything left pending (Ctrl‑C, crash) is
+    picked up again by the next `apply`.
+    """
+
+    def __init__(self, cancer_dir: Path):
+        self.path = cancer_dir / "logs" / PREFETCH_QUEUE
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, object]] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                print(f"WARNING: unreadable {self.path}, starting a fresh queue")
+
+    def add(self, srrs: List[str]) -> None:
+        with self.lock:
+            for srr in srrs:
+                e = self.entries.setdefault(srr, {"state": "pending", "attempts": 0, "error": ""})
+                e["state"] = "pending"
+            self._save()
+
+    def pending(self) -> List[str]:
+        return [srr for srr, e in self.entries.items() if e["state"] == "pending"]
+
+    def mark(self, srr: str, ok: bool, attempts: int, error: str = "") -> None:
+        with self.lock:
+            if ok:
+                self.entries.pop(srr, None)
+            else:
+                self.entries[srr] = {"state": "failed", "attempts": attempts, "error": error}
+            self._save()
+
+    def _save(self) -> None:
+        if get_executor().dry_run:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.entries, indent=1, sort_keys=True))
+        tmp.replace(self.path)
+
+
+def _dir_bytes(cancer_dir: Path, srr: str) -> int:
+    """Bytes on disk for an SRR download, including prefetch's partial files."""
+    total = 0
+    for base in (cancer_dir, cancer_dir / srr):
+        try:
+            with os.scandir(base) as it:
+                for e in it:
+                    if e.name.startswith(srr) and (".sra" in e.name or ".fastq.gz" in e.name) \
+                            and e.is_file():
+                        total += e.stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+def run_prefetch_queue(cancer_dir: Path, srrs: List[str], concurrency: int = 4,
+                       retries: int = 3, backoff: float = 30.0,
+                       report_every: float = 30.0, source: str = "sra") -> Tuple[int, int]:
+    """Download SRRs concurrently with retry/backoff; returns (ok, failed).
+
+    New SRRs are merged with whatever an interrupted run left pending.
+    Ctrl‑C stops launching new downloads, keeps the queue on disk and re‑raises.
+    """
+    return run_prefetch_batches({cancer_dir: srrs}, concurrency, retries, backoff, report_every, source)
+
+
+def run_prefetch_batches(work: Dict[Path, List[str]], concurrency: int = 4,
+                         retries: int = 3, backoff: float = 30.0,
+                         report_every: float = 30.0, source: str = "sra") -> Tuple[int, int]:
+    """run_prefetch_queue() over several cohorts sharing one concurrency cap.
+
+    Downloads start in ``work`` order (cohort by cohort), each cohort keeping
+    its own persistent queue file.
+    """
+    queues: Dict[Path, PrefetchQueue] = {}
+    todo: List[Tuple[Path, str]] = []
+    for cancer_dir, srrs in work.items():
+        queue = queues[cancer_dir] = PrefetchQueue(cancer_dir)
+        resumed = [s for s in queue.pending() if s not in srrs]
+        queue.add(srrs)
+        if resumed:
+            print(f"Resuming {len(resumed)} interrupted downloads from {queue.path}")
+        todo += [(cancer_dir, srr) for srr in queue.pending()]
+    if not todo:
+        return 0, 0
+    ena_source = None
+    if source == "ena" and not get_executor().dry_run:
+        import ena_download
+        ena_source = ena_download.make_source()  # one metadata source (TSV loaded once) for all runs
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    active: Dict[Tuple[Path, str], int] = {}   # (dir, srr) -> bytes on disk at start
+    counts = {"ok": 0, "failed": 0, "bytes": 0}
+    t0 = time.monotonic()
+
+    def worker(cancer_dir: Path, srr: str) -> bool:
+        key = (cancer_dir, srr)
+        with lock:
+            active[key] = _dir_bytes(cancer_dir, srr)
+        queue = queues[cancer_dir]
+        err = ""
+        attempt = 0
+        try:
+            for attempt in range(1, retries + 2):
+                if stop.is_set():
+                    return False
+                if download_run(cancer_dir, srr, source, ena_source):
+                    with lock:
+                        counts["bytes"] += max(0, _dir_bytes(cancer_dir, srr) - active[key])
+                    queue.mark(srr, True, attempt)
+                    return True
+                err = f"{source} download failed (attempt {attempt})"
+                if attempt <= retries and stop.wait(backoff * 2 ** (attempt - 1)):
+                    return False
+            queue.mark(srr, False, attempt, err)
+            return False
+        finally:
+            with lock:
+                active.pop(key, None)
+
+    def reporter() -> None:
+        while not stop.wait(report_every):
+            with lock:
+                inflight = sum(max(0, _dir_bytes(d, s) - b) for (d, s), b in active.items())
+                done_bytes = counts["bytes"]
+                n_active = len(active)
+            rate = (done_bytes + inflight) / max(time.monotonic() - t0, 1e-6) / 1e6
+            print(f"  [prefetch] {counts['ok']}/{len(todo)} done, {n_active} active, "
+                  f"{counts['failed']} failed, {rate:.1f} MB/s")
+
+    print(f"Prefetching {len(todo)} SRRs ({concurrency} concurrent, {retries} retries"
+          + (", ENA FASTQ first)" if source == "ena" else ")"))
+    threading.Thread(target=reporter, daemon=True).start()
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        futs = {pool.submit(worker, d, srr): (d, srr) for d, srr in todo}
+        for fut in as_completed(futs):
+            ok = fut.result()
+            counts["ok" if ok else "failed"] += 1
+            d, srr = futs[fut]
+            print(("✓" if ok else "✗"), "prefetch" if source == "sra" else source,
+                  srr if len(work) == 1 else f"{d.name}/{srr}")
+    except KeyboardInterrupt:
+        print("Interrupted – unfinished downloads stay queued in logs/" + PREFETCH_QUEUE)
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+    elapsed = time.monotonic() - t0
+    print(f"— prefetch: {counts['ok']} ok, {counts['failed']} failed, "
+          f"{counts['bytes'] / 1e9:.1f} GB in {elapsed:.0f}s "
+          f"({counts['bytes'] / max(elapsed, 1e-6) / 1e6:.1f} MB/s)")
+    return counts["ok"], counts["failed"]
+
+
 JOB_RE = re.compile(r"Job\s*<(?P<id>\d+)>", re.I)
 
 
-def submit_fastq_dump(cancer_dir: Path, srr: str) -> Optional[str]:
-    """Submit an LSF job that uses fasterq-dump + pigz for speed (by SRR ID).
+# Conversion engines (FQD_ENGINE):
+#   tmpdir – fasterq-dump into $LS_TMPDIR, compress there, mv back (default)
+#   pipe   – fastq-dump streams through FIFOs straight into the compressors, next
+#            to the destination; no uncompressed FASTQ ever hits a disk
+FQD_ENGINES = ("tmpdir", "pipe")
 
-    This version embeds absolute paths to the tools resolved at submit time so that
-    jobs launched under LSF see the correct binaries even without re-activating conda.
+
+def _stage_helpers(engine: str, srr: str) -> List[str]:
+    """bash helpers that append '<engine> <stage> <seconds> <bytes>' rows to logs/fastq_<SRR>.stages.tsv."""
+    return [
+        f'ST=logs/fastq_{srr}.stages.tsv;',
+        'printf "engine\\tstage\\tseconds\\tbytes\\n" > "$ST";',
+        'now() { date +%s.%N; };',
+        'fsize() { stat -c %s "$@" 2>/dev/null | awk "{s+=\\$1} END{print s+0}"; };',
+        f'stage() {{ printf "{engine}\\t%s\\t%s\\t%s\\n" "$1" "$(awk -v a="$2" -v b="$(now)" "BEGIN{{printf \\"%.1f\\", b-a}}")" "$3" >> "$ST"; }};',
+    ]
+
+
+def _manifest_helpers(srr: str) -> List[str]:
+    """bash helper: manifest <file.gz> <hashfile> <linesfile> writes logs/manifest/<file>.tsv.
+
+    The compressor output is teed through md5sum/sha256sum (FQD_MANIFEST_HASH)
+    as it is written, so the digest costs no extra read of the .fastq.gz.
     """
-    job_name = f"fastq_{srr}"
-    threads = int(os.environ.get("FQD_THREADS", "4"))
+    cols = '"$d" ""' if MANIFEST_HASH == "md5" else '"" "$d"'
+    return [
+        'mkdir -p logs/manifest;',
+        'manifest() { [[ -f "$1" ]] || return 0; local d n;',
+        '  d=$(cut -d" " -f1 "$2"); n=$(( $(awk "{print \\$1}" "$3" 2>/dev/null || echo 0) / 4 ));',
+        '  printf "%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n" "$1" "$(stat -c %s "$1")" "$(stat -c %Y "$1")" '
+        f'{cols} "$n" "lsf:${{LSB_JOBID:-local}}" "$(date +%s)" > "logs/manifest/$1.tsv.tmp"; mv -f "logs/manifest/$1.tsv.tmp" "logs/manifest/$1.tsv"; }};',
+    ]
 
+
+def _sra_cleanup_lines(srr: str) -> List[str]:
+    # remove source SRA only if outputs look sane
+    return [
+        # (plain rm -f so a missing .sralite does not make a good job exit 1)
+        f'if [[ -s "{srr}_1.fastq.gz" && ( ! -e "{srr}_2.fastq.gz" || -s "{srr}_2.fastq.gz" ) ]]; then ',
+        f'  rm -f "{srr}.sra" "{srr}.sralite";',
+        'fi;'
+    ]
+
+
+def fastq_dump_body(cancer_dir: Path, srr: str, threads: int, engine: str = "tmpdir") -> str:
+    """Build the bash body of a conversion job for the chosen engine.
+
+    Absolute paths to the tools are resolved at submit time so that jobs
+    launched under LSF see the correct binaries even without re-activating conda.
+    """
+    if engine not in FQD_ENGINES:
+        raise ValueError(f"Unknown FQD_ENGINE {engine!r}; expected one of {FQD_ENGINES}")
     # Resolve absolute binaries from the current environment (e.g., your conda env)
-    fqd_bin = shutil.which("fasterq-dump") or "fasterq-dump"
     pigz_bin = shutil.which("pigz")  # may be None
     gzip_bin = shutil.which("gzip") or "gzip"
 
@@ -225,46 +1119,301 @@ def submit_fastq_dump(cancer_dir: Path, srr: str) -> Optional[str]:
     pigz_executable_arg = shlex.quote(pigz_bin or "/bin/false")
     cmp_if_pigz = shlex.quote(pigz_bin or gzip_bin)
     cmp_else_gzip = shlex.quote(gzip_bin)
-
-    # Build a safe bash body; we pass SRR accession (not filename) to ensure proper output names
-    # Use --temp to keep fasterq-dump scratch local to the chosen TMPD
-    bash_body = " ".join([
+    choose_cmp = (f'if [[ -n {pigz_nonempty_arg} ]] && [[ -x {pigz_executable_arg} ]]; '
+                  f'then CMP={cmp_if_pigz}; CMPARGS="-p {threads}"; else CMP={cmp_else_gzip}; CMPARGS=""; fi;')
+    hasher = shlex.quote(shutil.which(f"{MANIFEST_HASH}sum") or f"{MANIFEST_HASH}sum")
+    head = [
         "set -euo pipefail;",
         f"cd {shlex.quote(str(cancer_dir))};",
         "mkdir -p logs || true;",
-        f'TMPD="${{LS_TMPDIR:-${{TMPDIR:-/tmp}}}}/fqd_{srr}_$RANDOM";',
-        'mkdir -p "$TMPD";',
-        f"{shlex.quote(fqd_bin)} --split-files --threads {threads} --temp \"$TMPD\" -O \"$TMPD\" {shlex.quote(srr)};",
-        # Choose compressor
-        f'if [[ -n {pigz_nonempty_arg} ]] && [[ -x {pigz_executable_arg} ]]; then CMP={cmp_if_pigz}; else CMP={cmp_else_gzip}; fi;',
-        f'[[ -f "$TMPD/{srr}_1.fastq" ]] && "$CMP" -p {threads} "$TMPD/{srr}_1.fastq" 2>/dev/null || "$CMP" "$TMPD/{srr}_1.fastq" || true;',
-        f'[[ -f "$TMPD/{srr}_2.fastq" ]] && "$CMP" -p {threads} "$TMPD/{srr}_2.fastq" 2>/dev/null || "$CMP" "$TMPD/{srr}_2.fastq" || true;',
-        'mv "$TMPD"/*.fastq.gz . || true;',
-        'rm -rf "$TMPD";',
-        # remove source SRA only if outputs look sane
-        f'if [[ -s "{srr}_1.fastq.gz" && ( ! -e "{srr}_2.fastq.gz" || -s "{srr}_2.fastq.gz" ) ]]; then ',
-        f'  [[ -f "{srr}.sra" ]] && rm -f "{srr}.sra";',
-        f'  [[ -f "{srr}.sralite" ]] && rm -f "{srr}.sralite";',
-        'fi;'
-    ])
-
-    cmd = [
-        "bsub",
-        "-J", job_name,
-        "-oo", str((cancer_dir / "logs" / f"fastq_{srr}.out.txt")),
-        "-eo", str((cancer_dir / "logs" / f"fastq_{srr}.err.txt")),
-        "-cwd", str(cancer_dir),
-        "-n", str(threads),
-        # Uncomment/adjust if your site enforces memory requests
-        # "-M", "64000", "-R", f"rusage[mem={64000}] span[hosts=1]",
-        "bash", "-lc",
-        bash_body
-    ]
-    cp = run(cmd, capture=True)
-    if cp.returncode != 0:
+    ] + _stage_helpers(engine, srr) + _manifest_helpers(srr)
+
+    if engine == "tmpdir":
+        fqd_bin = shutil.which("fasterq-dump") or "fasterq-dump"
+        # We pass the SRR accession (not filename) to ensure proper output names;
+        # --temp keeps fasterq-dump scratch local to the chosen TMPD
+        body = head + [
+            f'TMPD="${{LS_TMPDIR:-${{TMPDIR:-/tmp}}}}/fqd_{srr}_$RANDOM";',
+            'mkdir -p "$TMPD";',
+            'T=$(now);',
+            f"{shlex.quote(fqd_bin)} --split-files --threads {threads} --temp \"$TMPD\" -O \"$TMPD\" {shlex.quote(srr)};",
+            'stage dump "$T" "$(fsize "$TMPD"/*.fastq)";',
+            choose_cmp,
+            'T=$(now);',
+            # FASTQ → tee (→ wc -l for records) → compressor → tee (→ hasher) → .fastq.gz
+            'for m in 1 2; do',
+            f'  F="$TMPD/{srr}_$m.fastq"; [[ -f "$F" ]] || continue;',
+            '  mkfifo "$F.fifo"; wc -l < "$F.fifo" > "$TMPD/n_$m" & WP=$!;',
+            f'  tee "$F.fifo" < "$F" | "$CMP" $CMPARGS -c | tee "$F.gz" | {hasher} > "$TMPD/h_$m";',
+            '  wait $WP; rm -f "$F" "$F.fifo";',
+            'done;',
+            'stage compress "$T" "$(fsize "$TMPD"/*.fastq.gz)";',
+            'T=$(now);',
+            'mv "$TMPD"/*.fastq.gz . || true;',
+            f'stage move "$T" "$(fsize {srr}_*.fastq.gz)";',
+            f'for m in 1 2; do manifest "{srr}_$m.fastq.gz" "$TMPD/h_$m" "$TMPD/n_$m"; done;',
+            'rm -rf "$TMPD";',
+        ]
+    else:
+        fqd_bin = shutil.which("fastq-dump") or "fastq-dump"
+        # Work dir sits next to the destination so the final mv is an atomic rename.
+        # Each mate: fastq-dump → FIFO → tee (→ wc for raw bytes/lines) → FIFO → compressor.
+        # fds 3/4 hold the FIFO write ends open so single-end runs still see EOF on _2.
+        body = head + [
+            choose_cmp,
+            f'W=".fqd_{srr}_$$"; mkdir -p "$W"; trap \'rm -rf "$W"\' EXIT;',
+            'PIDS="";',
+            'for m in 1 2; do',
+            f'  mkfifo "$W/{srr}_$m.fastq" "$W/z_$m";',
+            f'  "$CMP" $CMPARGS -c < "$W/z_$m" | tee "$W/{srr}_$m.fastq.gz" | {hasher} > "$W/h_$m" & PIDS="$PIDS $!";',
+            f'  tee "$W/z_$m" < "$W/{srr}_$m.fastq" | wc -lc > "$W/n_$m" & PIDS="$PIDS $!";',
+            'done;',
+            f'exec 3<>"$W/{srr}_1.fastq" 4<>"$W/{srr}_2.fastq";',
+            'T=$(now);',
+            f"{shlex.quote(fqd_bin)} --split-files -O \"$W\" {shlex.quote(srr)};",
+            'exec 3>&- 4>&-;',
+            'T1=$(now);',
+            'for p in $PIDS; do wait $p; done;',
+            'stage dump+compress "$T" "$(awk "{s+=\\$2} END{print s+0}" "$W"/n_1 "$W"/n_2)";',
+            'stage compress_tail "$T1" "$(fsize "$W"/*.fastq.gz)";',
+            f'[[ "$(awk "{{print \\$2}}" "$W/n_2")" -gt 0 ]] || rm -f "$W/{srr}_2.fastq.gz";',
+            'T=$(now);',
+            f'for m in 1 2; do [[ -f "$W/{srr}_$m.fastq.gz" ]] && mv -f "$W/{srr}_$m.fastq.gz" "{srr}_$m.fastq.gz"; done;',
+            f'stage rename "$T" "$(fsize {srr}_*.fastq.gz)";',
+            f'for m in 1 2; do [[ -f "$W/{srr}_$m.fastq.gz" ]] || manifest "{srr}_$m.fastq.gz" "$W/h_$m" "$W/n_$m"; done;',
+        ]
+    return " ".join(body + _sra_cleanup_lines(srr))
+
+
+# ----------------------------
+# Conversion job sizing
+# ----------------------------
+# FQD_SIZE_JOBS=0 restores the fixed FQD_THREADS / no -M,-W submissions
+FQD_SIZE_JOBS = os.environ.get("FQD_SIZE_JOBS", "1") != "0"
+RESOURCES_NAME = "fastq_resources.tsv"  # under <cancer_dir>/logs/
+
+
+@dataclass
+class SizeTier:
+    max_gb: float       # .sra size upper bound for this tier
+    threads: int
+    mem_mb: int
+    walltime_min: int
+
+
+# Starting points before any history exists; FQD_TIERS=<tsv> replaces them
+# (columns: max_gb threads mem_mb walltime_min)
+SIZE_TIERS = [
+    SizeTier(1, 2, 4000, 120),
+    SizeTier(5, 4, 8000, 240),
+    SizeTier(15, 8, 16000, 480),
+    SizeTier(40, 12, 32000, 1440),
+    SizeTier(float("inf"), 16, 64000, 2880),
+]
+
+
+def load_size_tiers(path: Optional[str] = None) -> List[SizeTier]:
+    path = path or os.environ.get("FQD_TIERS")
+    if not path:
+        return SIZE_TIERS
+    tiers: List[SizeTier] = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            tiers.append(SizeTier(float(row["max_gb"]), int(row["threads"]),
+                                  int(row["mem_mb"]), int(row["walltime_min"])))
+    return sorted(tiers, key=lambda t: t.max_gb) or SIZE_TIERS
+
+
+@dataclass
+class JobResources:
+    threads: int
+    mem_mb: int = 0          # 0 = no -M/rusage request
+    walltime_min: int = 0    # 0 = no -W
+    sra_bytes: int = 0
+    basis: str = "fixed"     # "fixed" | "tier" | "learned (n)"
+
+    def lsf_args(self) -> List[str]:
+        args: List[str] = []
+        if self.mem_mb:
+            args += ["-M", str(self.mem_mb), "-R", f"rusage[mem={self.mem_mb}] span[hosts=1]"]
+        if self.walltime_min:
+            args += ["-W", f"{self.walltime_min // 60}:{self.walltime_min % 60:02d}"]
+        return args
+
+    def label(self) -> str:
+        if not self.mem_mb:
+            return f"{self.threads}t"
+        return (f"{self.threads}t/{self.mem_mb / 1000:.0f}G/"
+                f"{self.walltime_min // 60}:{self.walltime_min % 60:02d} {self.basis}")
+
+
+def parse_lsf_summary(text: str) -> Optional[Dict[str, object]]:
+    """Outcome, max memory (MB), run and CPU time (s) from an LSF output file.
+
+    Uses the last report in the file (lsf_accounting.last_report). None when
+    the job has not finished yet.
+    """
+    rec = last_report(text)
+    if rec is None:
         return None
-    m = JOB_RE.search((cp.stdout or "") + (cp.stderr or ""))
-    return m.group("id") if m else None
+    out: Dict[str, object] = {"outcome": rec.outcome}
+    for key in ("max_mem_mb", "run_s", "cpu_s"):
+        if getattr(rec, key) is not None:
+            out[key] = getattr(rec, key)
+    return out
+
+
+@dataclass
+class JobObservation:
+    srr: str
+    sra_bytes: int
+    threads: int
+    req_mem_mb: int
+    walltime_min: int
+    max_mem_mb: float
+    run_s: float
+    outcome: str  # ok | memlimit | runlimit | killed | exit
+
+
+class ResourceHistory:
+    """logs/fastq_resources.tsv – what finished conversions requested and used."""
+
+    COLUMNS = ["srr", "sra_bytes", "threads", "req_mem_mb", "walltime_min",
+               "max_mem_mb", "run_s", "outcome", "finished_at"]
+
+    def __init__(self, observations: Optional[List[JobObservation]] = None):
+        self.observations = observations or []
+
+    @staticmethod
+    def path(cancer_dir: Path) -> Path:
+        return cancer_dir / "logs" / RESOURCES_NAME
+
+    @classmethod
+    def load(cls, cancer_dirs: List[Path]) -> "ResourceHistory":
+        """Observations from every given cohort (project‑wide learning with --root)."""
+        obs: List[JobObservation] = []
+        for d in cancer_dirs:
+            p = cls.path(d)
+            if not p.exists():
+                continue
+            with p.open(newline="") as f:
+                for r in csv.DictReader(f, delimiter="\t"):
+                    try:
+                        obs.append(JobObservation(r["srr"], int(r["sra_bytes"]), int(r["threads"]),
+                                                  int(r["req_mem_mb"]), int(r["walltime_min"]),
+                                                  float(r["max_mem_mb"]), float(r["run_s"]),
+                                                  r["outcome"]))
+                    except (KeyError, ValueError):
+                        continue
+        return cls(obs)
+
+    @classmethod
+    def harvest(cls, cancer_dir: Path, finished: List["JournalEntry"]) -> int:
+        """Append observations for finished journal entries from their LSF reports."""
+        rows = []
+        for e in finished:
+            try:
+                summary = parse_lsf_summary(
+                    (cancer_dir / "logs" / f"fastq_{e.srr}.out.txt").read_text(errors="replace"))
+            except OSError:
+                continue
+            if not summary or not e.sra_bytes:
+                continue
+            rows.append([e.srr, e.sra_bytes, e.threads, e.mem_mb, e.walltime_min,
+                         f"{summary.get('max_mem_mb', 0):.0f}", f"{summary.get('run_s', 0):.0f}",
+                         summary["outcome"], f"{time.time():.0f}"])
+        if rows and not get_executor().dry_run:
+            p = cls.path(cancer_dir)
+            p.parent.mkdir(parents=True, exist_ok=True)
+            new = not p.exists()
+            with p.open("a", newline="") as f:
+                w = csv.writer(f, delimiter="\t", lineterminator="\n")
+                if new:
+                    w.writerow(cls.COLUMNS)
+                w.writerows(rows)
+        return len(rows)
+
+    def size(self, sra_bytes: int, tiers: Optional[List[SizeTier]] = None) -> JobResources:
+        """Threads from the size tier; memory and walltime learned from finished
+        jobs in the same tier when there are any.
+
+        Memory: 1.25× the largest peak seen (+512 MB), doubled past any request
+        that hit TERM_MEMLIMIT. Walltime: 1.5× the slowest seconds‑per‑GB seen,
+        scaled to this run, doubled past any TERM_RUNLIMIT request.
+        """
+        tiers = tiers or load_size_tiers()
+        gb = sra_bytes / 1e9
+        tier = next(t for t in tiers if gb <= t.max_gb) if gb <= tiers[-1].max_gb else tiers[-1]
+        lo = max((t.max_gb for t in tiers if t.max_gb < tier.max_gb), default=0)
+        same = [o for o in self.observations if lo < o.sra_bytes / 1e9 <= tier.max_gb]
+        ok = [o for o in same if o.outcome == "ok" and o.max_mem_mb > 0]
+        mem, wall, basis = tier.mem_mb, tier.walltime_min, "tier"
+        if ok:
+            mem = int(max(o.max_mem_mb for o in ok) * 1.25 + 512)
+            rate = max(o.run_s / max(o.sra_bytes / 1e9, 0.1) for o in ok)
+            wall = int(rate * max(gb, 0.1) * 1.5 / 60) + 15
+            basis = f"learned ({len(ok)})"
+        for o in same:
+            if o.outcome == "memlimit" and o.req_mem_mb >= mem:
+                mem, basis = 2 * o.req_mem_mb, f"learned ({len(ok)}+kill)"
+            if o.outcome == "runlimit" and o.walltime_min >= wall:
+                wall, basis = 2 * o.walltime_min, f"learned ({len(ok)}+kill)"
+        mem = max(1000, (mem + 999) // 1000 * 1000)
+        wall = max(30, wall)
+        threads = int(os.environ["FQD_THREADS"]) if "FQD_THREADS" in os.environ else tier.threads
+        return JobResources(threads=threads, mem_mb=mem, walltime_min=wall,
+                            sra_bytes=sra_bytes, basis=basis)
+
+
+def size_conversion(cancer_dir: Path, srr: str, history: Optional[ResourceHistory] = None,
+                    sra_bytes: Optional[int] = None) -> JobResources:
+    """Resources for one fastq_<SRR> job (legacy fixed sizing with FQD_SIZE_JOBS=0)."""
+    if sra_bytes is None:
+        sra = _find_sra(cancer_dir, srr)
+        sra_bytes = sra.stat().st_size if sra else 0
+    if not FQD_SIZE_JOBS:
+        return JobResources(threads=int(os.environ.get("FQD_THREADS", "4")), sra_bytes=sra_bytes)
+    history = history if history is not None else ResourceHistory.load([cancer_dir])
+    return history.size(sra_bytes)
+
+
+def fastq_dump_job(cancer_dir: Path, srr: str, engine: Optional[str] = None,
+                   resources: Optional[JobResources] = None) -> JobSpec:
+    """The conversion job (fastq_<SRR>) for one SRR using the FQD_ENGINE engine.
+
+    Per-stage wall time and bytes land in logs/fastq_<SRR>.stages.tsv so the
+    engines can be compared on the same SRRs. Threads, -M/rusage and -W come
+    from size_conversion() unless ``resources`` is given.
+    """
+    res = resources or size_conversion(cancer_dir, srr)
+    bash_body = fastq_dump_body(cancer_dir, srr, res.threads,
+                                engine or os.environ.get("FQD_ENGINE", "tmpdir"))
+    return JobSpec(
+        name=f"fastq_{srr}",
+        body=bash_body,
+        cwd=cancer_dir,
+        out=cancer_dir / "logs" / f"fastq_{srr}.out.txt",
+        err=cancer_dir / "logs" / f"fastq_{srr}.err.txt",
+        threads=res.threads,
+        lsf_args=res.lsf_args(),
+    )
+
+
+def submit_fastq_dump(cancer_dir: Path, srr: str, engine: Optional[str] = None,
+                      resources: Optional[JobResources] = None) -> Optional[str]:
+    """Submit one conversion job; see fastq_dump_job()."""
+    return get_executor().submit(fastq_dump_job(cancer_dir, srr, engine, resources))
+
+
+def submit_fastq_dumps(cancer_dir: Path, sized: List[Tuple[str, JobResources]],
+                       engine: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """Submit a cohort's conversions as one batch (job array per resource tier).
+
+    Returns {srr: job id or None}; array elements come back as "<jobid>[<i>]".
+    """
+    specs = [fastq_dump_job(cancer_dir, srr, engine, res) for srr, res in sized]
+    ids = get_executor().submit_batch(f"fastq_{cancer_dir.name}", specs)
+    return {srr: jid for (srr, _res), jid in zip(sized, ids)}
 
 
 def bjobs_status(job_id: str) -> str:
@@ -273,12 +1422,377 @@ def bjobs_status(job_id: str) -> str:
         return "UNKNOWN"
     return (cp.stdout or "").strip() or "UNKNOWN"
 
+
+@dataclass
+class LSFJob:
+    job_id: str
+    name: str
+    stat: str
+    exit_code: str = "-"
+
+
+def bjobs_bulk(name_pattern: str = "fastq_*") -> Optional[Dict[str, LSFJob]]:
+    """One `bjobs -a` call for every job matching name_pattern.
+
+    Returns {job_name: newest job}; None when bjobs itself failed (as opposed
+    to simply finding no jobs).
+    """
+    try:
+        with METRICS.phase("bjobs"):
+            cp = run(["bjobs", "-a", "-noheader", "-o", "jobid job_name stat exit_code",
+                      "-J", name_pattern], capture=True)
+        METRICS.count("bjobs_calls")
+    except OSError:
+        return None  # no LSF client on this host
+    out = cp.stdout or ""
+    if cp.returncode != 0 and "No " not in (cp.stderr or "") + out:
+        return None
+    jobs: Dict[str, LSFJob] = {}
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) < 3 or not parts[0].isdigit():
+            continue  # "No job found" etc.
+        job = LSFJob(job_id=parts[0], name=parts[1], stat=parts[2],
+                     exit_code=parts[3] if len(parts) > 3 else "-")
+        m = ARRAY_NAME_RE.match(job.name)
+        if m:  # array element "<array>[i]": id it like lsf_submit does, "<jobid>[i]"
+            job.job_id = f"{job.job_id}[{m.group('index')}]"
+        prev = jobs.get(job.name)
+        if prev is None or _base_job_id(job.job_id) > _base_job_id(prev.job_id):
+            jobs[job.name] = job
+    return jobs
+
+
+def _base_job_id(job_id: str) -> int:
+    return int(job_id.split("[", 1)[0])
+
+
+def array_member_jobs(cancer_dir: Path, jobs: Dict[str, LSFJob]) -> Dict[str, LSFJob]:
+    """Re-key array elements submitted from this cohort by their task name.
+
+    "fastq_<cohort>_<ts>[3]" becomes "fastq_<SRR>" via the array's index file
+    (logs/arrays/<array>.tsv); elements of other cohorts' arrays are dropped.
+    """
+    out: Dict[str, LSFJob] = {}
+    index: Dict[str, Dict[str, str]] = {}
+    for name, job in jobs.items():
+        m = ARRAY_NAME_RE.match(name)
+        if not m:
+            out[name] = job
+            continue
+        if m.group("name") not in index:
+            index[m.group("name")] = array_tasks(cancer_dir / "logs", m.group("name"))
+        key = index[m.group("name")].get(m.group("index"))
+        if key is not None:
+            prev = out.get(key)
+            if prev is None or _base_job_id(job.job_id) > _base_job_id(prev.job_id):
+                out[key] = job
+    return out
+
+# ----------------------------
+# Executor backends
+# ----------------------------
+
+@dataclass
+class JobSpec:
+    name: str
+    body: str        # bash script, run as `bash -lc <body>`
+    cwd: Path
+    out: Path
+    err: Path
+    threads: int = 1
+    lsf_args: List[str] = field(default_factory=list)  # extra bsub flags (-M, -R, -W ...)
+
+
+class Executor(abc.ABC):
+    """Where core actions run.
+
+    submit() queues a batch job and returns its id (None on failure); run()
+    executes a short command synchronously (prefetch); jobs() reports job
+    states like bjobs_bulk(); wait() blocks until submitted jobs finish.
+    ``sees_lsf`` is False for backends whose jobs() cannot report LSF job ids,
+    so journal entries written by an LSF run are left alone.
+    """
+    name = "base"
+    dry_run = False
+    sees_lsf = True
+
+    @abc.abstractmethod
+    def submit(self, job: JobSpec) -> Optional[str]:
+        """Queue one job; returns its id, or None if it could not be submitted."""
+
+    def run(self, cmd: List[str], cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
+        return run(cmd, cwd=cwd, capture=True)
+
+    def submit_batch(self, batch: str, jobs: List[JobSpec]) -> List[Optional[str]]:
+        """Submit several jobs at once; ids come back in the order given."""
+        return [self.submit(job) for job in jobs]
+
+    def jobs(self, name_pattern: str = "fastq_*") -> Optional[Dict[str, LSFJob]]:
+        return bjobs_bulk(name_pattern)
+
+    def wait(self) -> None:
+        pass
+
+
+class LSFExecutor(Executor):
+    """Today's behaviour: bsub for jobs, subprocess for prefetch."""
+    name = "lsf"
+
+    def submit(self, job: JobSpec) -> Optional[str]:
+        cmd = [
+            "bsub",
+            "-J", job.name,
+            "-oo", str(job.out),
+            "-eo", str(job.err),
+            "-cwd", str(job.cwd),
+            "-n", str(job.threads),
+            *job.lsf_args,
+            "bash", "-lc",
+            job.body
+        ]
+        t0 = time.perf_counter()
+        cp = run(cmd, capture=True)
+        METRICS.add_time("bsub", time.perf_counter() - t0)
+        METRICS.count("bsub_calls")
+        if cp.returncode != 0:
+            METRICS.count("bsub_failures")
+            return None
+        m = JOB_RE.search((cp.stdout or "") + (cp.stderr or ""))
+        return m.group("id") if m else None
+
+    def submit_batch(self, batch: str, jobs: List[JobSpec]) -> List[Optional[str]]:
+        """One job array (or bsub -pack) per resource tier, per LSF_SUBMIT_MODE."""
+        if LSF_SUBMIT_MODE == "single" or len(jobs) < 2:
+            return super().submit_batch(batch, jobs)
+        groups: Dict[Tuple[str, int, Tuple[str, ...]], List[JobSpec]] = {}
+        for job in jobs:
+            groups.setdefault((str(job.cwd), job.threads, tuple(job.lsf_args)), []).append(job)
+        ids: Dict[str, Optional[str]] = {}
+        for (cwd, threads, lsf_args), group in groups.items():
+            tasks = [Task(key=j.name, command=j.body, out=str(j.out), err=str(j.err), name=j.name)
+                     for j in group]
+            t0 = time.perf_counter()
+            got = submit_tasks(tasks, Resources(threads=threads, extra=list(lsf_args)), Path(cwd),
+                               name=f"{batch}_n{threads}", mode=LSF_SUBMIT_MODE)
+            METRICS.add_time("bsub", time.perf_counter() - t0)
+            METRICS.count("bsub_calls")
+            METRICS.count("bsub_failures", sum(1 for v in got.values() if v is None))
+            ids.update(got)
+        return [ids.get(job.name) for job in jobs]
+
+
+def _run_local_job(body: str, cwd: str, out: str, err: str) -> int:
+    """ProcessPool worker: run one job body with LSF-style -oo/-eo log files."""
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as fo, open(err, "w") as fe:
+        return subprocess.run(["bash", "-lc", body], cwd=cwd, stdout=fo, stderr=fe).returncode
+
+
+class LocalExecutor(Executor):
+    """Run job bodies on this machine with N concurrent workers (no LSF needed)."""
+    name = "local"
+    sees_lsf = False
+
+    def __init__(self, jobs: int = 4):
+        self.pool = ProcessPoolExecutor(max_workers=max(1, jobs))
+        self.futures: Dict[str, Tuple[str, "Future[int]"]] = {}  # job_id -> (name, future)
+        self.counter = 0
+
+    def submit(self, job: JobSpec) -> Optional[str]:
+        self.counter += 1
+        job_id = f"local-{os.getpid()}-{self.counter}"
+        fut = self.pool.submit(_run_local_job, job.body, str(job.cwd), str(job.out), str(job.err))
+        self.futures[job_id] = (job.name, fut)
+        return job_id
+
+    def jobs(self, name_pattern: str = "fastq_*") -> Optional[Dict[str, LSFJob]]:
+        out: Dict[str, LSFJob] = {}
+        for job_id, (name, fut) in self.futures.items():
+            if not fnmatch.fnmatchcase(name, name_pattern):
+                continue
+            if not fut.done():
+                stat, code = ("RUN" if fut.running() else "PEND"), "-"
+            else:
+                rc = fut.exception() and 1 or fut.result()
+                stat, code = ("DONE" if rc == 0 else "EXIT"), str(rc)
+            out[name] = LSFJob(job_id=job_id, name=name, stat=stat, exit_code=code)
+        return out
+
+    def wait(self) -> None:
+        if not self.futures:
+            return
+        print(f"Waiting for {len(self.futures)} local jobs…")
+        for job_id, (name, fut) in self.futures.items():
+            rc = fut.exception() and 1 or fut.result()
+            print(("✓" if rc == 0 else "✗"), name, job_id, "" if rc == 0 else f"(exit {rc})")
+        self.pool.shutdown()
+        self.futures.clear()
+
+
+class DryRunExecutor(Executor):
+    """Record every command instead of running it."""
+    name = "dry-run"
+    dry_run = True
+    sees_lsf = False
+
+    def __init__(self):
+        self.commands: List[List[str]] = []
+
+    def submit(self, job: JobSpec) -> Optional[str]:
+        self.commands.append(["bsub", "-J", job.name, "-n", str(job.threads), *job.lsf_args,
+                              "bash", "-lc", job.body])
+        print(f"[dry-run] submit {job.name}")
+        return f"dry-{len(self.commands)}"
+
+    def run(self, cmd: List[str], cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
+        self.commands.append(list(cmd))
+        print(f"[dry-run] {shlex.join(cmd)}" + (f"  (in {cwd})" if cwd else ""))
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    def jobs(self, name_pattern: str = "fastq_*") -> Optional[Dict[str, LSFJob]]:
+        return {}
+
+
+EXECUTORS = {"lsf": LSFExecutor, "local": LocalExecutor, "dry-run": DryRunExecutor}
+_EXECUTOR: Executor = LSFExecutor()
+
+
+def get_executor() -> Executor:
+    return _EXECUTOR
+
+
+def set_executor(executor: Executor) -> Executor:
+    """Install the backend used by prefetch()/submit_fastq_dump(); returns it."""
+    global _EXECUTOR
+    _EXECUTOR = executor
+    return executor
+
+
+def make_executor(name: str, jobs: int = 4) -> Executor:
+    if name == "local":
+        return LocalExecutor(jobs)
+    return EXECUTORS[name]()
+
+# ----------------------------
+# Submission journal
+# ----------------------------
+JOURNAL_NAME = "submit_journal.tsv"  # under <cancer_dir>/logs/
+# When LSF cannot be queried, trust journal entries for at most this long
+JOURNAL_MAX_AGE = 7 * 24 * 3600
+LSF_JOB_ID_RE = re.compile(r"^\d+(\[\d+\])?$")  # "123" or "123[4]"
+
+
+@dataclass
+class JournalEntry:
+    srr: str
+    job_id: str
+    submitted_at: float
+    state: str = "SUBMITTED"
+    sra_bytes: int = 0        # what the job was sized for (see ResourceHistory)
+    threads: int = 0
+    mem_mb: int = 0
+    walltime_min: int = 0
+
+
+class SubmitJournal:
+    """logs/submit_journal.tsv – conversions submitted but not yet reconciled.
+
+    Columns: srr, job_id, submitted_at (epoch), state (last LSF state seen),
+    then the requested sra_bytes, threads, mem_mb, walltime_min. Entries that
+    finish are harvested into logs/fastq_resources.tsv on save().
+    """
+
+    def __init__(self, cancer_dir: Path):
+        self.cancer_dir = cancer_dir
+        self.path = cancer_dir / "logs" / JOURNAL_NAME
+        self.entries: Dict[str, JournalEntry] = {}
+        self.finished: List[JournalEntry] = []
+        if self.path.exists():
+            for line in self.path.read_text().splitlines():
+                parts = line.split("\t")
+                if len(parts) < 4 or parts[0] == "srr":
+                    continue
+                try:
+                    sized = [int(x) for x in parts[4:8]] if len(parts) >= 8 else []
+                    self.entries[parts[0]] = JournalEntry(parts[0], parts[1], float(parts[2]),
+                                                          parts[3], *sized)
+                except ValueError:
+                    continue
+
+    def record(self, srr: str, job_id: str, res: Optional[JobResources] = None) -> None:
+        e = JournalEntry(srr, job_id, time.time())
+        if res is not None:
+            e.sra_bytes, e.threads, e.mem_mb, e.walltime_min = (res.sra_bytes, res.threads,
+                                                                res.mem_mb, res.walltime_min)
+        self.entries[srr] = e
+
+    def reconcile(self, jobs: Optional[Dict[str, LSFJob]],
+                  srrs: Optional[Set[str]] = None) -> Dict[str, str]:
+        """Update states from a bjobs_bulk() result and prune finished entries.
+
+        Returns {srr: "jobid STAT"} for conversions still queued or running,
+        including live fastq_<SRR> jobs (restricted to ``srrs`` if given) that
+        never made it into the journal. With a local/dry-run executor, entries
+        carrying an LSF job id are kept as they are: its jobs() cannot see them.
+        """
+        running: Dict[str, str] = {}
+        now = time.time()
+        sees_lsf = get_executor().sees_lsf
+        if jobs is not None:
+            jobs = array_member_jobs(self.cancer_dir, jobs)
+        for srr, e in list(self.entries.items()):
+            job = jobs.get(f"fastq_{srr}") if jobs is not None else None
+            if not sees_lsf and LSF_JOB_ID_RE.match(e.job_id):
+                # Submitted by an LSF run: leave it for the next LSF reconcile
+                if now - e.submitted_at <= JOURNAL_MAX_AGE:
+                    running[srr] = f"{e.job_id} {e.state}?"
+            elif jobs is None:
+                # LSF unreachable: keep recent entries so nothing is resubmitted blindly
+                if now - e.submitted_at > JOURNAL_MAX_AGE:
+                    del self.entries[srr]
+                else:
+                    running[srr] = f"{e.job_id} {e.state}?"
+            elif job is not None and job.job_id == e.job_id and job.stat in LSF_ACTIVE:
+                e.state = job.stat
+                running[srr] = f"{job.job_id} {job.stat}"
+            else:
+                if job is not None and job.job_id == e.job_id:
+                    self.finished.append(e)  # DONE/EXIT: its LSF report is complete
+                del self.entries[srr]  # DONE/EXIT, or aged out of bjobs -a
+        for name, job in (jobs or {}).items():
+            srr = name[len("fastq_"):]
+            if (name.startswith("fastq_") and job.stat in LSF_ACTIVE and srr not in running
+                    and (srrs is None or srr in srrs)):
+                running[srr] = f"{job.job_id} {job.stat}"
+        return running
+
+    def save(self) -> None:
+        if get_executor().dry_run:
+            return
+        if self.finished:
+            ResourceHistory.harvest(self.cancer_dir, self.finished)
+            self.finished = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = ["srr\tjob_id\tsubmitted_at\tstate\tsra_bytes\tthreads\tmem_mb\twalltime_min"]
+        lines += [f"{e.srr}\t{e.job_id}\t{e.submitted_at:.0f}\t{e.state}\t"
+                  f"{e.sra_bytes}\t{e.threads}\t{e.mem_mb}\t{e.walltime_min}"
+                  for e in sorted(self.entries.values(), key=lambda e: e.srr)]
+        tmp = self.path.with_suffix(".tsv.tmp")
+        tmp.write_text("\n".join(lines) + "\n")
+        tmp.replace(self.path)
+
 # ----------------------------
 # Reporting & cleanup
 # ----------------------------
 
 def write_status_snapshot(cancer_dir: Path, samples: Dict[str, List[str]], inv: Dict[str, SRRInfo]) -> None:
     """Write sample_list.with_status.txt in the legacy 4‑column format."""
+    with METRICS.phase("snapshot"):
+        _write_status_snapshot(cancer_dir, samples, inv)
+
+
+def _write_status_snapshot(cancer_dir: Path, samples: Dict[str, List[str]], inv: Dict[str, SRRInfo]) -> None:
     out_lines: List[str] = []
     for sample, srrs in samples.items():
         r1_names: List[str] = []
@@ -317,6 +1831,160 @@ def write_status_snapshot(cancer_dir: Path, samples: Dict[str, List[str]], inv:
     dst = cancer_dir / "sample_list.with_status.txt"
     tmp.write_text("\n".join(out_lines) + "\n")
     tmp.replace(dst)
+    StatusStore.update_cohort(cancer_dir, samples, inv)
+
+# ----------------------------
+# Project status store
+# ----------------------------
+STATUS_DB_NAME = "poseidon_status.sqlite"
+STATUS_DB_TIMEOUT = float(os.environ.get("POSEIDON_STATUS_DB_TIMEOUT", "120"))  # seconds
+
+# Cross-cohort queries for `query`; every preset reads only the runs table.
+# runs.fastq_done is the text snapshot's rule (R1 ok, and R2 ok whenever an R2
+# file exists – a zero-byte R2 is not done), stored rather than re-derived.
+STATUS_QUERIES = {
+    "summary": (
+        "SELECT category, cohort, COUNT(*) AS runs,"
+        " SUM(fastq_done) AS fastq_done,"
+        " SUM(sra_ok AND NOT r1_ok) AS sra_only,"
+        " SUM(NOT sra_ok AND NOT r1_ok) AS missing,"
+        " ROUND(SUM(sra_bytes + r1_bytes + r2_bytes) / 1e9, 1) AS gb"
+        " FROM runs GROUP BY category, cohort ORDER BY category, cohort"),
+    "sra-no-fastq": (
+        "SELECT category, cohort, sample, srr, sra_bytes FROM runs"
+        " WHERE sra_ok AND NOT fastq_done"
+        " ORDER BY category, cohort, srr"),
+    "missing": (
+        "SELECT category, cohort, sample, srr FROM runs"
+        " WHERE NOT sra_ok AND NOT r1_ok ORDER BY category, cohort, srr"),
+    "stale": (
+        "SELECT c.category, c.cohort, datetime(c.last_checked, 'unixepoch', 'localtime') AS last_checked"
+        " FROM cohorts c ORDER BY c.last_checked"),
+}
+
+
+def status_db_path(cancer_dir: Path) -> Tuple[Optional[Path], str, str]:
+    """(db path, category, cohort) for a cancer dir.
+
+    <root>/<Category>/<Cohort> shares <root>/poseidon_status.sqlite; other
+    layouts keep a private store in the cohort. POSEIDON_STATUS_DB overrides
+    the path ("off" disables the store).
+    """
+    env = os.environ.get("POSEIDON_STATUS_DB")
+    category = cancer_dir.parent.name if cancer_dir.parent.name in COHORT_CATEGORIES else ""
+    if env == "off":
+        return None, category, cancer_dir.name
+    if env:
+        return Path(env), category, cancer_dir.name
+    root = cancer_dir.parent.parent if category else cancer_dir
+    return root / STATUS_DB_NAME, category, cancer_dir.name
+
+
+class StatusStore:
+    """Typed per‑SRR status rows for every cohort, shared across the project.
+
+    The text snapshot stays the contract for downstream scripts; this store is
+    for cross‑cohort questions. Only rows whose flags or sizes changed are
+    rewritten, so their last_checked is the time the run last changed state;
+    cohorts.last_checked records the latest snapshot of each cohort.
+
+    Cohorts on different hosts share the file over network storage, so it
+    keeps the rollback journal (WAL's shared-memory index is not safe there)
+    and writers wait up to STATUS_DB_TIMEOUT seconds for the lock.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.conn = sqlite3.connect(str(path), timeout=STATUS_DB_TIMEOUT)
+        if self.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            self.conn.execute("PRAGMA journal_mode=DELETE")  # stores created by older versions
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " category TEXT NOT NULL, cohort TEXT NOT NULL, sample TEXT NOT NULL,"
+            " srr TEXT NOT NULL, sra_ok INTEGER NOT NULL, r1_ok INTEGER NOT NULL,"
+            " r2_ok INTEGER NOT NULL, sra_bytes INTEGER NOT NULL, r1_bytes INTEGER NOT NULL,"
+            " r2_bytes INTEGER NOT NULL, last_checked REAL NOT NULL,"
+            " fastq_done INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (category, cohort, sample, srr))")
+        cols = {r[1] for r in self.conn.execute("PRAGMA table_info(runs)")}
+        if "fastq_done" not in cols:
+            # Best guess for rows written before the column existed; the next
+            # sync of each cohort rewrites them with the snapshot rule
+            with self.conn:
+                self.conn.execute("ALTER TABLE runs ADD COLUMN fastq_done INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("UPDATE runs SET fastq_done = r1_ok AND (r2_bytes = 0 OR r2_ok)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS runs_srr ON runs (srr)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cohorts ("
+            " category TEXT NOT NULL, cohort TEXT NOT NULL, runs INTEGER NOT NULL,"
+            " last_checked REAL NOT NULL, PRIMARY KEY (category, cohort))")
+
+    def sync(self, category: str, cohort: str, samples: Dict[str, List[str]],
+             inv: Dict[str, SRRInfo]) -> Tuple[int, int]:
+        """Upsert changed rows and drop runs no longer listed; returns (changed, removed)."""
+        now = time.time()
+        old = {(sample, srr): tuple(row) for sample, srr, *row in self.conn.execute(
+            "SELECT sample, srr, sra_ok, r1_ok, r2_ok, sra_bytes, r1_bytes, r2_bytes, fastq_done"
+            " FROM runs WHERE category=? AND cohort=?", (category, cohort))}
+        changed = []
+        for sample, srrs in samples.items():
+            for srr in srrs:
+                i = inv[srr]
+                done = i.r1_ok and (i.r2 is None or i.r2_ok)  # as in _write_status_snapshot
+                row = (int(i.sra_ok), int(i.r1_ok), int(i.r2_ok), i.sra_bytes, i.r1_bytes, i.r2_bytes,
+                       int(done))
+                if old.pop((sample, srr), None) != row:
+                    changed.append((category, cohort, sample, srr, *row, now))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO runs (category, cohort, sample, srr, sra_ok, r1_ok, r2_ok,"
+                " sra_bytes, r1_bytes, r2_bytes, fastq_done, last_checked)"
+                " VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", changed)
+            self.conn.executemany("DELETE FROM runs WHERE category=? AND cohort=? AND sample=? AND srr=?",
+                                  [(category, cohort, sample, srr) for sample, srr in old])
+            self.conn.execute("INSERT OR REPLACE INTO cohorts VALUES (?,?,?,?)",
+                              (category, cohort, sum(len(v) for v in samples.values()), now))
+        return len(changed), len(old)
+
+    def query(self, sql: str) -> Tuple[List[str], List[tuple]]:
+        cur = self.conn.execute(sql)
+        return [d[0] for d in cur.description or []], cur.fetchall()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @classmethod
+    def update_cohort(cls, cancer_dir: Path, samples: Dict[str, List[str]],
+                      inv: Dict[str, SRRInfo]) -> None:
+        """Mirror one cohort snapshot into its store; never fails the caller."""
+        path, category, cohort = status_db_path(cancer_dir)
+        if path is None:
+            return
+        try:
+            store = cls(path)
+            try:
+                changed, removed = store.sync(category, cohort, samples, inv)
+            finally:
+                store.close()
+        except sqlite3.Error as e:
+            print(f"WARNING: status store {path} not updated ({e})")
+            return
+        METRICS.count("status_rows_changed", changed + removed)
+
+
+def do_query(db: Path, what: str) -> None:
+    """Print a preset (or raw SELECT) against the status store as TSV."""
+    if not db.exists():
+        raise SystemExit(f"No status store at {db}; run status/apply first")
+    store = StatusStore(db)
+    try:
+        cols, rows = store.query(STATUS_QUERIES.get(what, what))
+    finally:
+        store.close()
+    print("\t".join(cols))
+    for r in rows:
+        print("\t".join("" if v is None else str(v) for v in r))
+    print(f"— {len(rows)} rows", file=sys.stderr)
 
 
 def cleanup_sra_for_completed(cancer_dir: Path, inv: Dict[str, SRRInfo]) -> int:
@@ -325,68 +1993,667 @@ def cleanup_sra_for_completed(cancer_dir: Path, inv: Dict[str, SRRInfo]) -> int:
         if info.sra and info.sra.exists():
             fastq_done = info.r1_ok and (info.r2 is None or info.r2_ok)
             if fastq_done:
+                if get_executor().dry_run:
+                    print(f"[dry-run] rm {info.sra}")
+                    removed += 1
+                    continue
                 try:
                     info.sra.unlink()
                     removed += 1
                 except Exception:
                     pass
+    METRICS.count("sra_removed", removed)
     return removed
 
+# ----------------------------
+# Disk budget
+# ----------------------------
+# Uncompressed FASTQ bytes per .sra byte when runinfo has no base count
+FQD_RAW_PER_SRA = float(os.environ.get("FQD_RAW_PER_SRA", "6"))
+# Uncompressed FASTQ bytes per sequenced base (sequence + quality + headers)
+FQD_BYTES_PER_BASE = 2.2
+# .fastq.gz size as a fraction of the uncompressed FASTQ
+FQD_GZ_RATIO = float(os.environ.get("FQD_GZ_RATIO", "0.25"))
+# Space left untouched on the cohort filesystem
+RESERVE_GB = float(os.environ.get("POSEIDON_RESERVE_GB", "100"))
+
+
+@dataclass
+class Footprint:
+    srr: str
+    out: int     # .fastq.gz bytes landing in the cohort dir
+    tmp: int     # peak scratch: fasterq-dump temp + uncompressed FASTQ
+    source: str  # what the estimate is based on
+
+
+def load_runinfo(cancer_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """SRR → (size bytes, bases) from any *runinfo*.csv/tsv in the cohort dir."""
+    out: Dict[str, Tuple[int, int]] = {}
+    for path in sorted(cancer_dir.glob("*[Rr]un[Ii]nfo*.[ct]sv")):
+        try:
+            with path.open(newline="") as fh:
+                header = fh.readline()
+                fh.seek(0)
+                reader = csv.DictReader(fh, delimiter="\t" if "\t" in header else ",")
+                for row in reader:
+                    row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+                    srr = row.get("run") or row.get("run_accession")
+                    if not srr:
+                        continue
+                    try:
+                        size = int(float(row.get("size_mb") or 0) * 1024 * 1024)
+                        bases = int(float(row.get("bases") or row.get("base_count") or 0))
+                    except ValueError:
+                        continue
+                    out[srr] = (size, bases)
+        except OSError:
+            continue
+    return out
+
+
+def estimate_footprint(srr: str, sra_bytes: int, runinfo: Dict[str, Tuple[int, int]]) -> Footprint:
+    size, bases = runinfo.get(srr, (0, 0))
+    if bases:
+        raw, source = bases * FQD_BYTES_PER_BASE, "runinfo bases"
+    elif sra_bytes or size:
+        raw, source = max(sra_bytes, size) * FQD_RAW_PER_SRA, ".sra size" if sra_bytes else "runinfo size_MB"
+    else:
+        raw, source = 0, "unknown"
+    return Footprint(srr, out=int(raw * FQD_GZ_RATIO), tmp=int(raw * 2), source=source)
+
+
+def _free_bytes(path: Path) -> int:
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+def _quota_remaining(path: Path) -> Optional[int]:
+    """Bytes left in the user/fileset quota, via POSEIDON_QUOTA_CMD ('{path}' is substituted).
+
+    Quota tooling is site specific (mmlsquota, lfs quota, ...), so the command
+    just has to print the remaining bytes as its first token.
+    """
+    cmd = os.environ.get("POSEIDON_QUOTA_CMD")
+    if not cmd:
+        return None
+    try:
+        cp = subprocess.run(cmd.format(path=shlex.quote(str(path))), shell=True,
+                            capture_output=True, text=True, timeout=60)
+        return int(float((cp.stdout or "").split()[0]))
+    except (OSError, subprocess.SubprocessError, ValueError, IndexError):
+        print(f"WARNING: POSEIDON_QUOTA_CMD failed for {path}; using free space only")
+        return None
+
+
+def _gb(n: float) -> str:
+    return f"{n / 1e9:,.1f} GB"
+
+
+class DiskBudget:
+    """Space ledger for releasing conversions on one filesystem.
+
+    Output (.fastq.gz) needs are cumulative against min(free, quota) − reserve.
+    Scratch is per job on the execution host, so each job's tmp need is only
+    compared with $LS_TMPDIR's free space, and only when LS_TMPDIR is set.
+    """
+
+    def __init__(self, target: Path, reserve_gb: float = RESERVE_GB):
+        self.target = target
+        self.reserve = int(reserve_gb * 1e9)
+        self.free = _free_bytes(target)
+        self.quota = _quota_remaining(target)
+        self.available = min(self.free, self.quota if self.quota is not None else self.free) - self.reserve
+        tmp = os.environ.get("LS_TMPDIR")
+        self.tmp_dir = Path(tmp) if tmp else None
+        self.tmp_free = _free_bytes(self.tmp_dir) if self.tmp_dir and self.tmp_dir.is_dir() else None
+        self.in_flight = 0
+        self.released = 0
+        self.n_released = 0
+        self.deferred: List[Footprint] = []
+
+    def charge(self, fp: Footprint) -> None:
+        """Account for a conversion already running (its output is not written yet)."""
+        self.in_flight += fp.out
+
+    def take(self, fp: Footprint) -> bool:
+        if self.tmp_free is not None and fp.tmp > self.tmp_free:
+            self.deferred.append(fp)
+            return False
+        if self.in_flight + self.released + fp.out > self.available:
+            self.deferred.append(fp)
+            return False
+        self.released += fp.out
+        self.n_released += 1
+        return True
+
+    def lines(self) -> List[str]:
+        quota = f", quota left {_gb(self.quota)}" if self.quota is not None else ""
+        tmp = (f"{self.tmp_dir} free {_gb(self.tmp_free)}" if self.tmp_free is not None
+               else "LS_TMPDIR unset (scratch not checked)")
+        out = [f"— disk budget {self.target}: free {_gb(self.free)}{quota}, reserve {_gb(self.reserve)}",
+               f"    in flight {_gb(self.in_flight)}, released {self.n_released} ({_gb(self.released)}), "
+               f"remaining {_gb(self.available - self.in_flight - self.released)}; {tmp}"]
+        if self.deferred:
+            out.append(f"    deferred {len(self.deferred)} conversions needing "
+                       f"{_gb(sum(f.out for f in self.deferred))} (largest tmp "
+                       f"{_gb(max(f.tmp for f in self.deferred))})")
+        return out
+
+
+def budget_conversions(cancer_dir: Path, inv: Dict[str, SRRInfo], actions: List[Action],
+                       running: Dict[str, str], budget: DiskBudget) -> Tuple[List[Action], List[Action]]:
+    """Split convert actions into (release now, defer) against the budget."""
+    runinfo = load_runinfo(cancer_dir)
+
+    def sra_bytes(srr: str) -> int:
+        return inv[srr].sra_bytes if srr in inv else 0  # sized by the inventory's listing
+
+    for srr in running:
+        if srr in inv and inv[srr].sra_ok:
+            budget.charge(estimate_footprint(srr, sra_bytes(srr), runinfo))
+    release: List[Action] = []
+    defer: List[Action] = []
+    for a in actions:
+        if a.kind != "convert":
+            continue
+        fp = estimate_footprint(a.srr, sra_bytes(a.srr), runinfo)
+        if budget.take(fp):
+            release.append(a)
+        else:
+            a.detail += f", deferred: needs {_gb(fp.out)} out / {_gb(fp.tmp)} tmp ({fp.source})"
+            defer.append(a)
+    return release, defer
+
 # ----------------------------
 # CLI operations
 # ----------------------------
 
-def do_plan(cancer_dir: Path, samples: Dict[str, List[str]]) -> List[Action]:
+def _inventory_samples(cancer_dir: Path, samples: Dict[str, List[str]],
+                       use_cache: bool = True) -> Dict[str, SRRInfo]:
     all_srrs = [s for srrs in samples.values() for s in srrs]
-    inv = inventory(cancer_dir, all_srrs)
-    actions = plan_actions(inv)
+    stats = InventoryStats()
+    cache = FingerprintCache.open(cancer_dir) if use_cache else None
+    try:
+        with METRICS.phase("inventory"):
+            inv = inventory(cancer_dir, all_srrs, stats, cache=cache, trust_manifest=use_cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"— inventory: {stats.summary()}")
+    return inv
+
+
+def _running_conversions(cancer_dir: Path, srrs: Set[str]) -> Tuple[SubmitJournal, Dict[str, str]]:
+    """Reconcile the submission journal against live LSF state (one bjobs call).
+
+    The journal is only reconciled in memory; apply saves it (pruning finished
+    entries and harvesting their resources), so plan stays read-only.
+    """
+    journal = SubmitJournal(cancer_dir)
+    jobs = get_executor().jobs("fastq_*")
+    if jobs is None:
+        print("WARNING: bjobs unavailable; trusting the submission journal")
+    running = journal.reconcile(jobs, srrs)
+    return journal, running
+
+
+def do_plan(cancer_dir: Path, samples: Dict[str, List[str]], use_cache: bool = True,
+            reserve_gb: Optional[float] = RESERVE_GB) -> List[Action]:
+    inv = _inventory_samples(cancer_dir, samples, use_cache)
+    _journal, running = _running_conversions(cancer_dir, set(inv))
+    with METRICS.phase("plan"):
+        actions = plan_actions(inv, running)
+    budget = DiskBudget(cancer_dir, reserve_gb) if reserve_gb is not None else None
+    if budget is not None:
+        budget_conversions(cancer_dir, inv, actions, running, budget)
     # pretty print
     for a in actions:
         if a.kind == "download":
-            print(f"DOWNLOAD {a.srr}\t(prefetch)")
+            print(f"DOWNLOAD {a.srr}\t({a.detail})")
+        elif a.kind == "running":
+            print(f"RUNNING  {a.srr}\t({a.detail})")
         else:
-            print(f"CONVERT  {a.srr}\t(fastq-dump)")
-    print(f"— total actions: {len(actions)}")
+            print(f"CONVERT  {a.srr}\t({a.detail})")
+    n_todo = sum(1 for a in actions if a.kind != "running")
+    print(f"— total actions: {n_todo} ({len(actions) - n_todo} already running)")
+    if budget is not None:
+        print("\n".join(budget.lines()))
     return actions
 
 
-def do_apply(cancer_dir: Path, samples: Dict[str, List[str]], no_wait: bool = True) -> None:
-    all_srrs = [s for srrs in samples.values() for s in srrs]
-    inv = inventory(cancer_dir, all_srrs)
-    actions = plan_actions(inv)
-    print(f"Planned actions: {len(actions)}")
-    for act in actions:
-        if act.kind == "download":
-            ok = prefetch(cancer_dir, act.srr)
-            print(("✓" if ok else "✗"), "prefetch", act.srr)
-        else:
-            # plan_actions only yields CONVERT when sra_ok=True; assert defensively
-            if not inv[act.srr].sra_ok and not _find_sra(cancer_dir, act.srr):
-                print("✗", "no SRA to convert for", act.srr)
-                continue
-            jid = submit_fastq_dump(cancer_dir, act.srr)
-            print(("✓" if jid else "✗"), "bsub", act.srr, (jid or ""))
+def _release_conversions(cancer_dir: Path, inv: Dict[str, SRRInfo], actions: List[Action],
+                         running: Dict[str, str], journal: SubmitJournal,
+                         reserve_gb: Optional[float] = RESERVE_GB) -> int:
+    """Submit one wave of conversions: reclaim converted .sra, then release what fits.
+
+    Returns how many conversions were deferred for lack of space.
+    """
+    removed = cleanup_sra_for_completed(cancer_dir, inv)
+    if removed:
+        print(f"Reclaimed space: removed {removed} converted .sra files")
+    converts = [a for a in actions if a.kind == "convert"]
+    deferred: List[Action] = []
+    if reserve_gb is not None and converts:
+        budget = DiskBudget(cancer_dir, reserve_gb)
+        converts, deferred = budget_conversions(cancer_dir, inv, converts, running, budget)
+        print("\n".join(budget.lines()))
+    history = ResourceHistory.load([cancer_dir])
+    sized: List[Tuple[str, JobResources]] = []
+    for act in converts:
+        # plan_actions only yields CONVERT when sra_ok=True; assert defensively
+        if not inv[act.srr].sra_ok and not _find_sra(cancer_dir, act.srr):
+            print("✗", "no SRA to convert for", act.srr)
+            continue
+        sized.append((act.srr, size_conversion(cancer_dir, act.srr, history)))
+    ids = submit_fastq_dumps(cancer_dir, sized)
+    for srr, res in sized:
+        jid = ids.get(srr)
+        print(("✓" if jid else "✗"), "bsub", srr, (jid or ""), f"[{res.label()}]")
+        if jid:
+            journal.record(srr, jid, res)
+    journal.save()
+    return len(deferred)
+
+
+def do_apply(cancer_dir: Path, samples: Dict[str, List[str]], no_wait: bool = True,
+             use_cache: bool = True, downloads: int = 4, retries: int = 3,
+             interval: float = 30.0, reserve_gb: Optional[float] = RESERVE_GB,
+             source: str = "sra") -> None:
+    inv = _inventory_samples(cancer_dir, samples, use_cache)
+    journal, running = _running_conversions(cancer_dir, set(inv))
+    with METRICS.phase("plan"):
+        actions = [a for a in plan_actions(inv, running) if a.kind != "running"]
+    print(f"Planned actions: {len(actions)} ({len(running)} conversions already in flight)")
+    run_prefetch_queue(cancer_dir, [a.srr for a in actions if a.kind == "download"],
+                       concurrency=downloads, retries=retries, source=source)
+    deferred = _release_conversions(cancer_dir, inv, actions, running, journal, reserve_gb)
+    executor = get_executor()
+    if executor.dry_run:
+        print(f"— dry-run: {len(executor.commands)} commands recorded, nothing executed")
+        return
+    executor.wait()
+    Manifest.load(cancer_dir)  # fold the finished jobs' fragments into fastq_manifest.tsv
     # Always write a fresh status snapshot
-    inv2 = inventory(cancer_dir, all_srrs)
+    inv2 = _inventory_samples(cancer_dir, samples, use_cache)
     write_status_snapshot(cancer_dir, samples, inv2)
     if not no_wait:
-        print("Note: waiting for jobs is not implemented in the minimal core. Run 'status' periodically.")
+        do_watch(cancer_dir, samples, interval=interval, use_cache=use_cache,
+                 release=bool(deferred), reserve_gb=reserve_gb)
+    elif deferred:
+        print(f"— {deferred} conversions deferred for disk space; re-run apply (or apply --wait)")
 
 
-def do_status(cancer_dir: Path, samples: Dict[str, List[str]]) -> None:
-    all_srrs = [s for srrs in samples.values() for s in srrs]
-    inv = inventory(cancer_dir, all_srrs)
+def do_status(cancer_dir: Path, samples: Dict[str, List[str]], use_cache: bool = True) -> None:
+    inv = _inventory_samples(cancer_dir, samples, use_cache)
     write_status_snapshot(cancer_dir, samples, inv)
     print((cancer_dir / "sample_list.with_status.txt").as_posix())
 
 
-def do_clean(cancer_dir: Path, samples: Dict[str, List[str]]) -> None:
-    all_srrs = [s for srrs in samples.values() for s in srrs]
-    inv = inventory(cancer_dir, all_srrs)
+def do_clean(cancer_dir: Path, samples: Dict[str, List[str]], use_cache: bool = True) -> None:
+    inv = _inventory_samples(cancer_dir, samples, use_cache)
     n = cleanup_sra_for_completed(cancer_dir, inv)
     print(f"Removed {n} converted .sra files")
 
 
+def do_watch(cancer_dir: Path, samples: Dict[str, List[str]], interval: float = 30.0,
+             use_cache: bool = True, once: bool = False, release: bool = False,
+             reserve_gb: Optional[float] = RESERVE_GB) -> None:
+    """Poll LSF once per cycle and reconcile sample_list.with_status.txt.
+
+    Each cycle is a single bjobs call regardless of how many jobs are in
+    flight; only SRRs whose job just finished are re‑inventoried, and their
+    .sra files are cleaned up straight away. With ``release`` (apply --wait),
+    conversions deferred for disk space are released in a new wave whenever
+    jobs finish. Stops when no fastq_<SRR> job of this cohort is pending or
+    running.
+    """
+    inv = _inventory_samples(cancer_dir, samples, use_cache)
+    write_status_snapshot(cancer_dir, samples, inv)
+    seen: Dict[str, str] = {}  # srr -> "jobid:stat" at the previous cycle
+    journal = SubmitJournal(cancer_dir)
+    cache = FingerprintCache.open(cancer_dir) if use_cache else None
+    try:
+        while True:
+            jobs = get_executor().jobs("fastq_*")
+            if jobs is None:
+                print("WARNING: bjobs failed; retrying next cycle")
+                time.sleep(interval)
+                continue
+            running = journal.reconcile(jobs, set(inv))
+            journal.save()
+            mine = {name[len("fastq_"):]: j for name, j in array_member_jobs(cancer_dir, jobs).items()
+                    if name[len("fastq_"):] in inv}
+            finished = [srr for srr, j in mine.items()
+                        if j.stat not in LSF_ACTIVE and seen.get(srr) != f"{j.job_id}:{j.stat}"]
+            seen = {srr: f"{j.job_id}:{j.stat}" for srr, j in mine.items()}
+            if finished:
+                stats = InventoryStats()
+                Manifest.load(cancer_dir)  # fold the finished jobs' fragments in
+                inv.update(inventory(cancer_dir, finished, stats, cache=cache,
+                                     trust_manifest=use_cache))
+                if cache is not None:
+                    cache.conn.commit()
+                write_status_snapshot(cancer_dir, samples, inv)
+                removed = cleanup_sra_for_completed(cancer_dir, {s: inv[s] for s in finished})
+                for srr in sorted(finished):
+                    info, j = inv[srr], mine[srr]
+                    done = info.r1_ok and (info.r2 is None or info.r2_ok)
+                    note = "" if done else f"\t(exit {j.exit_code}, FASTQ incomplete)"
+                    print(("✓" if done else "✗"), j.stat, srr, j.job_id + note)
+                if removed:
+                    print(f"  removed {removed} converted .sra files")
+                if release:
+                    wave = [a for a in plan_actions(inv, running) if a.kind == "convert"]
+                    if wave:
+                        print(f"Next wave: {len(wave)} conversions waiting")
+                        release = _release_conversions(cancer_dir, inv, wave, running,
+                                                       journal, reserve_gb) > 0
+                        if journal.entries.keys() - running.keys():
+                            time.sleep(min(interval, 5))
+                            continue  # pick up the new jobs on the next poll
+            n_run = sum(1 for j in mine.values() if j.stat == "RUN")
+            n_pend = sum(1 for j in mine.values() if j.stat in LSF_ACTIVE) - n_run
+            print(f"[watch {time.strftime('%H:%M:%S')}] {n_run} running, {n_pend} pending, "
+                  f"{len(finished)} finished this cycle")
+            if once or not (n_run or n_pend):
+                if not (n_run or n_pend):
+                    print("No fastq_ jobs in flight for this cohort.")
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("watch interrupted")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def do_verify(cancer_dir: Path, samples: Dict[str, List[str]], jobs: int = 0,
+              use_cache: bool = True, trust_manifest: bool = True) -> int:
+    """Deep‑verify every FASTQ; only files with a new fingerprint are re‑read.
+
+    Files hashed on write (fastq_manifest.tsv) and unchanged since are taken
+    as verified with the manifest's record count, unless trust_manifest=False.
+    """
+    all_srrs = list(dict.fromkeys(s for srrs in samples.values() for s in srrs))
+    stats = InventoryStats()
+    listing = _scan_dir(cancer_dir, stats)
+    found: Dict[str, Tuple[Optional[Path], Optional[Path], Optional[Path]]] = {}
+    for srr in all_srrs:
+        r1n, r2n = f"{srr}_1.fastq.gz", f"{srr}_2.fastq.gz"
+        found[srr] = (None,
+                      cancer_dir / r1n if r1n in listing else None,
+                      cancer_dir / r2n if r2n in listing else None)
+    paths = [p for (_s, r1, r2) in found.values() for p in (r1, r2)
+             if p is not None and listing[p.name].st_size > 0]
+
+    cache = FingerprintCache.open(cancer_dir) if use_cache else None
+    try:
+        verified = cache.verified(listing) if cache is not None else {}
+        if trust_manifest:
+            manifest = Manifest.load(cancer_dir)
+            for p in paths:
+                e = manifest.trusted(p.name, listing[p.name])
+                if p.name not in verified and e is not None and e.records:
+                    verified[p.name] = VerifyResult(name=p.name, ok=True, records=e.records,
+                                                    raw_bytes=0, elapsed=0.0, error="")
+        todo = [p for p in paths if p.name not in verified]
+        total_bytes = sum(listing[p.name].st_size for p in todo)
+        print(f"Verifying {len(todo)} FASTQs ({total_bytes / 1e9:.1f} GB); "
+              f"{len(paths) - len(todo)} unchanged since last verify")
+        t0 = time.monotonic()
+        if todo:
+            with METRICS.phase("verify"), ProcessPoolExecutor(max_workers=jobs or None) as pool:
+                futs = {pool.submit(_verify_fastq, p): p for p in todo}
+                for i, fut in enumerate(as_completed(futs), 1):
+                    res = fut.result()
+                    METRICS.count("verify_bytes", res.raw_bytes)
+                    METRICS.count("verify_records", res.records)
+                    verified[res.name] = res
+                    if cache is not None:
+                        cache.put_verified(listing[res.name], res)
+                    if not res.ok:
+                        print(f"✗ {res.name}: {res.error}")
+                    if i % 50 == 0 or i == len(todo):
+                        print(f"  {i}/{len(todo)} done, {time.monotonic() - t0:.0f}s")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    failed = verify_failures(found, verified)
+    for srr, reason in sorted(failed.items()):
+        print(f"FAIL {srr}\t{reason}")
+    n_rec = sum(v.records for v in verified.values())
+    print(f"— verified {len(verified)} FASTQs, {n_rec} records; {len(failed)} SRRs failed"
+          + (" (run 'apply' to re-convert)" if failed else ""))
+    return len(failed)
+
+
+def _hash_one(path: Path) -> Tuple[str, str, int, str]:
+    return (path.name, *hash_file(path))
+
+
+def do_manifest(cancer_dir: Path, samples: Dict[str, List[str]], backfill: bool = False,
+                jobs: int = 0, export_md5: Optional[str] = None) -> int:
+    """Audit FASTQs against fastq_manifest.tsv from stat() alone; returns #changed files."""
+    manifest = Manifest.load(cancer_dir)
+    listing = _scan_dir(cancer_dir, InventoryStats())
+    names = [f"{s}_{m}.fastq.gz" for srrs in samples.values() for s in srrs for m in (1, 2)]
+    present = [n for n in dict.fromkeys(names) if n in listing and listing[n].st_size > 0]
+    trusted = [n for n in present if manifest.trusted(n, listing[n])]
+    changed = [n for n in present if n in manifest.entries and n not in trusted]
+    missing = [n for n in present if n not in manifest.entries]
+    for n in changed:
+        e = manifest.entries[n]
+        print(f"CHANGED {n}\t(manifest {e.bytes} B @ {e.mtime}, disk {listing[n].st_size} B "
+              f"@ {int(listing[n].st_mtime)})")
+    print(f"— manifest: {len(trusted)} trusted, {len(changed)} changed since hashing, "
+          f"{len(missing)} never hashed ({len(present)} FASTQs on disk)")
+    if backfill and (missing or changed):
+        todo = [cancer_dir / n for n in missing + changed]
+        print(f"Hashing {len(todo)} FASTQs ({sum(listing[p.name].st_size for p in todo) / 1e9:.1f} GB)")
+        with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+            for name, digest, records, error in pool.map(_hash_one, todo):
+                if error:
+                    # Only vouch for good files: inventory() trusts every entry
+                    print(f"✗ {name}: {error} (not added)")
+                    continue
+                st = listing[name]
+                manifest.add(ManifestEntry(
+                    name, st.st_size, int(st.st_mtime), records=records, producer="backfill",
+                    recorded_at=int(time.time()),
+                    **{"md5" if MANIFEST_HASH == "md5" else "sha256": digest}))
+        manifest.save()
+        print(f"✓ {manifest.path}")
+        changed = []
+    if export_md5:
+        rows = [(manifest.entries[n].md5, n) for n in present
+                if manifest.trusted(n, listing[n]) and manifest.entries[n].md5]
+        Path(export_md5).write_text("".join(f"{d}  {n}\n" for d, n in rows))
+        print(f"✓ {export_md5} ({len(rows)} files)")
+    return len(changed)
+
+
+# ----------------------------
+# Project-wide scheduling (--root)
+# ----------------------------
+COHORT_CATEGORIES = ("Tumors", "Controls", "Premalignant", "Bulk_CellTypes")
+
+
+@dataclass
+class CohortPlan:
+    cancer_dir: Path
+    name: str  # "<Category>/<Cohort>"
+    actions: List[Action]
+    running: Dict[str, str]
+    priority: int = 0
+    error: str = ""
+    index: int = -1  # cohort index in the project RunTable
+    journal: Optional[SubmitJournal] = None  # reconciled, saved only by apply
+
+    def count(self, kind: str) -> int:
+        return sum(1 for a in self.actions if a.kind == kind)
+
+    @property
+    def remaining(self) -> int:
+        return sum(1 for a in self.actions if a.kind != "running")
+
+
+def discover_cohorts(root: Path) -> List[Path]:
+    """Every <category>/<cohort>/ directory under root that has a sample_list.txt."""
+    found: List[Path] = []
+    for cat in COHORT_CATEGORIES:
+        if (root / cat).is_dir():
+            found += sorted(p.parent for p in (root / cat).glob("*/sample_list.txt"))
+    return found
+
+
+def parse_priorities(specs: List[str]) -> Dict[str, int]:
+    """["Tumors/Tongue=10", "Pancreas=5"] → {name: priority}; bare names match any category."""
+    out: Dict[str, int] = {}
+    for spec in specs:
+        name, _, val = spec.partition("=")
+        try:
+            out[name.strip("/")] = int(val) if val else 1
+        except ValueError:
+            raise SystemExit(f"Bad --priority {spec!r}; expected <Category/Cohort>=<int>")
+    return out
+
+
+def plan_cohort(cancer_dir: Path, root: Path, jobs: Optional[Dict[str, LSFJob]],
+                priorities: Dict[str, int], use_cache: bool = True,
+                table: Optional[RunTable] = None) -> CohortPlan:
+    """Inventory and plan one cohort; with a table the rows go there instead
+    of into a per‑cohort SRRInfo dict."""
+    name = cancer_dir.relative_to(root).as_posix()
+    priority = priorities.get(name, priorities.get(cancer_dir.name, 0))
+    try:
+        samples = parse_sample_list(cancer_dir / "sample_list.txt")
+    except (OSError, ValueError) as e:
+        return CohortPlan(cancer_dir, name, [], {}, priority, error=str(e))
+    all_srrs = [s for srrs in samples.values() for s in srrs]
+    cache = FingerprintCache.open(cancer_dir) if use_cache else None
+    try:
+        if table is not None:
+            ci = table.add_cohort(cancer_dir, all_srrs, cache=cache, trust_manifest=use_cache)
+            srrs = {table.srr[i] for i in table.rows(ci)}
+        else:
+            inv = inventory(cancer_dir, all_srrs, cache=cache, trust_manifest=use_cache)
+            srrs = set(inv)
+    finally:
+        if cache is not None:
+            cache.close()
+    journal = SubmitJournal(cancer_dir)
+    running = journal.reconcile(jobs, srrs)
+    if table is not None:
+        return CohortPlan(cancer_dir, name, table.plan_actions(ci, running), running, priority,
+                          index=ci, journal=journal)
+    return CohortPlan(cancer_dir, name, plan_actions(inv, running), running, priority, journal=journal)
+
+
+def plan_project(root: Path, priorities: Dict[str, int], use_cache: bool = True,
+                 workers: int = 8, table: Optional[RunTable] = None) -> List[CohortPlan]:
+    """Plan every cohort in parallel and rank them: higher priority first, then
+    least remaining work first (so nearly finished cohorts get closed out).
+
+    Inventories land in ``table`` (a fresh RunTable by default); CohortPlan.index
+    points at each cohort's rows.
+    """
+    cohorts = discover_cohorts(root)
+    table = table if table is not None else RunTable()
+    jobs = get_executor().jobs("fastq_*")  # one bjobs call for the whole project
+    if jobs is None:
+        print("WARNING: bjobs unavailable; trusting the submission journals")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        plans = list(pool.map(lambda d: plan_cohort(d, root, jobs, priorities, use_cache, table),
+                              cohorts))
+    return sorted(plans, key=lambda p: (bool(p.error), -p.priority, p.remaining, p.name))
+
+
+def do_project(root: Path, apply: bool, priorities: Dict[str, int], use_cache: bool = True,
+               workers: int = 8, downloads: int = 4, max_conversions: int = 0,
+               retries: int = 3, reserve_gb: Optional[float] = RESERVE_GB,
+               source: str = "sra") -> None:
+    t0 = time.monotonic()
+    table = RunTable()
+    plans = plan_project(root, priorities, use_cache, workers, table)
+    print(f"{'rank':>4}  {'prio':>4}  {'download':>8}  {'convert':>7}  {'running':>7}  cohort")
+    for i, p in enumerate(plans, 1):
+        if p.error:
+            print(f"{i:>4}  {p.priority:>4}  {'-':>8}  {'-':>7}  {'-':>7}  {p.name}  ({p.error})")
+            continue
+        print(f"{i:>4}  {p.priority:>4}  {p.count('download'):>8}  {p.count('convert'):>7}  "
+              f"{p.count('running'):>7}  {p.name}")
+    in_flight = sum(len(p.running) for p in plans)
+    print(f"— {len(plans)} cohorts, {sum(p.count('download') for p in plans)} downloads, "
+          f"{sum(p.count('convert') for p in plans)} conversions, {in_flight} running "
+          f"(planned in {time.monotonic() - t0:.1f}s)")
+    if not apply:
+        return
+
+    # Downloads: one global queue, ranked cohort order, shared concurrency cap
+    work = {p.cancer_dir: [a.srr for a in p.actions if a.kind == "download"] for p in plans}
+    run_prefetch_batches({d: s for d, s in work.items() if s}, concurrency=downloads, retries=retries,
+                         source=source)
+
+    # Conversions: release in ranked order until the global in-flight cap is
+    # reached, against one disk budget per filesystem
+    slots = max_conversions - in_flight if max_conversions > 0 else None
+    history = ResourceHistory.load([p.cancer_dir for p in plans])  # learn project-wide
+    deferred = 0
+    budgets: Dict[int, DiskBudget] = {}
+    for p in plans:
+        converts = [a for a in p.actions if a.kind == "convert"]
+        if not converts:
+            continue
+        journal = p.journal
+        if reserve_gb is not None:
+            inv = table.inventory(p.index)  # the plan's own inventory; no second scan
+            cleanup_sra_for_completed(p.cancer_dir, inv)
+            dev = p.cancer_dir.stat().st_dev
+            budget = budgets.setdefault(dev, DiskBudget(p.cancer_dir, reserve_gb))
+            converts, later = budget_conversions(p.cancer_dir, inv, converts, p.running, budget)
+            deferred += len(later)
+        if slots is not None:
+            deferred += max(0, len(converts) - slots)
+            converts = converts[:max(0, slots)]
+        sized = [(act.srr, size_conversion(p.cancer_dir, act.srr, history)) for act in converts]
+        ids = submit_fastq_dumps(p.cancer_dir, sized)
+        for srr, res in sized:
+            jid = ids.get(srr)
+            print(("✓" if jid else "✗"), "bsub", f"{p.name}/{srr}", (jid or ""), f"[{res.label()}]")
+            if jid:
+                journal.record(srr, jid, res)
+                if slots is not None:
+                    slots -= 1
+    for p in plans:
+        if p.journal is not None:
+            p.journal.save()  # reconciled at plan time, plus this wave's submissions
+    for budget in budgets.values():
+        print("\n".join(budget.lines()))
+    if deferred:
+        print(f"— {deferred} conversions deferred (--max-conversions / disk budget); re-run apply later")
+    executor = get_executor()
+    if executor.dry_run:
+        print(f"— dry-run: {len(executor.commands)} commands recorded, nothing executed")
+        return
+    executor.wait()
+
+    def refresh(p: CohortPlan) -> None:
+        samples = parse_sample_list(p.cancer_dir / "sample_list.txt")
+        cache = FingerprintCache.open(p.cancer_dir) if use_cache else None
+        Manifest.load(p.cancer_dir)  # fold the finished jobs' fragments in
+        try:
+            inv = inventory(p.cancer_dir, [s for v in samples.values() for s in v], cache=cache,
+                            trust_manifest=use_cache)
+        finally:
+            if cache is not None:
+                cache.close()
+        write_status_snapshot(p.cancer_dir, samples, inv)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(refresh, [p for p in plans if not p.error]))
+
+
 # ----------------------------
 # Entry
 # ----------------------------
@@ -397,7 +2664,70 @@ def main():
 
     for name in ("plan", "apply", "status", "clean"):
         a = sub.add_parser(name)
-        a.add_argument("cancer_dir", help="Directory containing sample_list.txt")
+        a.add_argument("cancer_dir", nargs="?" if name in ("plan", "apply") else None,
+                       help="Directory containing sample_list.txt")
+        a.add_argument("--no-cache", action="store_true",
+                       help=f"Ignore {CACHE_NAME} and re-sniff every FASTQ")
+        if name in ("plan", "apply"):
+            a.add_argument("--root", help="Project root: plan every <Category>/<Cohort>/sample_list.txt")
+            a.add_argument("--priority", action="append", default=[], metavar="COHORT=N",
+                           help="Rank a cohort higher, e.g. Tumors/Tongue=10 (repeatable)")
+            a.add_argument("--cohort-workers", type=int, default=8,
+                           help="Cohorts planned in parallel with --root (default 8)")
+            a.add_argument("--reserve-gb", type=float, default=RESERVE_GB,
+                           help="Free space to keep on the cohort filesystem (default %(default)s)")
+            a.add_argument("--ignore-space", action="store_true",
+                           help="Release conversions without checking the disk budget")
+        if name == "apply":
+            a.add_argument("--max-conversions", type=int, default=0,
+                           help="With --root: cap on conversions in flight project-wide (0 = no cap)")
+            a.add_argument("--wait", action="store_true",
+                           help="After submitting, keep reconciling like `watch` (not with --root)")
+            a.add_argument("--downloads", type=int,
+                           default=int(os.environ.get("PREFETCH_CONCURRENCY", "4")),
+                           help="Concurrent prefetch downloads (default 4)")
+            a.add_argument("--retries", type=int, default=3,
+                           help="Retries per SRR with exponential backoff (default 3)")
+            a.add_argument("--source", choices=DOWNLOAD_SOURCES,
+                           default=os.environ.get("POSEIDON_SOURCE", "sra"),
+                           help="sra: prefetch + fastq-dump job; ena: FASTQs straight from ENA "
+                                "(ENA_SOURCE=ena|tsv:<path>, ENA_CONNECTIONS), prefetch when ENA has none")
+            a.add_argument("--executor", choices=sorted(EXECUTORS),
+                           default=os.environ.get("POSEIDON_EXECUTOR", "lsf"),
+                           help="Where downloads/conversions run: lsf (bsub), local "
+                                "(process pool on this host) or dry-run (print only)")
+            a.add_argument("--jobs", type=int, default=4,
+                           help="Concurrent conversions with --executor local (default 4)")
+    w = sub.add_parser("watch")
+    w.add_argument("cancer_dir", help="Directory containing sample_list.txt")
+    w.add_argument("--interval", type=float, default=30.0, help="Seconds between bjobs polls")
+    w.add_argument("--once", action="store_true", help="Run a single reconcile cycle")
+    w.add_argument("--no-cache", action="store_true",
+                   help=f"Ignore {CACHE_NAME} and re-sniff every FASTQ")
+    q = sub.add_parser("query")
+    q.add_argument("what", nargs="?", default="summary",
+                   help=f"Preset ({', '.join(STATUS_QUERIES)}) or a SELECT statement")
+    q.add_argument("--root", help=f"Project root holding {STATUS_DB_NAME}")
+    q.add_argument("--db", help="Status store path (default <root>/" + STATUS_DB_NAME + ")")
+    v = sub.add_parser("verify")
+    v.add_argument("cancer_dir", help="Directory containing sample_list.txt")
+    v.add_argument("--jobs", type=int, default=0, help="Worker processes (default: all cores)")
+    v.add_argument("--no-cache", action="store_true",
+                   help=f"Ignore {CACHE_NAME}: re-verify everything and do not record results")
+    v.add_argument("--full", action="store_true",
+                   help=f"Re-read files even when {MANIFEST_NAME} vouches for them")
+    m = sub.add_parser("manifest")
+    m.add_argument("cancer_dir", help="Directory containing sample_list.txt")
+    m.add_argument("--backfill", action="store_true",
+                   help="Hash FASTQs the manifest does not cover yet (one full read each)")
+    m.add_argument("--jobs", type=int, default=0, help="Worker processes for --backfill")
+    m.add_argument("--export-md5", metavar="PATH",
+                   help="Write an `md5sum -c` file of trusted entries (for archive sync)")
+    for name, a in sub.choices.items():
+        a.add_argument("--metrics", nargs="?", const="", default=None, metavar="PATH",
+                       help=f"Append per-phase timings/counters as JSON lines to PATH "
+                            f"(default <cancer_dir>/logs/{METRICS_NAME}); "
+                            f"POSEIDON_PROFILE=1 also dumps a cProfile file")
     sub.add_parser("version")
 
     args = ap.parse_args()
@@ -405,17 +2735,79 @@ def main():
         print("poseidon-core 0.1")
         return
 
-    cancer_dir = Path(args.cancer_dir).resolve()
-    samples = parse_sample_list(cancer_dir / "sample_list.txt")
+    target = getattr(args, "root", None) or getattr(args, "cancer_dir", None)
+    log_dir = Path(target).resolve() / "logs" if target else Path.cwd()
+    profiler = None
+    if os.environ.get("POSEIDON_PROFILE") == "1":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    status = "ok"
+    try:
+        _dispatch(ap, args)
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        if profiler is not None:
+            profiler.disable()
+            prof = log_dir / f"core_profile_{args.cmd}_{stamp}.prof"
+            prof.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(prof))
+            print(f"— profile: {prof} (python -m pstats {prof.name})")
+        if args.metrics is not None:
+            path = Path(args.metrics) if args.metrics else log_dir / METRICS_NAME
+            METRICS.write(path, cmd=args.cmd, target=str(target), status=status,
+                          executor=get_executor().name, pid=os.getpid())
+            print(f"— metrics: {path}")
 
+
+def _dispatch(ap: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.cmd == "query":
+        if not (args.db or args.root):
+            ap.error("query needs --root or --db")
+        do_query(Path(args.db) if args.db else Path(args.root).resolve() / STATUS_DB_NAME, args.what)
+        return
+    use_cache = not getattr(args, "no_cache", False)
+    if getattr(args, "root", None) and getattr(args, "wait", False):
+        ap.error("--wait is per cohort; after apply --root, run `watch <cancer_dir>` for the cohorts to follow")
+    if args.cmd == "apply":
+        set_executor(make_executor(args.executor, args.jobs))
+    reserve_gb = None if getattr(args, "ignore_space", False) else getattr(args, "reserve_gb", RESERVE_GB)
+    if getattr(args, "root", None):
+        do_project(Path(args.root).resolve(), args.cmd == "apply", parse_priorities(args.priority),
+                   use_cache=use_cache, workers=args.cohort_workers,
+                   downloads=getattr(args, "downloads", 4),
+                   max_conversions=getattr(args, "max_conversions", 0),
+                   retries=getattr(args, "retries", 3), reserve_gb=reserve_gb,
+                   source=getattr(args, "source", "sra"))
+        return
+    if not args.cancer_dir:
+        ap.error("cancer_dir is required (or use --root)")
+
+    cancer_dir = Path(args.cancer_dir).resolve()
+    with METRICS.phase("parse"):
+        samples = parse_sample_list(cancer_dir / "sample_list.txt")
+    METRICS.count("samples", len(samples))
     if args.cmd == "plan":
-        do_plan(cancer_dir, samples)
+        do_plan(cancer_dir, samples, use_cache, reserve_gb)
     elif args.cmd == "apply":
-        do_apply(cancer_dir, samples, no_wait=True)
+        do_apply(cancer_dir, samples, no_wait=not args.wait, use_cache=use_cache,
+                 downloads=args.downloads, retries=args.retries, reserve_gb=reserve_gb,
+                 source=args.source)
     elif args.cmd == "status":
-        do_status(cancer_dir, samples)
+        do_status(cancer_dir, samples, use_cache)
     elif args.cmd == "clean":
-        do_clean(cancer_dir, samples)
+        do_clean(cancer_dir, samples, use_cache)
+    elif args.cmd == "watch":
+        do_watch(cancer_dir, samples, interval=args.interval, use_cache=use_cache, once=args.once)
+    elif args.cmd == "manifest":
+        if do_manifest(cancer_dir, samples, args.backfill, args.jobs, args.export_md5):
+            raise SystemExit(1)
+    elif args.cmd == "verify":
+        if do_verify(cancer_dir, samples, args.jobs, use_cache, trust_manifest=not args.full):
+            raise SystemExit(1)
 
 
 if __name__ == "__main__":
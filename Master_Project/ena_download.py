@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+ENA direct-FASTQ downloads for core_fastq_workflow.py (`apply --source ena`)
+
+ENA already serves most SRA runs as gzipped FASTQ with MD5s, which skips both
+prefetch and the LSF fastq-dump stage:
+
+  • A metadata source resolves a run to its FASTQ URLs, MD5s and sizes
+      ena            – ENA portal filereport API (ENA_PORTAL_URL overrides the host)
+      tsv:<path>     – a local filereport-style TSV (run_accession, fastq_ftp,
+                       fastq_md5, fastq_bytes), e.g. for a stand-in HTTP server
+  • Files are fetched with several ranged HTTP connections into <name>.part;
+    finished ranges are recorded in <name>.part.json so an interrupted download
+    resumes where it stopped
+  • MD5 is computed while the download runs, following the contiguous prefix of
+    finished ranges. A run's files are renamed into place only when every one
+    of them matches, so a failed _2 never leaves a lone _1 that would pass for
+    a finished single-end run
+  • Output names follow the core contract: {SRR}_1.fastq.gz / {SRR}_2.fastq.gz
+    (single-end {SRR}.fastq.gz becomes {SRR}_1.fastq.gz)
+
+fetch_run() returns "ok", "failed" or "absent"; the caller falls back to
+prefetch on "absent" (ENA has no FASTQ for the run, or the portal is down).
+
+Standalone:
+  ena_download.py <cancer_dir> SRR123 SRR456 [--source tsv:files.tsv] [--connections 4]
+"""
+from __future__ import annotations
+
+import abc
+import argparse
+import csv
+import hashlib
+import http.client
+import io
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ENA_PORTAL_URL = os.environ.get("ENA_PORTAL_URL", "https://www.ebi.ac.uk/ena/portal/api")
+ENA_SOURCE = os.environ.get("ENA_SOURCE", "ena")
+ENA_CONNECTIONS = int(os.environ.get("ENA_CONNECTIONS", "4"))
+# Scheme for fastq_ftp entries, which ENA lists without one (ftp.sra.ebi.ac.uk/vol1/...)
+ENA_SCHEME = os.environ.get("ENA_SCHEME", "https")
+PART_BYTES = 64 * 1024 * 1024
+CHUNK = 1024 * 1024
+TIMEOUT = 60
+SEGMENT_RETRIES = 3
+# Seconds between liveness checks of the segment workers while hashing
+WAIT_POLL = 5.0
+# Transport errors worth a retry: socket/URL errors plus IncompleteRead, BadStatusLine & co.
+NET_ERRORS = (OSError, http.client.HTTPException)
+
+
+class DownloadError(Exception):
+    pass
+
+
+@dataclass
+class FastqFile:
+    url: str
+    md5: str
+    size: int  # 0 when the source does not know
+
+    @property
+    def name(self) -> str:
+        return urllib.parse.urlsplit(self.url).path.rsplit("/", 1)[-1]
+
+
+# ----------------------------
+# Metadata sources
+# ----------------------------
+
+class MetadataSource(abc.ABC):
+    """run accession → FASTQ files; [] when ENA has none for the run."""
+
+    @abc.abstractmethod
+    def lookup(self, run: str) -> List[FastqFile]:
+        ...
+
+
+def _files_from_row(row: Dict[str, str]) -> List[FastqFile]:
+    urls = [u for u in (row.get("fastq_ftp") or "").split(";") if u]
+    md5s = (row.get("fastq_md5") or "").split(";")
+    sizes = (row.get("fastq_bytes") or "").split(";")
+    out: List[FastqFile] = []
+    for i, u in enumerate(urls):
+        if "://" not in u:
+            u = f"{ENA_SCHEME}://{u}"
+        md5 = md5s[i] if i < len(md5s) else ""
+        size = sizes[i] if i < len(sizes) else ""
+        out.append(FastqFile(url=u, md5=md5.lower(), size=int(size) if size.isdigit() else 0))
+    return out
+
+
+class ENAPortalSource(MetadataSource):
+    """ENA portal filereport API (one HTTP request per run)."""
+
+    FIELDS = "run_accession,fastq_ftp,fastq_md5,fastq_bytes"
+
+    def __init__(self, base_url: str = ENA_PORTAL_URL):
+        self.base_url = base_url.rstrip("/")
+
+    def lookup(self, run: str) -> List[FastqFile]:
+        query = urllib.parse.urlencode({"accession": run, "result": "read_run",
+                                        "fields": self.FIELDS, "format": "tsv"})
+        with urllib.request.urlopen(f"{self.base_url}/filereport?{query}", timeout=TIMEOUT) as r:
+            text = r.read().decode()
+        for row in csv.DictReader(io.StringIO(text), delimiter="\t"):
+            if row.get("run_accession") == run:
+                return _files_from_row(row)
+        return []
+
+
+class TSVSource(MetadataSource):
+    """Local filereport-style TSV, loaded once."""
+
+    def __init__(self, path: Path):
+        with Path(path).open(newline="") as f:
+            self.rows = {r["run_accession"]: r for r in csv.DictReader(f, delimiter="\t")
+                         if r.get("run_accession")}
+
+    def lookup(self, run: str) -> List[FastqFile]:
+        row = self.rows.get(run)
+        return _files_from_row(row) if row else []
+
+
+def make_source(spec: str = ENA_SOURCE) -> MetadataSource:
+    if spec.startswith("tsv:"):
+        return TSVSource(Path(spec[4:]))
+    if spec == "ena":
+        return ENAPortalSource()
+    raise ValueError(f"Unknown ENA metadata source: {spec!r} (use 'ena' or 'tsv:<path>')")
+
+# ----------------------------
+# Ranged download with resume
+# ----------------------------
+
+def _open(url: str, start: Optional[int] = None, end: Optional[int] = None):
+    req = urllib.request.Request(url)
+    if start is not None:
+        req.add_header("Range", f"bytes={start}-{'' if end is None else end}")
+    return urllib.request.urlopen(req, timeout=TIMEOUT)
+
+
+def probe(url: str) -> tuple:
+    """(size, supports_ranges) from a one-byte ranged GET."""
+    with _open(url, 0, 0) as r:
+        if r.status == 206:
+            m = re.search(r"/(\d+)$", r.headers.get("Content-Range", ""))
+            if m:
+                return int(m.group(1)), True
+        return int(r.headers.get("Content-Length") or 0), False
+
+
+class _PartState:
+    """<dest>.part.json: which fixed-size segments of <dest>.part are complete."""
+
+    def __init__(self, path: Path, url: str, size: int, md5: str):
+        self.path = path
+        self.key = {"url": url, "size": size, "md5": md5, "part_bytes": PART_BYTES}
+        self.done: set = set()
+        try:
+            data = json.loads(path.read_text())
+            if {k: data.get(k) for k in self.key} == self.key:
+                self.done = set(data.get("done", []))
+        except (OSError, ValueError):
+            pass
+
+    def save(self) -> None:
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({**self.key, "done": sorted(self.done)}))
+        tmp.replace(self.path)
+
+
+def download_file(f: FastqFile, dest: Path, connections: int = ENA_CONNECTIONS,
+                  commit: bool = True) -> int:
+    """Download f to dest with MD5 verification; returns bytes fetched this call.
+
+    With commit=False the verified file stays at <dest>.part for _commit().
+    """
+    size, ranged = probe(f.url)
+    size = size or f.size
+    if f.size and size != f.size:
+        raise DownloadError(f"{f.name}: server size {size} != metadata size {f.size}")
+    part = dest.with_name(dest.name + ".part")
+    if not ranged or not size:
+        return _download_stream(f, dest, part, commit)
+
+    state = _PartState(dest.with_name(dest.name + ".part.json"), f.url, size, f.md5)
+    n_seg = -(-size // PART_BYTES)
+    if not part.exists() or part.stat().st_size != size:
+        state.done.clear()
+    fd = os.open(part, os.O_RDWR | os.O_CREAT, 0o644)
+    fetched = [0]
+    lock = threading.Lock()
+    cond = threading.Condition(lock)
+    failed: List[str] = []
+    try:
+        os.ftruncate(fd, size)
+
+        def fail(msg: str) -> None:
+            with cond:
+                failed.append(msg)
+                cond.notify_all()
+
+        def segment(i: int) -> None:
+            start = i * PART_BYTES
+            end = min(size, start + PART_BYTES) - 1
+            for attempt in range(1, SEGMENT_RETRIES + 1):
+                try:
+                    off = start
+                    with _open(f.url, start, end) as r:
+                        if r.status != 206:
+                            raise DownloadError(f"range request answered {r.status}")
+                        while off <= end:
+                            buf = r.read(min(CHUNK, end + 1 - off))
+                            if not buf:
+                                raise DownloadError("connection closed early")
+                            os.pwrite(fd, buf, off)
+                            off += len(buf)
+                    with cond:
+                        fetched[0] += end + 1 - start
+                        state.done.add(i)
+                        state.save()
+                        cond.notify_all()
+                    return
+                except (*NET_ERRORS, DownloadError) as e:
+                    if attempt == SEGMENT_RETRIES:
+                        fail(f"segment {i}: {e}")
+                        return
+                    time.sleep(2 ** attempt)
+                except Exception as e:  # never leave the hashing loop waiting on a dead worker
+                    fail(f"segment {i}: {type(e).__name__}: {e}")
+                    return
+
+        pool = ThreadPoolExecutor(max_workers=max(1, connections))
+        try:
+            futs = [pool.submit(segment, i) for i in range(n_seg) if i not in state.done]
+            # Hash the contiguous prefix of finished segments while the rest download
+            md5 = hashlib.md5()
+            for i in range(n_seg):
+                with cond:
+                    while i not in state.done and not failed:
+                        if not cond.wait(WAIT_POLL) and all(fut.done() for fut in futs) \
+                                and i not in state.done:
+                            failed.append(f"segment {i}: download workers exited without finishing it")
+                    if failed:
+                        raise DownloadError(f"{f.name}: {failed[0]}")
+                off, end = i * PART_BYTES, min(size, (i + 1) * PART_BYTES)
+                while off < end:
+                    buf = os.pread(fd, min(CHUNK, end - off), off)
+                    md5.update(buf)
+                    off += len(buf)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        os.close(fd)
+    _finish(f, dest, part, md5.hexdigest(), state.path, commit)
+    return fetched[0]
+
+
+def _download_stream(f: FastqFile, dest: Path, part: Path, commit: bool = True) -> int:
+    """Single connection for servers without Range support (no resume)."""
+    md5 = hashlib.md5()
+    n = 0
+    with _open(f.url) as r, part.open("wb") as out:
+        while True:
+            buf = r.read(CHUNK)
+            if not buf:
+                break
+            md5.update(buf)
+            out.write(buf)
+            n += len(buf)
+    _finish(f, dest, part, md5.hexdigest(), None, commit)
+    return n
+
+
+def _finish(f: FastqFile, dest: Path, part: Path, digest: str, state: Optional[Path],
+            commit: bool = True) -> None:
+    if f.md5 and digest != f.md5:
+        part.unlink(missing_ok=True)
+        if state is not None:
+            state.unlink(missing_ok=True)
+        raise DownloadError(f"{f.name}: MD5 mismatch ({digest} != {f.md5})")
+    if commit:
+        _commit(dest)
+
+
+def _commit(dest: Path) -> None:
+    """Rename a verified <dest>.part into place and drop its segment state."""
+    dest.with_name(dest.name + ".part").replace(dest)
+    dest.with_name(dest.name + ".part.json").unlink(missing_ok=True)
+
+# ----------------------------
+# Runs
+# ----------------------------
+
+def _targets(run: str, files: List[FastqFile]) -> Dict[str, FastqFile]:
+    """Core output name → ENA file. Paired files win over the unpaired extra."""
+    by_name = {f.name: f for f in files}
+    r1, r2 = by_name.get(f"{run}_1.fastq.gz"), by_name.get(f"{run}_2.fastq.gz")
+    if r1 is not None:
+        return {f"{run}_1.fastq.gz": r1, **({f"{run}_2.fastq.gz": r2} if r2 else {})}
+    single = by_name.get(f"{run}.fastq.gz")
+    return {f"{run}_1.fastq.gz": single} if single else {}
+
+
+def fetch_run(cancer_dir: Path, run: str, source: Optional[MetadataSource] = None,
+              connections: int = ENA_CONNECTIONS,
+              on_file: Optional[Callable[[Path, FastqFile], None]] = None) -> str:
+    """Fetch one run's FASTQs into cancer_dir: "ok", "failed" or "absent".
+
+    on_file(dest, file) is called for every file downloaded and MD5-checked.
+    Nothing is renamed into place until every file of the run has passed, so a
+    failure leaves only .part files (resumed next time). Callers fetching many
+    runs should build the source once and pass it in.
+    """
+    source = source or make_source()
+    try:
+        files = source.lookup(run)
+    except (*NET_ERRORS, ValueError) as e:
+        print(f"WARNING: ENA lookup for {run} failed ({e}); falling back to prefetch")
+        return "absent"
+    targets = _targets(run, files)
+    if not targets:
+        return "absent"
+    staged: List[tuple] = []
+    for name, f in targets.items():
+        dest = cancer_dir / name
+        if dest.exists() and f.size and dest.stat().st_size == f.size:
+            continue  # finished on an earlier run
+        try:
+            download_file(f, dest, connections, commit=False)
+        except (*NET_ERRORS, DownloadError) as e:
+            print(f"✗ ENA {name}: {e}")
+            return "failed"
+        staged.append((dest, f))
+    for dest, f in staged:
+        _commit(dest)
+        if on_file is not None:
+            on_file(dest, f)
+    return "ok"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Download FASTQs straight from ENA")
+    ap.add_argument("cancer_dir")
+    ap.add_argument("runs", nargs="+")
+    ap.add_argument("--source", default=ENA_SOURCE, help="ena or tsv:<path> (default %(default)s)")
+    ap.add_argument("--connections", type=int, default=ENA_CONNECTIONS,
+                    help="Parallel ranged connections per file (default %(default)s)")
+    ap.add_argument("--runs-parallel", type=int, default=2, help="Runs downloaded at once (default 2)")
+    args = ap.parse_args()
+
+    cancer_dir = Path(args.cancer_dir).resolve()
+    source = make_source(args.source)
+    with ThreadPoolExecutor(max_workers=max(1, args.runs_parallel)) as pool:
+        futs = {pool.submit(fetch_run, cancer_dir, r, source, args.connections): r for r in args.runs}
+        for fut in as_completed(futs):
+            state = fut.result()
+            print({"ok": "✓", "failed": "✗"}.get(state, "–"), futs[fut], state)
+
+
+if __name__ == "__main__":
+    main()
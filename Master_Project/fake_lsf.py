@@ -0,0 +1,931 @@
+#!/usr/bin/env python3
+"""
+Fake LSF – local stand-ins for bsub / bjobs / bkill.
+
+Lets the LSF-driven code (core_fastq_workflow, run_hla_workflow, lsf_submit,
+the STAR submit scripts) run on a plain Linux box: jobs go into a SQLite
+queue under $FAKE_LSF_HOME and a background scheduler runs them in a local
+slot pool, then writes LSF-style logs (report + "Resource usage summary",
+so parse_lsf_summary() and the resource harvest work unchanged).
+
+Install the commands somewhere on PATH:
+  fake_lsf.py install /tmp/fake_lsf/bin && export PATH=/tmp/fake_lsf/bin:$PATH
+
+Supported:
+  bsub   -J name | -J "name[1-N]%K" (arrays, also 1,3,5-9:2), -o/-oo, -e/-eo,
+         -n, -M (MB), -W [H:]M, -R/-q/-L/-P/... (accepted, recorded), -cwd,
+         -w "done(id|name) && ended(...) || exit(...) / started(...)", -ti,
+         -pack FILE, script on stdin with #BSUB lines (bsub < job.sh)
+  bjobs  [-a|-d|-r|-p] [-noheader] [-o "jobid job_name stat exit_code ..."]
+         [-J pattern] [jobid | jobid[i] ...]
+  bkill  [-J pattern] jobid | jobid[i] | 0
+
+Knobs (environment, read by bsub and the scheduler):
+  FAKE_LSF_HOME     state directory (default ~/.fake_lsf)
+  FAKE_LSF_SLOTS    slots in the pool (default: all cores); -n takes slots
+  FAKE_LSF_DELAY    seconds a job stays PEND before it may start (default 0.2)
+  FAKE_LSF_JITTER   extra random 0..J seconds of queue delay (default 0)
+  FAKE_LSF_FAIL     fraction of jobs that die at dispatch with exit 1 (default 0)
+  FAKE_LSF_SEED     RNG seed for delay jitter / failures
+  FAKE_LSF_MINUTE   wall seconds per -W minute (default 60; 0.1 for fast tests)
+  FAKE_LSF_LATENCY  seconds added to every bsub/bjobs/bkill call (models a
+                    busy mbatchd when benchmarking submission and polling)
+
+-M is checked against the job's peak RSS when it ends (TERM_MEMLIMIT) and
+-W kills the job's process group (TERM_RUNLIMIT). Unsatisfiable -w conditions
+stay PEND, like LSF; bkill clears them, or submit with -ti to have them exit
+(TERM_ORPHAN_SYSTEM) as soon as the condition can no longer be met.
+
+`fake_lsf.py bench` times lsf_submit's single / pack / array modes against the
+simulator (bsub calls, submit seconds, makespan, bjobs polls, retries).
+"""
+from __future__ import annotations
+
+import argparse
+import fcntl
+import fnmatch
+import getpass
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import shlex
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+FAKE_LSF_HOME = Path(os.environ.get("FAKE_LSF_HOME", str(Path.home() / ".fake_lsf")))
+SLOTS = int(os.environ.get("FAKE_LSF_SLOTS", str(os.cpu_count() or 4)))
+DELAY = float(os.environ.get("FAKE_LSF_DELAY", "0.2"))
+JITTER = float(os.environ.get("FAKE_LSF_JITTER", "0"))
+FAIL_RATE = float(os.environ.get("FAKE_LSF_FAIL", "0"))
+MINUTE = float(os.environ.get("FAKE_LSF_MINUTE", "60"))
+LATENCY = float(os.environ.get("FAKE_LSF_LATENCY", "0"))
+# Finished jobs stay visible to bjobs -a this long (LSF CLEAN_PERIOD)
+CLEAN_PERIOD = float(os.environ.get("FAKE_LSF_CLEAN", "3600"))
+# Scheduler exits after this long with nothing running or startable
+IDLE_EXIT = float(os.environ.get("FAKE_LSF_IDLE", "30"))
+TICK = 0.05
+
+CLUSTER = "fake"
+HOST = socket.gethostname().split(".")[0]
+ACTIVE = ("PEND", "RUN")
+FINISHED = ("DONE", "EXIT")
+
+# bsub options that take a value; anything else starting with "-" is a flag
+BSUB_VALUE_OPTS = {"-J", "-o", "-oo", "-e", "-eo", "-n", "-M", "-W", "-R", "-q", "-L", "-cwd",
+                   "-w", "-P", "-G", "-u", "-g", "-sla", "-m", "-app", "-E", "-Ep", "-We",
+                   "-pack", "-i", "-is", "-C", "-c", "-D", "-F", "-S", "-v", "-b", "-t", "-Lp"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER NOT NULL, idx INTEGER NOT NULL, name TEXT NOT NULL, array_name TEXT,
+    stat TEXT NOT NULL, exit_code INTEGER, term TEXT, cmd TEXT NOT NULL, cwd TEXT NOT NULL,
+    env TEXT NOT NULL, out TEXT, err TEXT, out_append INTEGER, err_append INTEGER,
+    slots INTEGER NOT NULL, mem_mb INTEGER, walltime_s REAL, depend TEXT, queue TEXT,
+    array_limit INTEGER, fail INTEGER NOT NULL DEFAULT 0, killed INTEGER NOT NULL DEFAULT 0,
+    submit_time REAL NOT NULL, eligible_at REAL NOT NULL, start_time REAL, finish_time REAL,
+    pid INTEGER, max_mem_mb REAL, cpu_s REAL, user TEXT, orphan_kill INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id, idx)
+);
+CREATE INDEX IF NOT EXISTS jobs_stat ON jobs(stat);
+CREATE INDEX IF NOT EXISTS jobs_name ON jobs(name);
+CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def connect() -> sqlite3.Connection:
+    FAKE_LSF_HOME.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(FAKE_LSF_HOME / "lsf.sqlite"), timeout=60, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    if "orphan_kill" not in {r["name"] for r in db.execute("PRAGMA table_info(jobs)")}:
+        db.execute("ALTER TABLE jobs ADD COLUMN orphan_kill INTEGER NOT NULL DEFAULT 0")  # older state dirs
+    return db
+
+
+def bump(db: sqlite3.Connection, key: str, n: int = 1) -> None:
+    db.execute("INSERT INTO counters VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + ?",
+               (key, n, n))
+
+
+def counters() -> Dict[str, int]:
+    db = connect()
+    try:
+        return {r["key"]: r["value"] for r in db.execute("SELECT key, value FROM counters")}
+    finally:
+        db.close()
+
+
+def _job_label(row: sqlite3.Row) -> str:
+    return f"{row['id']}[{row['idx']}]" if row["idx"] else str(row["id"])
+
+
+# ----------------------------
+# bsub
+# ----------------------------
+
+@dataclass
+class Submission:
+    name: str = ""
+    indices: List[int] = field(default_factory=lambda: [0])
+    array_limit: int = 0
+    out: Optional[str] = None
+    err: Optional[str] = None
+    out_append: bool = True
+    err_append: bool = True
+    slots: int = 1
+    mem_mb: int = 0
+    walltime_s: float = 0.0
+    depend: str = ""
+    orphan_kill: bool = False
+    queue: str = "normal"
+    cwd: str = ""
+    cmd: str = ""
+
+
+ARRAY_SPEC_RE = re.compile(r"^(?P<name>[^\[]+)\[(?P<spec>[^\]]+)\](?:%(?P<limit>\d+))?$")
+
+
+def parse_array_spec(spec: str) -> List[int]:
+    """'1-10', '1,3,5-9:2' → sorted element indices."""
+    out: List[int] = []
+    for part in spec.split(","):
+        rng, _, step = part.partition(":")
+        lo, _, hi = rng.partition("-")
+        out.extend(range(int(lo), int(hi or lo) + 1, int(step or 1)))
+    if not out or min(out) < 1:
+        raise ValueError(f"bad job array index list [{spec}]")
+    return sorted(set(out))
+
+
+def parse_walltime(value: str) -> float:
+    """-W [hour:]minute → seconds of (simulated) wall time."""
+    parts = [int(x) for x in value.split(":")]
+    minutes = parts[0] * 60 + parts[1] if len(parts) == 2 else parts[0]
+    return minutes * MINUTE
+
+
+def parse_bsub_args(argv: List[str], sub: Optional[Submission] = None) -> Tuple[Submission, List[str]]:
+    """Options into a Submission; returns it and the command words."""
+    sub = sub or Submission()
+    i = 0
+    while i < len(argv):
+        opt = argv[i]
+        if not opt.startswith("-") or opt == "-":
+            break
+        if opt not in BSUB_VALUE_OPTS:
+            sub.orphan_kill = sub.orphan_kill or opt == "-ti"
+            i += 1  # -K, -I, -B, -N, -x, -H … accepted and ignored
+            continue
+        if i + 1 >= len(argv):
+            raise ValueError(f"{opt}: option requires an argument")
+        val = argv[i + 1]
+        i += 2
+        if opt == "-J":
+            m = ARRAY_SPEC_RE.match(val)
+            if m:
+                sub.name, sub.indices = m.group("name"), parse_array_spec(m.group("spec"))
+                sub.array_limit = int(m.group("limit") or 0)
+            else:
+                sub.name = val
+        elif opt in ("-o", "-oo"):
+            sub.out, sub.out_append = val, opt == "-o"
+        elif opt in ("-e", "-eo"):
+            sub.err, sub.err_append = val, opt == "-e"
+        elif opt == "-n":
+            sub.slots = max(1, int(val.split(",")[-1]))
+        elif opt == "-M":
+            sub.mem_mb = int(float(val))
+        elif opt == "-W":
+            sub.walltime_s = parse_walltime(val)
+        elif opt == "-w":
+            sub.depend = val
+        elif opt == "-q":
+            sub.queue = val
+        elif opt == "-cwd":
+            sub.cwd = val
+    return sub, argv[i:]
+
+
+DEP_RE = re.compile(r"(?P<cond>done|ended|exit|started|post_done|post_err)\(\s*(?P<q>[\"']?)"
+                    r"(?P<job>[^\"'),]+)(?P=q)\s*(?:,\s*(?P<arg>[^)]*))?\)")
+BARE_ID_RE = re.compile(r"^\s*\d+(\[\d+\])?\s*$")
+
+
+def _dep_jobs(db: sqlite3.Connection, ref: str) -> List[sqlite3.Row]:
+    """Jobs a dependency names: an id, id[i], or a (wildcard) name."""
+    m = re.match(r"^(\d+)(?:\[(\d+)\])?$", ref.strip())
+    if m:
+        if m.group(2):
+            return db.execute("SELECT * FROM jobs WHERE id=? AND idx=?",
+                              (int(m.group(1)), int(m.group(2)))).fetchall()
+        return db.execute("SELECT * FROM jobs WHERE id=?", (int(m.group(1)),)).fetchall()
+    ref = ref.strip()
+    if any(c in ref for c in "*?"):
+        return [r for r in db.execute("SELECT * FROM jobs") if fnmatch.fnmatchcase(r["name"], ref)
+                or fnmatch.fnmatchcase(r["array_name"] or "", ref)]
+    rows = db.execute("SELECT * FROM jobs WHERE name=? OR array_name=? ORDER BY id DESC",
+                      (ref, ref)).fetchall()
+    return [r for r in rows if r["id"] == rows[0]["id"]] if rows else []  # most recent job
+
+
+def _dep_holds(cond: str, rows: List[sqlite3.Row], arg: Optional[str]) -> bool:
+    if cond in ("done", "post_done"):
+        return all(r["stat"] == "DONE" for r in rows)
+    if cond == "ended":
+        return all(r["stat"] in FINISHED for r in rows)
+    if cond in ("exit", "post_err"):
+        if arg and arg.strip().lstrip("=").strip().isdigit():
+            code = int(arg.strip().lstrip("=").strip())
+            return all(r["stat"] == "EXIT" and r["exit_code"] == code for r in rows)
+        return all(r["stat"] == "EXIT" for r in rows)
+    return all(r["stat"] != "PEND" for r in rows)  # started
+
+
+def dependency_met(db: sqlite3.Connection, expr: str) -> bool:
+    if not expr:
+        return True
+    if BARE_ID_RE.match(expr):
+        expr = f"done({expr.strip()})"
+    py = DEP_RE.sub(lambda m: str(_dep_holds(m.group("cond"), _dep_jobs(db, m.group("job")),
+                                             m.group("arg"))), expr)
+    py = py.replace("&&", " and ").replace("||", " or ").replace("!", " not ")
+    try:
+        return bool(eval(py, {"__builtins__": {}}, {}))
+    except SyntaxError:
+        return False
+
+
+def _dep_final(cond: str, rows: List[sqlite3.Row], arg: Optional[str]) -> Optional[bool]:
+    """Final value of one condition, or None while its jobs can still change it."""
+    if cond in ("done", "post_done") and any(r["stat"] == "EXIT" for r in rows):
+        return False
+    if cond in ("exit", "post_err") and any(r["stat"] == "DONE" for r in rows):
+        return False
+    if cond == "started" or all(r["stat"] in FINISHED for r in rows):
+        held = _dep_holds(cond, rows, arg)
+        return held if held or cond != "started" else None
+    return None
+
+
+def dependency_dead(db: sqlite3.Connection, expr: str) -> bool:
+    """True once no outcome of the unfinished jobs can satisfy expr (what bsub -ti acts on)."""
+    if not expr:
+        return False
+    if BARE_ID_RE.match(expr):
+        expr = f"done({expr.strip()})"
+    open_terms: List[str] = []
+
+    def term(m: re.Match) -> str:
+        value = _dep_final(m.group("cond"), _dep_jobs(db, m.group("job")), m.group("arg"))
+        if value is not None:
+            return str(value)
+        open_terms.append(f"t{len(open_terms)}")
+        return open_terms[-1]
+
+    py = DEP_RE.sub(term, expr).replace("&&", " and ").replace("||", " or ").replace("!", " not ")
+    if len(open_terms) > 12:
+        return False  # too many undecided conditions to enumerate; leave it pending
+    try:
+        return not any(eval(py, {"__builtins__": {}}, dict(zip(open_terms, values)))
+                       for values in itertools.product((False, True), repeat=len(open_terms)))
+    except SyntaxError:
+        return False
+
+
+def check_dependency(db: sqlite3.Connection, expr: str) -> Optional[str]:
+    """Submission-time check: every referenced job must exist (LSF refuses otherwise)."""
+    if not expr:
+        return None
+    refs = [expr.strip()] if BARE_ID_RE.match(expr) else [m.group("job") for m in DEP_RE.finditer(expr)]
+    if not refs:
+        return f"{expr}: Dependency condition syntax error"
+    for ref in refs:
+        if not _dep_jobs(db, ref):
+            return f"{ref}: No matching job found"
+    return None
+
+
+def insert_submission(db: sqlite3.Connection, sub: Submission, rng: random.Random) -> int:
+    """One job (or array) into the queue under a fresh id; caller holds the write lock."""
+    job_id = (db.execute("SELECT COALESCE(MAX(id), 100) FROM jobs").fetchone()[0]) + 1
+    now = time.time()
+    env = json.dumps(dict(os.environ))
+    name = sub.name or (sub.cmd.split()[0] if sub.cmd.split() else "job")
+    for idx in sub.indices:
+        db.execute(
+            "INSERT INTO jobs (id, idx, name, array_name, stat, cmd, cwd, env, out, err, out_append,"
+            " err_append, slots, mem_mb, walltime_s, depend, orphan_kill, queue, array_limit, fail,"
+            " submit_time, eligible_at, user) VALUES (?,?,?,?, 'PEND', ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (job_id, idx, f"{name}[{idx}]" if idx else name, name if idx else None, sub.cmd,
+             sub.cwd or os.getcwd(), env, sub.out, sub.err, int(sub.out_append), int(sub.err_append),
+             min(sub.slots, SLOTS), sub.mem_mb, sub.walltime_s, sub.depend, int(sub.orphan_kill), sub.queue,
+             sub.array_limit, int(rng.random() < FAIL_RATE), now,
+             now + DELAY + rng.uniform(0, JITTER), getpass.getuser()))
+    return job_id
+
+
+def _script_submission(script: str) -> Tuple[List[str], str]:
+    """`bsub < job.sh`: #BSUB lines are options, the whole script is the command."""
+    opts: List[str] = []
+    for line in script.splitlines():
+        if line.startswith("#BSUB"):
+            opts += shlex.split(line[len("#BSUB"):])
+    return opts, script
+
+
+def bsub(argv: List[str]) -> int:
+    time.sleep(LATENCY)
+    rng = random.Random(os.environ.get("FAKE_LSF_SEED") and
+                        f"{os.environ['FAKE_LSF_SEED']}:{time.time_ns()}")
+    pack: Optional[str] = None
+    if "-pack" in argv:
+        pack = argv[argv.index("-pack") + 1]
+    try:
+        if pack is not None:
+            lines = [ln for ln in Path(pack).read_text().splitlines()
+                     if ln.strip() and not ln.lstrip().startswith("#")]
+            subs = []
+            for ln in lines:
+                sub, cmd = parse_bsub_args(shlex.split(ln))
+                sub.cmd = shlex.join(cmd)
+                subs.append(sub)
+        else:
+            sub, cmd = parse_bsub_args(argv)
+            if not cmd:
+                if sys.stdin.isatty():
+                    print("bsub: no command given", file=sys.stderr)
+                    return 255
+                script_opts, script = _script_submission(sys.stdin.read())
+                sub, _ = parse_bsub_args(script_opts)
+                sub, _ = parse_bsub_args(argv, sub)  # command line wins over #BSUB
+                sub.cmd = script
+            else:
+                sub.cmd = cmd[0] if len(cmd) == 1 else shlex.join(cmd)
+            subs = [sub]
+    except (ValueError, OSError) as e:
+        print(f"{e}. Job not submitted.", file=sys.stderr)
+        return 255
+
+    db = connect()
+    rc = 0
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        bump(db, "bsub_calls")
+        for sub in subs:
+            problem = check_dependency(db, sub.depend)
+            if problem:
+                print(f"{problem}. Job not submitted.", file=sys.stderr)
+                rc = 255
+                continue
+            job_id = insert_submission(db, sub, rng)
+            bump(db, "jobs_submitted", len(sub.indices))
+            print(f"Job <{job_id}> is submitted to "
+                  f"{'default queue' if sub.queue == 'normal' else 'queue'} <{sub.queue}>.")
+        db.execute("COMMIT")
+    finally:
+        db.close()
+    ensure_scheduler()
+    return rc
+
+
+# ----------------------------
+# bjobs / bkill
+# ----------------------------
+
+def _fmt_time(t: Optional[float]) -> str:
+    return time.strftime("%b %d %H:%M", time.localtime(t)) if t else "-"
+
+
+FIELDS = {
+    "jobid": lambda r: str(r["id"]),
+    "jobindex": lambda r: str(r["idx"]),
+    "job_name": lambda r: r["name"],
+    "stat": lambda r: r["stat"],
+    "exit_code": lambda r: "-" if r["exit_code"] is None or r["stat"] != "EXIT" else str(r["exit_code"]),
+    "user": lambda r: r["user"] or "-",
+    "queue": lambda r: r["queue"] or "normal",
+    "from_host": lambda r: HOST,
+    "exec_host": lambda r: HOST if r["start_time"] else "-",
+    "submit_time": lambda r: _fmt_time(r["submit_time"]),
+    "start_time": lambda r: _fmt_time(r["start_time"]),
+    "finish_time": lambda r: _fmt_time(r["finish_time"]),
+    "nalloc_slot": lambda r: str(r["slots"]) if r["start_time"] else "-",
+    "slots": lambda r: str(r["slots"]),
+    "max_mem": lambda r: f"{r['max_mem_mb']:.0f} Mbytes" if r["max_mem_mb"] is not None else "-",
+    "cpu_used": lambda r: f"{r['cpu_s']:.1f} second(s)" if r["cpu_s"] is not None else "-",
+    "run_time": lambda r: (f"{int((r['finish_time'] or time.time()) - r['start_time'])} second(s)"
+                           if r["start_time"] else "-"),
+    "term_reason": lambda r: r["term"] or "-",
+    "dependency": lambda r: r["depend"] or "-",
+}
+DEFAULT_FIELDS = ["jobid", "user", "stat", "queue", "from_host", "exec_host", "job_name", "submit_time"]
+
+
+def _select(db: sqlite3.Connection, ids: List[str], pattern: Optional[str]) -> List[sqlite3.Row]:
+    if ids:
+        rows: List[sqlite3.Row] = []
+        for ref in ids:
+            rows += _dep_jobs(db, ref) if re.match(r"^\d+(\[\d+\])?$", ref) else []
+    else:
+        rows = db.execute("SELECT * FROM jobs ORDER BY id, idx").fetchall()
+    if pattern:
+        rows = [r for r in rows if fnmatch.fnmatchcase(r["name"], pattern)
+                or fnmatch.fnmatchcase(r["array_name"] or "", pattern)]
+    return rows
+
+
+def bjobs(argv: List[str]) -> int:
+    time.sleep(LATENCY)
+    ap = argparse.ArgumentParser(prog="bjobs", add_help=False)
+    for flag in ("-a", "-d", "-r", "-p", "-w", "-W", "-l", "-noheader", "-A"):
+        ap.add_argument(flag, action="store_true", dest=flag.strip("-"))
+    ap.add_argument("-o", dest="fmt")
+    ap.add_argument("-J", dest="name")
+    ap.add_argument("-u", dest="user")
+    ap.add_argument("-q", dest="queue")
+    ap.add_argument("ids", nargs="*")
+    args = ap.parse_args(argv)
+
+    db = connect()
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        bump(db, "bjobs_calls")
+        db.execute("COMMIT")
+        rows = _select(db, args.ids, args.name)
+    finally:
+        db.close()
+    now = time.time()
+    if args.d:
+        rows = [r for r in rows if r["stat"] in FINISHED]
+    elif args.r:
+        rows = [r for r in rows if r["stat"] == "RUN"]
+    elif args.p:
+        rows = [r for r in rows if r["stat"] == "PEND"]
+    elif not args.a and not args.ids:
+        rows = [r for r in rows if r["stat"] in ACTIVE]
+    rows = [r for r in rows if r["stat"] in ACTIVE or args.ids
+            or now - (r["finish_time"] or now) <= CLEAN_PERIOD]
+    if args.queue:
+        rows = [r for r in rows if r["queue"] == args.queue]
+    if not rows:
+        if args.ids and not args.name:
+            for ref in args.ids:
+                print(f"Job <{ref}> is not found", file=sys.stderr)
+        else:
+            print("No job found" if (args.name or args.a or args.d) else "No unfinished job found",
+                  file=sys.stderr)
+        ensure_scheduler_if_pending()
+        return 255
+
+    fmt = args.fmt or ""
+    delim = " "
+    m = re.search(r"delimiter=['\"](.*?)['\"]", fmt)
+    if m:
+        delim, fmt = m.group(1), fmt[:m.start()] + fmt[m.end():]
+    fields = [f.split(":")[0].lower() for f in fmt.split()] or DEFAULT_FIELDS
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        print(f"{unknown[0]}: Illegal field name", file=sys.stderr)
+        return 255
+    table = [[FIELDS[f](r) for f in fields] for r in rows]
+    if not args.fmt:  # classic aligned layout
+        header = [f.upper() for f in fields]
+        widths = [max(len(x) for x in col) for col in zip(header, *table)]
+        lines = ([] if args.noheader else [header]) + table
+        print("\n".join("  ".join(c.ljust(w) for c, w in zip(line, widths)).rstrip() for line in lines))
+    else:
+        if not args.noheader:
+            print(delim.join(f.upper() for f in fields))
+        print("\n".join(delim.join(r) for r in table))
+    ensure_scheduler_if_pending()
+    return 0
+
+
+def bkill(argv: List[str]) -> int:
+    time.sleep(LATENCY)
+    ap = argparse.ArgumentParser(prog="bkill", add_help=False)
+    ap.add_argument("-J", dest="name")
+    ap.add_argument("-s", dest="signal", default="KILL")
+    ap.add_argument("ids", nargs="*")
+    args = ap.parse_args(argv)
+    db = connect()
+    rc = 0
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        bump(db, "bkill_calls")
+        if "0" in args.ids or (not args.ids and args.name):
+            rows = _select(db, [], args.name)
+        else:
+            rows = _select(db, args.ids, args.name)
+        rows = [r for r in rows if r["stat"] in ACTIVE]
+        if not rows:
+            print("No unfinished job found" if not args.ids else f"Job <{args.ids[0]}>: No matching job found",
+                  file=sys.stderr)
+            rc = 255
+        now = time.time()
+        for r in rows:
+            if r["stat"] == "PEND":
+                db.execute("UPDATE jobs SET stat='EXIT', exit_code=130, term='TERM_OWNER', killed=1,"
+                           " finish_time=? WHERE id=? AND idx=?", (now, r["id"], r["idx"]))
+            else:
+                db.execute("UPDATE jobs SET killed=1 WHERE id=? AND idx=?", (r["id"], r["idx"]))
+                if r["pid"]:
+                    try:
+                        os.killpg(r["pid"], signal.SIGTERM)
+                    except (ProcessLookupError, PermissionError):
+                        pass
+            print(f"Job <{_job_label(r)}> is being terminated")
+        db.execute("COMMIT")
+    finally:
+        db.close()
+    return rc
+
+
+# ----------------------------
+# Scheduler
+# ----------------------------
+
+def _spool(row: sqlite3.Row, stream: str) -> Path:
+    return FAKE_LSF_HOME / "spool" / f"{row['id']}_{row['idx']}.{stream}"
+
+
+def _expand(path: str, row: sqlite3.Row) -> Path:
+    p = Path(path.replace("%J", str(row["id"])).replace("%I", str(row["idx"])))
+    return p if p.is_absolute() else Path(row["cwd"]) / p
+
+
+def _report(row: sqlite3.Row, stat: str, code: int, term: Optional[str], max_mem: float,
+            cpu_s: float, start: float, end: float) -> str:
+    label = _job_label(row)
+    outcome = "Successfully completed." if stat == "DONE" else \
+        (f"{term}: job killed.\n" if term else "") + f"Exited with exit code {code}."
+    user = row["user"] or getpass.getuser()
+    requested = f"{row['mem_mb']:.2f} MB" if row["mem_mb"] else "-"
+    return (
+        f"Sender: LSF System <lsfadmin@{HOST}>\n"
+        f"Subject: Job {label}: <{row['name']}> in cluster <{CLUSTER}> {'Done' if stat == 'DONE' else 'Exited'}\n\n"
+        f"Job <{row['name']}> was submitted from host <{HOST}> by user <{user}> in cluster <{CLUSTER}> "
+        f"at {time.ctime(row['submit_time'])}\n"
+        f"Job was executed on host(s) <{row['slots']}*{HOST}>, in queue <{row['queue']}>, as user <{user}> "
+        f"in cluster <{CLUSTER}> at {time.ctime(start)}\n"
+        f"</home/{user}> was used as the home directory.\n"
+        f"<{row['cwd']}> was used as the working directory.\n"
+        f"Started at {time.ctime(start)}\n"
+        f"Terminated at {time.ctime(end)}\n"
+        f"Results reported at {time.ctime(end)}\n\n"
+        "Your job looked like:\n\n"
+        "------------------------------------------------------------\n"
+        "# LSBATCH: User input\n"
+        f"{row['cmd']}\n"
+        "------------------------------------------------------------\n\n"
+        f"{outcome}\n\n"
+        "Resource usage summary:\n\n"
+        f"    CPU time :                                   {cpu_s:.2f} sec.\n"
+        f"    Max Memory :                                 {max_mem:.0f} MB\n"
+        f"    Total Requested Memory :                     {requested}\n"
+        f"    Max Processes :                              1\n"
+        f"    Run time :                                   {int(round(end - start))} sec.\n"
+        f"    Turnaround time :                            {int(round(end - row['submit_time']))} sec.\n\n"
+        "The output (if any) follows:\n\n"
+    )
+
+
+def _write_logs(row: sqlite3.Row, report: str) -> None:
+    out_spool, err_spool = _spool(row, "out"), _spool(row, "err")
+    body = out_spool.read_text(errors="replace") if out_spool.exists() else ""
+    err = err_spool.read_text(errors="replace") if err_spool.exists() else ""
+    if row["out"]:
+        dest = _expand(row["out"], row)
+    else:  # LSF would mail it; keep it under the state dir instead
+        dest = FAKE_LSF_HOME / "mail" / f"{row['id']}_{row['idx']}.out"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, "a" if row["out_append"] else "w") as f:
+        f.write("-" * 60 + "\n" + report + body)
+        if err and not row["err"]:
+            f.write("\n\nPS:\n\nRead file <stderr> for stderr output of this job.\n" + err)
+    if row["err"]:
+        edest = _expand(row["err"], row)
+        edest.parent.mkdir(parents=True, exist_ok=True)
+        with open(edest, "a" if row["err_append"] else "w") as f:
+            f.write(err)
+    for p in (out_spool, err_spool):
+        p.unlink(missing_ok=True)
+
+
+class Scheduler:
+    """Runs PEND jobs in a local slot pool; owns every job process it starts."""
+
+    def __init__(self):
+        self.db = connect()
+        # (id, idx) -> process; the Popen is kept so subprocess never reaps it behind our back
+        self.procs: Dict[Tuple[int, int], subprocess.Popen] = {}
+        self.idle_since = time.time()
+
+    def _finish(self, row: sqlite3.Row, status: int, usage: resource.struct_rusage) -> None:
+        now = time.time()
+        max_mem = usage.ru_maxrss / 1024.0  # KB → MB (Linux)
+        cpu_s = usage.ru_utime + usage.ru_stime
+        code = os.waitstatus_to_exitcode(status)
+        term = None
+        if row["killed"]:
+            code, term = 130, "TERM_OWNER"
+        elif row["walltime_s"] and now - row["start_time"] > row["walltime_s"]:
+            code, term = 140, "TERM_RUNLIMIT"
+        elif row["mem_mb"] and max_mem > row["mem_mb"]:
+            code, term = 137, "TERM_MEMLIMIT"
+        elif code < 0:
+            code = 128 - code
+        stat = "DONE" if code == 0 and term is None else "EXIT"
+        _write_logs(row, _report(row, stat, code, term, max_mem, cpu_s, row["start_time"], now))
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.execute("UPDATE jobs SET stat=?, exit_code=?, term=?, finish_time=?, max_mem_mb=?, cpu_s=?,"
+                        " pid=NULL WHERE id=? AND idx=?",
+                        (stat, code, term, now, max_mem, cpu_s, row["id"], row["idx"]))
+        bump(self.db, "jobs_done" if stat == "DONE" else "jobs_exit")
+        self.db.execute("COMMIT")
+
+    def reap(self) -> None:
+        for key, proc in list(self.procs.items()):
+            row = self.db.execute("SELECT * FROM jobs WHERE id=? AND idx=?", key).fetchone()
+            pid = proc.pid
+            try:
+                got, status, usage = os.wait4(pid, os.WNOHANG)
+            except ChildProcessError:
+                got, status, usage = pid, 0, resource.getrusage(resource.RUSAGE_CHILDREN)
+            if got == 0:
+                if row["walltime_s"] and time.time() - row["start_time"] > row["walltime_s"]:
+                    try:
+                        os.killpg(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                continue
+            del self.procs[key]
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            self._finish(row, status, usage)
+
+    def _start(self, row: sqlite3.Row) -> None:
+        now = time.time()
+        if row["fail"]:
+            # Dies at dispatch (host/launch failure) without running the command
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("UPDATE jobs SET stat='RUN', start_time=? WHERE id=? AND idx=?",
+                            (now, row["id"], row["idx"]))
+            self.db.execute("COMMIT")
+            row = self.db.execute("SELECT * FROM jobs WHERE id=? AND idx=?", (row["id"], row["idx"])).fetchone()
+            _write_logs(row, _report(row, "EXIT", 1, None, 0.0, 0.0, now, now))
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("UPDATE jobs SET stat='EXIT', exit_code=1, finish_time=? WHERE id=? AND idx=?",
+                            (now, row["id"], row["idx"]))
+            bump(self.db, "jobs_failed_injected")
+            self.db.execute("COMMIT")
+            return
+        env = json.loads(row["env"])
+        env.update(LSB_JOBID=str(row["id"]), LSB_JOBINDEX=str(row["idx"]), LSB_JOBNAME=row["name"],
+                   LSB_DJOB_NUMPROC=str(row["slots"]), LSB_MAX_NUM_PROCESSORS=str(row["slots"]),
+                   LSB_QUEUE=row["queue"] or "normal")
+        out_spool = _spool(row, "out")
+        out_spool.parent.mkdir(parents=True, exist_ok=True)
+        fo = open(out_spool, "w")
+        fe = open(_spool(row, "err"), "w")
+        cwd = row["cwd"] if os.path.isdir(row["cwd"]) else str(Path.home())
+        proc = subprocess.Popen(["/bin/bash", "-c", row["cmd"]], cwd=cwd, env=env, stdout=fo, stderr=fe,
+                                stdin=subprocess.DEVNULL, start_new_session=True)
+        fo.close()
+        fe.close()
+        self.procs[(row["id"], row["idx"])] = proc
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.execute("UPDATE jobs SET stat='RUN', start_time=?, pid=? WHERE id=? AND idx=?",
+                        (now, proc.pid, row["id"], row["idx"]))
+        self.db.execute("COMMIT")
+
+    def dispatch(self) -> int:
+        running = self.db.execute("SELECT id, slots FROM jobs WHERE stat='RUN'").fetchall()
+        free = SLOTS - sum(r["slots"] for r in running)
+        per_array: Dict[int, int] = {}
+        for r in running:
+            per_array[r["id"]] = per_array.get(r["id"], 0) + 1
+        started = 0
+        now = time.time()
+        for row in self.db.execute("SELECT * FROM jobs WHERE stat='PEND' AND eligible_at<=? "
+                                   "ORDER BY id, idx", (now,)).fetchall():
+            if row["slots"] > free:
+                continue  # backfill smaller jobs behind it
+            if row["array_limit"] and per_array.get(row["id"], 0) >= row["array_limit"]:
+                continue
+            if not dependency_met(self.db, row["depend"]):
+                if row["orphan_kill"] and dependency_dead(self.db, row["depend"]):
+                    self.db.execute("UPDATE jobs SET stat='EXIT', exit_code=130, term='TERM_ORPHAN_SYSTEM',"
+                                    " finish_time=? WHERE id=? AND idx=?", (now, row["id"], row["idx"]))
+                continue
+            self._start(row)
+            if not row["fail"]:
+                free -= row["slots"]
+                per_array[row["id"]] = per_array.get(row["id"], 0) + 1
+            started += 1
+        return started
+
+    def loop(self) -> None:
+        while True:
+            self.reap()
+            if self.dispatch() or self.procs:
+                self.idle_since = time.time()
+            elif time.time() - self.idle_since > IDLE_EXIT:
+                return
+            time.sleep(TICK)
+
+
+def run_scheduler() -> int:
+    FAKE_LSF_HOME.mkdir(parents=True, exist_ok=True)
+    lock = open(FAKE_LSF_HOME / "scheduler.lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return 0  # another scheduler owns this state dir
+    db = connect()
+    # Jobs left RUN by a scheduler that died can never be reaped
+    db.execute("UPDATE jobs SET stat='EXIT', exit_code=143, term='TERM_HOST', finish_time=?, pid=NULL"
+               " WHERE stat='RUN'", (time.time(),))
+    db.close()
+    Scheduler().loop()
+    return 0
+
+
+def _scheduler_running() -> bool:
+    try:
+        with open(FAKE_LSF_HOME / "scheduler.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        return False
+    except BlockingIOError:
+        return True
+
+
+def ensure_scheduler() -> None:
+    if _scheduler_running():
+        return
+    log = open(FAKE_LSF_HOME / "scheduler.log", "a")
+    subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "scheduler"],
+                     stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    log.close()
+
+
+def ensure_scheduler_if_pending() -> None:
+    db = connect()
+    try:
+        pending = db.execute("SELECT 1 FROM jobs WHERE stat='PEND' LIMIT 1").fetchone()
+    finally:
+        db.close()
+    if pending:
+        ensure_scheduler()
+
+
+# ----------------------------
+# Install / bench
+# ----------------------------
+
+def install(bin_dir: Path) -> None:
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    me = Path(__file__).resolve()
+    for cmd in ("bsub", "bjobs", "bkill"):
+        p = bin_dir / cmd
+        p.write_text(f"#!/bin/sh\nexec {shlex.quote(sys.executable)} {shlex.quote(str(me))} {cmd} \"$@\"\n")
+        p.chmod(0o755)
+    print(f"Installed bsub/bjobs/bkill in {bin_dir} (state: {FAKE_LSF_HOME})")
+    print(f"  export PATH={bin_dir}:$PATH")
+
+
+def wait_all(pattern: str, poll: float, timeout: float) -> Tuple[Dict[str, str], int, float]:
+    """Poll `bjobs -a -J pattern` until nothing is PEND/RUN; returns (states, polls, poll seconds)."""
+    polls, spent = 0, 0.0
+    deadline = time.time() + timeout
+    states: Dict[str, str] = {}
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        cp = subprocess.run(["bjobs", "-a", "-noheader", "-o", "jobid jobindex job_name stat",
+                             "-J", pattern], capture_output=True, text=True)
+        spent += time.perf_counter() - t0
+        polls += 1
+        states = {}
+        for line in cp.stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 4:
+                states[f"{parts[0]}[{parts[1]}]" if parts[1] != "0" else parts[0]] = parts[3]
+        if states and not any(s in ACTIVE for s in states.values()):
+            break
+        time.sleep(poll)
+    return states, polls, spent
+
+
+def bench(args: argparse.Namespace) -> None:
+    global FAKE_LSF_HOME
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import lsf_submit
+
+    results = []
+    for mode in args.modes.split(","):
+        home = Path(tempfile.mkdtemp(prefix=f"fake_lsf_{mode}_"))
+        work = home / "work"
+        work.mkdir()
+        bin_dir = home / "bin"
+        env_before = dict(os.environ)
+        os.environ.update(FAKE_LSF_HOME=str(home), PATH=f"{bin_dir}:{os.environ['PATH']}",
+                          FAKE_LSF_LATENCY=str(args.latency), FAKE_LSF_FAIL=str(args.fail),
+                          FAKE_LSF_DELAY=str(args.delay), FAKE_LSF_SLOTS=str(args.slots))
+        if args.seed is not None:
+            os.environ["FAKE_LSF_SEED"] = str(args.seed)
+        FAKE_LSF_HOME = home
+        install_quiet = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            install(bin_dir)
+            tasks = [lsf_submit.Task(key=f"t{i}", command=f"sleep {args.task_seconds}; echo t{i}",
+                                     out=f"logs/bench_t{i}.out", err=f"logs/bench_t{i}.err",
+                                     name=f"bench_t{i}") for i in range(args.tasks)]
+            res = lsf_submit.Resources(threads=1, shell=["bash", "-c"])  # no login-shell startup
+            t0 = time.perf_counter()
+            ids = lsf_submit.submit(tasks, res, work, name="bench", mode=mode)
+            submit_s = time.perf_counter() - t0
+            states, polls, poll_s = wait_all("bench*", args.poll, args.timeout)
+            attempts = 1
+            while attempts <= args.retries:
+                failed = [t for t in tasks if states.get(ids.get(t.key) or "") == "EXIT"]
+                if not failed:
+                    break
+                attempts += 1
+                t1 = time.perf_counter()
+                ids.update(lsf_submit.submit(failed, res, work, name=f"bench_r{attempts}", mode=mode))
+                submit_s += time.perf_counter() - t1
+                states, p2, s2 = wait_all("bench*", args.poll, args.timeout)
+                polls, poll_s = polls + p2, poll_s + s2
+            makespan = time.perf_counter() - t0
+        finally:
+            sys.stdout.close()
+            sys.stdout = install_quiet
+        c = counters()
+        final = [states.get(ids.get(t.key) or "") for t in tasks]
+        results.append({
+            "mode": mode, "tasks": args.tasks, "bsub_calls": c.get("bsub_calls", 0),
+            "submit_s": round(submit_s, 3), "makespan_s": round(makespan, 3),
+            "bjobs_polls": polls, "poll_s_mean": round(poll_s / max(1, polls), 4),
+            "done": final.count("DONE"), "exit": final.count("EXIT"),
+            "injected_failures": c.get("jobs_failed_injected", 0), "rounds": attempts,
+        })
+        print(json.dumps(results[-1]))
+        os.environ.clear()
+        os.environ.update(env_before)
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2) + "\n")
+
+
+def main() -> None:
+    prog = Path(sys.argv[0]).name
+    if prog in ("bsub", "bjobs", "bkill"):
+        sys.exit({"bsub": bsub, "bjobs": bjobs, "bkill": bkill}[prog](sys.argv[1:]))
+    if len(sys.argv) > 1 and sys.argv[1] in ("bsub", "bjobs", "bkill"):
+        sys.exit({"bsub": bsub, "bjobs": bjobs, "bkill": bkill}[sys.argv[1]](sys.argv[2:]))
+
+    ap = argparse.ArgumentParser(description="Local LSF simulator (bsub/bjobs/bkill)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("install", help="Write bsub/bjobs/bkill wrappers into a directory")
+    i.add_argument("bin_dir", type=Path)
+    sub.add_parser("scheduler", help="Run the scheduler in the foreground")
+    sub.add_parser("counters", help="Print bsub/bjobs/job counters as JSON")
+    b = sub.add_parser("bench", help="Time lsf_submit modes against the simulator")
+    b.add_argument("--tasks", type=int, default=200)
+    b.add_argument("--modes", default="single,pack,array")
+    b.add_argument("--task-seconds", type=float, default=0.05)
+    b.add_argument("--latency", type=float, default=0.05, help="Seconds per bsub/bjobs call")
+    b.add_argument("--delay", type=float, default=0.1, help="Queue delay per job")
+    b.add_argument("--slots", type=int, default=os.cpu_count() or 4)
+    b.add_argument("--fail", type=float, default=0.0, help="Injected failure rate")
+    b.add_argument("--retries", type=int, default=2, help="Resubmission rounds for failed tasks")
+    b.add_argument("--poll", type=float, default=0.5, help="Seconds between bjobs polls")
+    b.add_argument("--timeout", type=float, default=600.0)
+    b.add_argument("--seed", type=int, default=None)
+    b.add_argument("--out", help="Also write the results as a JSON list")
+    args = ap.parse_args()
+    if args.cmd == "install":
+        install(args.bin_dir)
+    elif args.cmd == "scheduler":
+        sys.exit(run_scheduler())
+    elif args.cmd == "counters":
+        print(json.dumps(counters(), indent=2))
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Indexed HLA-region read extractor (replaces per-BAM AltAnalyze hla.py jobs).
+
+For each BAM, reads only the MHC region through the BAM index (plus HLA /
+chr6 alt contigs when the reference has them, and unmapped reads with
+--unmapped), pairs mates in one streaming pass and writes OptiType input
+directly:
+
+  <out>/<sample>_1.fastq.gz [+ <out>/<sample>_2.fastq.gz for paired libraries]
+
+Single-end BAMs produce only _1 (a stale _2 from an earlier run is removed),
+so the `fd --size -50b … -x rm` clean-up is no longer needed. Mates that map
+outside the region are looked up through the index after the region pass;
+reads whose mate cannot be found are dropped from paired output and counted.
+Outputs are written to .tmp files and renamed, so a killed job never leaves a
+truncated FASTQ behind. The compressed bytes are md5'd as they are written and,
+when --out is the BAM's own fastqs/ directory, the result (checksums, layout,
+read count or failure) goes to the bams dir's HLA manifest as a job fragment.
+
+Many BAMs are processed per invocation through a process pool:
+  hla_extract.py --out fastqs --jobs 4 a.bam b.bam …
+  hla_extract.py --out fastqs --bam-dir . --skip-existing
+
+Requires pysam (bio-cli conda env).
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from hla_manifest import write_fragment
+
+try:
+    import pysam
+except ModuleNotFoundError as exc:
+    sys.stderr.write(
+        "Error: pysam is required to extract HLA reads.\n"
+        "Install it with: conda install -c bioconda pysam (or pip install pysam)\n"
+    )
+    raise
+
+# MHC (xMHC) region per build, keyed by the chr6 length in the BAM header
+MHC_REGIONS = {
+    170805979: (28510120, 33480577),  # GRCh38
+    171115067: (28477797, 33448354),  # GRCh37 / hg19
+}
+MHC_FALLBACK = (28400000, 33500000)
+GZ_LEVEL = int(os.environ.get("HLA_GZ_LEVEL", "4"))
+# Mates outside the region are fetched one by one; past this many, drop instead
+MAX_RESCUE = int(os.environ.get("HLA_MAX_RESCUE", "200000"))
+SKIP_FLAGS = 0x100 | 0x800  # secondary, supplementary
+
+
+@dataclass
+class ExtractResult:
+    sample: str
+    ok: bool
+    layout: str = "-"          # paired | single | empty
+    pairs: int = 0
+    singles: int = 0
+    rescued: int = 0
+    dropped: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+
+def sample_name(bam: Path) -> str:
+    return bam.name[:-len(".bam")] if bam.name.endswith(".bam") else bam.stem
+
+
+def hla_regions(bam: "pysam.AlignmentFile", region: Optional[str] = None) -> List[Tuple[str, int, int]]:
+    """(contig, start, end) to fetch: the MHC on chr6 plus HLA-*/chr6 alt contigs."""
+    lengths = dict(zip(bam.references, bam.lengths))
+    if region:
+        contig, _, span = region.partition(":")
+        if span:
+            lo, _, hi = span.replace(",", "").partition("-")
+            return [(contig, int(lo) - 1, int(hi))]
+        return [(contig, 0, lengths[contig])]
+    chr6 = next((c for c in ("chr6", "6") if c in lengths), None)
+    out: List[Tuple[str, int, int]] = []
+    if chr6:
+        lo, hi = MHC_REGIONS.get(lengths[chr6], MHC_FALLBACK)
+        out.append((chr6, lo, min(hi, lengths[chr6])))
+    for contig, length in lengths.items():
+        if contig.startswith("HLA-") or (contig.startswith("chr6_") and contig.endswith("_alt")):
+            out.append((contig, 0, length))
+    return out
+
+
+def _fastq(read: "pysam.AlignedSegment") -> bytes:
+    """Record in original read orientation (reverse-strand alignments are flipped back)."""
+    seq = read.get_forward_sequence() or ""
+    quals = read.get_forward_qualities()
+    qual = pysam.qualities_to_qualitystring(quals) if quals is not None else "I" * len(seq)
+    return f"@{read.query_name}\n{seq}\n+\n{qual}\n".encode()
+
+
+def _unmapped(bam: "pysam.AlignmentFile") -> Iterator["pysam.AlignedSegment"]:
+    """Reads with no coordinate (the index's '*' bin); full scan if the index lacks it."""
+    try:
+        yield from bam.fetch("*")
+    except ValueError:
+        for read in bam.fetch(until_eof=True):
+            if read.reference_id < 0:
+                yield read
+
+
+class _HashingFile:
+    """Output file that md5s the (compressed) bytes as they go to disk."""
+
+    def __init__(self, path: Path):
+        self.f = path.open("wb")
+        self.md5 = hashlib.md5()
+
+    def write(self, data: bytes) -> int:
+        self.md5.update(data)
+        return self.f.write(data)
+
+    def flush(self) -> None:
+        self.f.flush()
+
+    def close(self) -> None:
+        self.f.close()
+
+
+class PairWriter:
+    """Gzip writers for _1/_2 that become visible only on commit()."""
+
+    def __init__(self, out_dir: Path, sample: str):
+        self.final = [out_dir / f"{sample}_1.fastq.gz", out_dir / f"{sample}_2.fastq.gz"]
+        self.tmp = [p.with_name(p.name + ".tmp") for p in self.final]
+        self.raw = [_HashingFile(p) for p in self.tmp]
+        self.fh = [gzip.GzipFile(fileobj=r, mode="wb", compresslevel=GZ_LEVEL) for r in self.raw]
+
+    def pair(self, r1: "pysam.AlignedSegment", r2: "pysam.AlignedSegment") -> None:
+        self.fh[0].write(_fastq(r1))
+        self.fh[1].write(_fastq(r2))
+
+    def single(self, read: "pysam.AlignedSegment") -> None:
+        self.fh[0].write(_fastq(read))
+
+    def _close(self) -> None:
+        for fh, raw in zip(self.fh, self.raw):
+            fh.close()
+            raw.close()
+
+    def commit(self, paired: bool) -> None:
+        self._close()
+        self.tmp[0].replace(self.final[0])
+        if paired:
+            self.tmp[1].replace(self.final[1])
+        else:
+            self.tmp[1].unlink(missing_ok=True)
+            self.final[1].unlink(missing_ok=True)  # stale _2 from an earlier extraction
+
+    def abort(self) -> None:
+        self._close()
+        for tmp in self.tmp:
+            tmp.unlink(missing_ok=True)
+
+    def manifest_values(self, paired: bool) -> Dict[str, str]:
+        """fastq<N>_bytes/_mtime/_md5 of the committed files (a single-end _2 is zeroed)."""
+        out: Dict[str, str] = {}
+        for mate, (path, raw) in enumerate(zip(self.final, self.raw), start=1):
+            if mate == 2 and not paired:
+                out.update(fastq2_bytes="0", fastq2_mtime="0")
+                continue
+            st = path.stat()
+            out.update({f"fastq{mate}_bytes": str(st.st_size), f"fastq{mate}_mtime": str(int(st.st_mtime)),
+                        f"fastq{mate}_md5": raw.md5.hexdigest()})
+        return out
+
+
+def extract(bam_path: Path, out_dir: Path, unmapped: bool = False, region: Optional[str] = None,
+            sample: Optional[str] = None) -> ExtractResult:
+    """Stream one BAM's HLA reads into <out>/<sample>_1/_2.fastq.gz."""
+    t0 = time.monotonic()
+    sample = sample or sample_name(bam_path)
+    res = ExtractResult(sample=sample, ok=False)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writer = PairWriter(out_dir, sample)
+    try:
+        with pysam.AlignmentFile(str(bam_path), "rb") as bam:
+            if not bam.has_index():
+                raise ValueError("no .bai/.csi index (run samtools index)")
+            paired: Optional[bool] = None
+            pending: Dict[Tuple[str, bool], "pysam.AlignedSegment"] = {}  # (qname, is_read1) -> read
+            rescue: List["pysam.AlignedSegment"] = []
+
+            def take(read: "pysam.AlignedSegment") -> None:
+                nonlocal paired
+                if read.flag & SKIP_FLAGS:
+                    return
+                if paired is None:
+                    paired = read.is_paired
+                if not paired:
+                    writer.single(read)
+                    res.singles += 1
+                    return
+                if not read.is_paired:
+                    res.dropped += 1
+                    return
+                mate = pending.pop((read.query_name, not read.is_read1), None)
+                if mate is not None:
+                    r1, r2 = (read, mate) if read.is_read1 else (mate, read)
+                    writer.pair(r1, r2)
+                    res.pairs += 1
+                elif (not read.mate_is_unmapped and read.next_reference_id == read.reference_id
+                      and read.reference_id >= 0 and read.next_reference_start < read.reference_start):
+                    rescue.append(read)  # mate lies before the region: it will never stream past
+                else:
+                    pending[(read.query_name, read.is_read1)] = read
+
+            for contig, lo, hi in hla_regions(bam, region):
+                for read in bam.fetch(contig, lo, hi):
+                    take(read)
+            if unmapped:
+                for read in _unmapped(bam):
+                    take(read)
+
+            # Mates outside the fetched regions: look them up through the index
+            rescue.extend(r for r in pending.values() if not r.mate_is_unmapped)
+            res.dropped += sum(1 for r in pending.values() if r.mate_is_unmapped)
+            pending.clear()
+            if len(rescue) > MAX_RESCUE:
+                res.dropped += len(rescue)
+                rescue = []
+            for read in rescue:
+                try:
+                    mate = bam.mate(read)
+                except ValueError:
+                    res.dropped += 1
+                    continue
+                r1, r2 = (read, mate) if read.is_read1 else (mate, read)
+                writer.pair(r1, r2)
+                res.pairs += 1
+                res.rescued += 1
+
+            res.layout = "empty" if paired is None else ("paired" if paired else "single")
+            writer.commit(paired=bool(paired))
+            res.ok = True
+    except (OSError, ValueError, KeyError) as e:
+        writer.abort()
+        res.error = str(e)
+    res.seconds = time.monotonic() - t0
+    _record(bam_path, out_dir, sample, res, writer)
+    return res
+
+
+def _record(bam_path: Path, out_dir: Path, sample: str, res: ExtractResult, writer: PairWriter) -> None:
+    """Job fragment for <bams_dir>/hla_manifest.tsv when extracting into the BAM's own fastqs/."""
+    bam_dir = bam_path.resolve().parent
+    if out_dir.resolve() != bam_dir / "fastqs":
+        return
+    st = bam_path.stat()
+    values = {"bam_bytes": str(st.st_size), "bam_mtime": str(int(st.st_mtime))}
+    if res.ok:
+        values.update(writer.manifest_values(paired=res.layout == "paired"))
+        values.update(state="empty_extract" if res.layout == "empty" else "extracted",
+                      layout=res.layout, records=str(res.pairs + res.singles))
+    else:
+        values["state"] = "extract_failed"
+    try:
+        write_fragment(bam_dir, "extract", sample, **values)
+    except OSError as e:
+        print(f"  WARNING: manifest fragment for {sample} not written: {e}", file=sys.stderr)
+
+
+def _extract_job(args: Tuple[str, str, bool, Optional[str]]) -> ExtractResult:
+    bam, out, unmapped, region = args
+    return extract(Path(bam), Path(out), unmapped, region)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Extract HLA-region reads from indexed BAMs into FASTQ pairs")
+    ap.add_argument("bams", nargs="*", help="BAM files")
+    ap.add_argument("--bam-dir", help="Also take every *.bam in this directory")
+    ap.add_argument("--out", required=True, help="Output directory (e.g. fastqs)")
+    ap.add_argument("--jobs", type=int, default=int(os.environ.get("LSB_DJOB_NUMPROC", "1")),
+                    help="BAMs processed in parallel (default: LSF slots, else 1)")
+    ap.add_argument("--unmapped", action="store_true", help="Also extract unmapped reads")
+    ap.add_argument("--region", help="Override the MHC region, e.g. chr6:28510120-33480577")
+    ap.add_argument("--skip-existing", action="store_true",
+                    help="Skip BAMs whose <sample>_1.fastq.gz already exists")
+    args = ap.parse_args()
+
+    bams = [Path(b) for b in args.bams]
+    if args.bam_dir:
+        bams += sorted(Path(args.bam_dir).glob("*.bam"))
+    if not bams:
+        ap.error("no BAMs given")
+    out = Path(args.out)
+    todo = []
+    skipped = 0
+    for bam in bams:
+        if args.skip_existing and (out / f"{sample_name(bam)}_1.fastq.gz").exists():
+            skipped += 1
+            continue
+        todo.append((str(bam), str(out), args.unmapped, args.region))
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for fut in as_completed([pool.submit(_extract_job, t) for t in todo]):
+            r = fut.result()
+            if r.ok:
+                print(f"✓ {r.sample}\t{r.layout}\tpairs={r.pairs} singles={r.singles} "
+                      f"rescued={r.rescued} dropped={r.dropped}\t{r.seconds:.1f}s", flush=True)
+            else:
+                failed += 1
+                print(f"✗ {r.sample}\t{r.error}", flush=True)
+    print(f"— {len(todo) - failed}/{len(todo)} BAMs extracted"
+          + (f", {skipped} skipped (FASTQs exist)" if skipped else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
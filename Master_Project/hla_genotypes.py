@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Project-wide HLA genotype table – one incremental aggregator for every cohort.
+
+Replaces the per-directory HLA-scripts/get_hla_all.py runs: `update` scans
+every <root>/Tumors/*/bams* tree in a thread pool for OptiType results
+(processed/<sample>[/<timestamp>]/*_result.tsv), parses only files it has not
+seen at that size/mtime and loads them into <root>/hla_genotypes.sqlite
+(HLA_GENOTYPES_DB; rollback journal, since aggregate jobs on several hosts
+share it over network storage). Result files that disappeared are dropped. The
+`genotypes` view keeps the newest parsed result per (bam_dir, sample):
+
+  cohort, bam_dir, sample, A1, A2, B1, B2, C1, C2, reads, objective, source
+
+The legacy per-directory aggregated_hla_genotypes.txt ("<sample>_1.bed" +
+comma-joined HLA-… alleles) is regenerated from the table on demand.
+
+Usage:
+  hla_genotypes.py update --root <POSEIDON> [--bam-dir DIR ...] [--jobs N] [--export]
+  hla_genotypes.py export --root <POSEIDON> [--bam-dir DIR ...] [--tsv FILE]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DB_NAME = "hla_genotypes.sqlite"
+LEGACY_NAME = "aggregated_hla_genotypes.txt"
+ALLELES = ["A1", "A2", "B1", "B2", "C1", "C2"]
+BUSY_TIMEOUT = float(os.environ.get("HLA_GENOTYPES_BUSY_TIMEOUT", "600"))  # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    cohort TEXT NOT NULL, bam_dir TEXT NOT NULL, sample TEXT NOT NULL,
+    A1 TEXT, A2 TEXT, B1 TEXT, B2 TEXT, C1 TEXT, C2 TEXT,
+    reads REAL, objective REAL, ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_sample ON results(bam_dir, sample);
+DROP VIEW IF EXISTS genotypes;
+CREATE VIEW genotypes AS
+SELECT cohort, bam_dir, sample, A1, A2, B1, B2, C1, C2, reads, objective, path AS source
+FROM results r
+WHERE path = (SELECT path FROM results
+              WHERE bam_dir = r.bam_dir AND sample = r.sample AND A1 IS NOT NULL
+              ORDER BY mtime_ns DESC, path DESC LIMIT 1);
+"""
+
+ResultFile = Tuple[str, int, int]  # path relative to root (under its bams dir key), size, mtime_ns
+
+
+# ----------------------------
+# Scanning / parsing
+# ----------------------------
+
+def find_bam_dirs(root: Path) -> List[Path]:
+    """Every Tumors/<cohort>/bams* directory under the project root."""
+    return sorted(p for p in (root / "Tumors").glob("*/bams*") if p.is_dir())
+
+
+def scan_results(bam_dir: Path, key: str) -> List[ResultFile]:
+    """OptiType *_result.tsv files under bam_dir/processed (sample or timestamp level).
+
+    Paths are built from the bams dir key rather than resolved, so a bams dir
+    that is a symlink still yields paths under its key.
+    """
+    out: List[ResultFile] = []
+    stack = [(bam_dir / "processed", 0)]
+    while stack:
+        d, depth = stack.pop()
+        try:
+            entries = list(os.scandir(d))
+        except OSError:
+            continue
+        for e in entries:
+            if e.is_dir(follow_symlinks=False) and depth < 2:
+                stack.append((Path(e.path), depth + 1))
+            elif depth >= 1 and e.name.endswith("_result.tsv") and e.is_file():
+                st = e.stat()
+                out.append((str(key / Path(e.path).relative_to(bam_dir)), st.st_size, st.st_mtime_ns))
+    return out
+
+
+def parse_result(path: Path) -> Dict[str, Optional[str]]:
+    """First row of an OptiType result: alleles plus Reads / Objective (None if untyped)."""
+    with path.open(newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            return {k: (row.get(k) or None) for k in ALLELES + ["Reads", "Objective"]}
+    return {k: None for k in ALLELES + ["Reads", "Objective"]}
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _scan_dir(bam_dir: Path, key: str, root: Path, known: Dict[str, Tuple[int, int]]
+              ) -> Tuple[Path, List[ResultFile], List[Tuple[ResultFile, Dict[str, Optional[str]]]], int]:
+    """(bam_dir, all result files, parsed new/changed ones, unreadable count) for one directory."""
+    files = scan_results(bam_dir, Path(key))
+    parsed = []
+    errors = 0
+    for rel, size, mtime_ns in files:
+        if known.get(rel) == (size, mtime_ns):
+            continue
+        try:
+            parsed.append(((rel, size, mtime_ns), parse_result(root / rel)))
+        except (OSError, UnicodeDecodeError, csv.Error):
+            errors += 1
+    return bam_dir, files, parsed, errors
+
+
+# ----------------------------
+# Genotype DB
+# ----------------------------
+
+def db_path(root: Path) -> Path:
+    return Path(os.environ.get("HLA_GENOTYPES_DB", str(root / DB_NAME)))
+
+
+def open_db(path: Path) -> sqlite3.Connection:
+    """Open the genotype DB with the rollback journal.
+
+    Aggregate jobs on different hosts share this file over network storage,
+    where WAL's shared-memory index is not safe; writers instead queue on the
+    file lock for up to BUSY_TIMEOUT seconds.
+    """
+    db = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT)
+    db.row_factory = sqlite3.Row
+    if db.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        db.execute("PRAGMA journal_mode=DELETE")  # DBs created by older versions
+    db.executescript(SCHEMA)
+    return db
+
+
+def _bam_dir_key(bam_dir: Path, root: Path) -> str:
+    """bams dir relative to the (resolved) root: its real location when that lies under the
+    root, else the path it was reached by (a symlink to storage outside the project)."""
+    try:
+        return str(bam_dir.resolve().relative_to(root))
+    except ValueError:
+        return os.path.relpath(bam_dir.absolute(), root)
+
+
+def update(root: Path, bam_dirs: Optional[List[Path]] = None, jobs: int = 16) -> Dict[str, int]:
+    """Ingest new/changed result files (all bams dirs, or just these) and drop vanished ones."""
+    root = root.resolve()
+    dirs = [Path(d).absolute() for d in bam_dirs] if bam_dirs else find_bam_dirs(root)
+    db = open_db(db_path(root))
+    keys = [_bam_dir_key(d, root) for d in dirs]
+    known: Dict[str, Tuple[int, int]] = {}
+    for key in keys:
+        for r in db.execute("SELECT path, size, mtime_ns FROM results WHERE bam_dir=?", (key,)):
+            known[r["path"]] = (r["size"], r["mtime_ns"])
+    stats = {"dirs": len(dirs), "files": 0, "parsed": 0, "removed": 0, "errors": 0}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        scans = list(pool.map(lambda dk: _scan_dir(*dk, root, known), zip(dirs, keys)))
+    now = time.time()
+    with db:
+        for (bam_dir, files, parsed, errors), key in zip(scans, keys):
+            stats["files"] += len(files)
+            stats["errors"] += errors
+            present = {rel for rel, _, _ in files}
+            for r in db.execute("SELECT path FROM results WHERE bam_dir=?", (key,)).fetchall():
+                if r["path"] not in present:
+                    db.execute("DELETE FROM results WHERE path=?", (r["path"],))
+                    stats["removed"] += 1
+            for (rel, size, mtime_ns), row in parsed:
+                sample = Path(rel).relative_to(key).parts[1]  # processed/<sample>/...
+                db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                    (rel, size, mtime_ns, bam_dir.parent.name, key, sample,
+                     *[row[a] for a in ALLELES], _float(row["Reads"]), _float(row["Objective"]), now))
+                stats["parsed"] += 1
+    db.close()
+    return stats
+
+
+def genotypes(db: sqlite3.Connection, bam_dir_key: Optional[str] = None) -> List[sqlite3.Row]:
+    if bam_dir_key is None:
+        return db.execute("SELECT * FROM genotypes ORDER BY bam_dir, sample").fetchall()
+    return db.execute("SELECT * FROM genotypes WHERE bam_dir=? ORDER BY sample", (bam_dir_key,)).fetchall()
+
+
+def export_legacy(root: Path, bam_dir: Path) -> int:
+    """Rewrite <bam_dir>/aggregated_hla_genotypes.txt from the table; returns #samples."""
+    root = root.resolve()
+    db = open_db(db_path(root))
+    rows = genotypes(db, _bam_dir_key(bam_dir, root))
+    db.close()
+    lines = ["sample\thla"]
+    for r in rows:
+        hla = ",".join("HLA-" + r[a] for a in ALLELES if r[a])
+        lines.append(f"{r['sample']}_1.bed\t{hla}")
+    out = bam_dir / LEGACY_NAME
+    tmp = out.with_name(out.name + ".tmp")
+    tmp.write_text("\n".join(lines) + "\n")
+    tmp.replace(out)
+    return len(rows)
+
+
+def export_table(root: Path, out: Path) -> int:
+    """Project-wide genotype table as TSV; returns #rows."""
+    db = open_db(db_path(root.resolve()))
+    rows = genotypes(db)
+    db.close()
+    cols = ["cohort", "bam_dir", "sample"] + ALLELES + ["reads", "objective", "source"]
+    tmp = out.with_name(out.name + ".tmp")
+    with tmp.open("w") as f:
+        f.write("\t".join(cols) + "\n")
+        for r in rows:
+            f.write("\t".join("" if r[c] is None else str(r[c]) for c in cols) + "\n")
+    tmp.replace(out)
+    return len(rows)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Incremental project-wide HLA genotype table")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    u = sub.add_parser("update", help="Ingest new OptiType results into the DB")
+    u.add_argument("--root", type=Path, required=True, help="POSEIDON root (Tumors/*/bams* are scanned)")
+    u.add_argument("--bam-dir", type=Path, action="append", help="Only these bams dirs (repeatable)")
+    u.add_argument("--jobs", type=int, default=16, help="Directories scanned in parallel")
+    u.add_argument("--export", action="store_true",
+                   help=f"Also rewrite {LEGACY_NAME} in every updated directory")
+    e = sub.add_parser("export", help=f"Regenerate {LEGACY_NAME} files and/or a project-wide TSV")
+    e.add_argument("--root", type=Path, required=True)
+    e.add_argument("--bam-dir", type=Path, action="append", help="Only these bams dirs (default: all)")
+    e.add_argument("--tsv", type=Path, help="Write the whole table here instead of per-directory files")
+    args = ap.parse_args()
+
+    root = args.root.resolve()
+    if args.cmd == "update":
+        t0 = time.monotonic()
+        stats = update(root, args.bam_dir, args.jobs)
+        print(f"— {stats['dirs']} bams dirs, {stats['files']} result files, {stats['parsed']} parsed, "
+              f"{stats['removed']} removed, {stats['errors']} unreadable "
+              f"in {time.monotonic() - t0:.1f}s → {db_path(root)}")
+        if not args.export:
+            return
+    elif args.tsv:
+        n = export_table(root, args.tsv)
+        print(f"✓ {args.tsv} ({n} samples)")
+        return
+    if not db_path(root).exists():
+        print(f"ERROR: {db_path(root)} not found; run `update --root {args.root}` first")
+        sys.exit(1)
+    if args.bam_dir:
+        dirs = [d.absolute() for d in args.bam_dir]
+    elif args.cmd == "update":
+        dirs = find_bam_dirs(root)
+    else:
+        # Only directories the table covers; never blank a file the DB knows nothing about
+        db = open_db(db_path(root))
+        dirs = [root / r["bam_dir"] for r in db.execute("SELECT DISTINCT bam_dir FROM results ORDER BY 1")]
+        db.close()
+    for bam_dir in dirs:
+        n = export_legacy(root, bam_dir)
+        print(f"✓ {_bam_dir_key(bam_dir, root)}/{LEGACY_NAME} ({n} samples)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Per-bams-directory HLA stage manifest: <bams_dir>/hla_manifest.tsv.
+
+One row per BAM: its fingerprint (bytes + mtime), the extracted FASTQs with
+checksums, the OptiType result, the LSF job ids and the stage state. The
+workflow steps consult it instead of globbing, so a rerun after adding a few
+BAMs submits only new work, and a replaced BAM (fingerprint change) starts
+over from extraction.
+
+Writers never share a file: submission updates the manifest directly (one
+process on the login node), jobs drop a one-line fragment in
+logs/hla_manifest/<sample>.<stage>.tsv (same columns, empty = unchanged) and
+load() folds the fragments in, oldest first, like fastq_manifest.tsv.
+Submitted entries are checked against LSF (reconcile()): a job that is gone or
+ended without leaving a fragment (TERM_RUNLIMIT, MEMLIMIT, lost host) requeues
+its samples, while live jobs are never duplicated.
+
+  hla_manifest.py refresh <bams_dir> [--jobs N]   # reconcile with disk, backfill checksums
+  hla_manifest.py show <bams_dir> [--state S]     # rows (optionally one state)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import shlex
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from lsf_submit import LSF_ACTIVE
+
+MANIFEST_NAME = "hla_manifest.tsv"
+FRAGMENT_DIR = Path("logs") / "hla_manifest"
+STATES = ("new", "extract_submitted", "extract_failed", "empty_extract", "extracted",
+          "optitype_submitted", "optitype_failed", "typed")
+# _1 at or below this many bytes holds no reads (empty gzip member / legacy hla.py stubs)
+EMPTY_FASTQ_BYTES = 50
+
+
+@dataclass
+class HlaEntry:
+    sample: str
+    bam_bytes: int = 0
+    bam_mtime: int = 0         # whole seconds
+    state: str = "new"
+    layout: str = ""           # paired | single | empty
+    fastq1_bytes: int = 0
+    fastq1_mtime: int = 0
+    fastq1_md5: str = ""
+    fastq2_bytes: int = 0
+    fastq2_mtime: int = 0
+    fastq2_md5: str = ""
+    records: int = 0           # reads (pairs count once); 0 = unknown
+    extract_job: str = ""
+    optitype_job: str = ""
+    result: str = ""           # OptiType *_result.tsv, relative to the bams dir
+    updated_at: int = 0
+
+    def row(self) -> List[str]:
+        return [str(getattr(self, c)) for c in COLUMNS]
+
+    @classmethod
+    def parse(cls, parts: List[str]) -> Optional["HlaEntry"]:
+        if len(parts) < len(COLUMNS) or parts[0] in ("", "sample"):
+            return None
+        e = cls(parts[0])
+        return e if e.update(parts) else None
+
+    def update(self, parts: List[str]) -> bool:
+        """Apply a manifest row or fragment; empty fields leave the value unchanged."""
+        try:
+            for f, value in zip(fields(self)[1:], parts[1:]):
+                if value != "":
+                    setattr(self, f.name, int(value) if f.type == "int" else value)
+        except ValueError:
+            return False
+        return True
+
+    def fastq_matches(self, mate: int, st: os.stat_result) -> bool:
+        """True while fastqs/<sample>_<mate> is still the file that was hashed."""
+        return (st.st_size == getattr(self, f"fastq{mate}_bytes")
+                and int(st.st_mtime) == getattr(self, f"fastq{mate}_mtime")
+                and bool(getattr(self, f"fastq{mate}_md5")))
+
+    def reset(self, st: os.stat_result) -> None:
+        """New or replaced BAM: forget every downstream stage."""
+        fresh = HlaEntry(self.sample, st.st_size, int(st.st_mtime), updated_at=int(time.time()))
+        for f in fields(self):
+            setattr(self, f.name, getattr(fresh, f.name))
+
+
+COLUMNS = [f.name for f in fields(HlaEntry)]
+
+
+def fastq_path(bam_dir: Path, sample: str, mate: int) -> Path:
+    return bam_dir / "fastqs" / f"{sample}_{mate}.fastq.gz"
+
+
+def md5_file(path: Path) -> str:
+    h = hashlib.md5()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _latest_result(bam_dir: Path, sample: str) -> Tuple[str, int]:
+    """Newest processed/<sample>[/<timestamp>]/*_result.tsv relative to bam_dir, and its mtime."""
+    sample_dir = bam_dir / "processed" / sample
+    found = [(int(p.stat().st_mtime), p) for p in
+             list(sample_dir.glob("*_result.tsv")) + list(sample_dir.glob("*/*_result.tsv"))]
+    if not found:
+        return "", 0
+    mtime, path = max(found)
+    return str(path.relative_to(bam_dir)), mtime
+
+
+class HlaManifest:
+    def __init__(self, bam_dir: Path):
+        self.bam_dir = bam_dir
+        self.path = bam_dir / MANIFEST_NAME
+        self.fragments = bam_dir / FRAGMENT_DIR
+        self.entries: Dict[str, HlaEntry] = {}
+
+    @classmethod
+    def load(cls, bam_dir: Path, persist: bool = True) -> "HlaManifest":
+        """Manifest plus job fragments; persist=False leaves both files untouched (read-only audits)."""
+        m = cls(Path(bam_dir))
+        if m.path.exists():
+            for line in m.path.read_text().splitlines():
+                e = HlaEntry.parse(line.split("\t"))
+                if e is not None:
+                    m.entries[e.sample] = e
+        if m.fragments.is_dir():
+            frags = []
+            for frag in m.fragments.glob("*.tsv"):
+                try:
+                    frags.append((frag.stat().st_mtime, frag))
+                except OSError:
+                    continue
+            for _, frag in sorted(frags):
+                try:
+                    lines = frag.read_text().splitlines()
+                except OSError:
+                    continue
+                for line in lines:
+                    parts = line.split("\t")
+                    if len(parts) >= len(COLUMNS) and parts[0]:
+                        m.entry(parts[0]).update(parts)
+            if frags and persist:
+                m.save()
+                for _, frag in frags:
+                    frag.unlink(missing_ok=True)
+        return m
+
+    def entry(self, sample: str) -> HlaEntry:
+        if sample not in self.entries:
+            self.entries[sample] = HlaEntry(sample)
+        return self.entries[sample]
+
+    def save(self) -> None:
+        lines = ["\t".join(COLUMNS)]
+        lines += ["\t".join(e.row()) for _, e in sorted(self.entries.items())]
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n")
+        tmp.replace(self.path)
+
+    def refresh(self, jobs: int = 8) -> Dict[str, int]:
+        """
+        Reconcile with disk: new/replaced BAMs reset to 'new', removed BAMs drop
+        out, FASTQs and results that appeared since (e.g. from legacy hla.py jobs
+        or runs before the manifest existed) advance the state, and FASTQs
+        without a matching checksum are hashed. Returns {state: count}.
+
+        Outputs older than their BAM belong to a replaced BAM and are ignored,
+        except when a sample is first adopted into the manifest (BAMs are often
+        copied into place after they were processed).
+        """
+        bams = {p.name[:-len(".bam")]: p for p in self.bam_dir.glob("*.bam")}
+        for sample in set(self.entries) - set(bams):
+            del self.entries[sample]
+        to_hash = []
+        adopted = set(bams) - set(self.entries)
+        for sample, bam in bams.items():
+            st = bam.stat()
+            e = self.entry(sample)
+            if (e.bam_bytes, e.bam_mtime) != (st.st_size, int(st.st_mtime)):
+                e.reset(st)
+            for mate in (1, 2):
+                fq = fastq_path(self.bam_dir, sample, mate)
+                try:
+                    fst = fq.stat()
+                except FileNotFoundError:
+                    if getattr(e, f"fastq{mate}_md5"):
+                        setattr(e, f"fastq{mate}_bytes", 0)
+                        setattr(e, f"fastq{mate}_mtime", 0)
+                        setattr(e, f"fastq{mate}_md5", "")
+                    continue
+                if not e.fastq_matches(mate, fst):
+                    to_hash.append((e, mate, fq, fst))
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for (e, mate, fq, fst), digest in zip(to_hash, pool.map(lambda t: md5_file(t[2]), to_hash)):
+                setattr(e, f"fastq{mate}_bytes", fst.st_size)
+                setattr(e, f"fastq{mate}_mtime", int(fst.st_mtime))
+                setattr(e, f"fastq{mate}_md5", digest)
+        now = int(time.time())
+        for e in (self.entries[s] for s in bams):
+            before = e.state
+            if e.state == "typed" and e.result and (self.bam_dir / e.result).exists():
+                continue
+            adopt = e.sample in adopted
+            result, result_mtime = _latest_result(self.bam_dir, e.sample)
+            if result and (adopt or result_mtime >= e.bam_mtime):
+                e.state, e.result = "typed", result
+            elif not e.fastq1_md5 or not (adopt or e.fastq1_mtime >= e.bam_mtime):
+                if e.state not in ("new", "extract_submitted", "extract_failed"):
+                    e.state = "new"  # outputs vanished
+            elif e.fastq1_bytes <= EMPTY_FASTQ_BYTES:
+                if e.state != "extract_submitted":  # an empty BAM being re-extracted keeps its job
+                    e.state, e.layout = "empty_extract", "empty"
+            else:
+                if e.state in ("new", "extract_submitted", "extract_failed", "empty_extract", "typed"):
+                    e.state = "extracted"
+                e.layout = "paired" if e.fastq2_bytes > EMPTY_FASTQ_BYTES else "single"
+            if e.state != before:
+                e.updated_at = now
+        self.save()
+        return self.counts()
+
+    def counts(self) -> Dict[str, int]:
+        out = {s: 0 for s in STATES}
+        for e in self.entries.values():
+            out[e.state] = out.get(e.state, 0) + 1
+        return out
+
+    def in_state(self, *states: str) -> List[str]:
+        return sorted(s for s, e in self.entries.items() if e.state in states)
+
+    def needs_extract(self) -> List[str]:
+        """BAMs with no usable extraction (and no extraction job in flight)."""
+        return self.in_state("new", "extract_failed")
+
+    def needs_optitype(self) -> List[str]:
+        """Extracted samples with no OptiType job queued (or a failed one)."""
+        return sorted(s for s, e in self.entries.items()
+                      if e.state == "optitype_failed" or (e.state == "extracted" and not e.optitype_job))
+
+    def in_flight(self) -> List[str]:
+        """Samples with an extraction or OptiType job queued or running (once reconcile()d)."""
+        return sorted(s for s, e in self.entries.items()
+                      if e.state in ("extract_submitted", "optitype_submitted")
+                      or (e.state == "extracted" and e.optitype_job))
+
+    def job_ids(self) -> List[str]:
+        """LSF job ids of submitted entries, for lsf_submit.job_states()."""
+        ids = set()
+        for e in self.entries.values():
+            if e.state == "extract_submitted":
+                ids.add(e.extract_job)
+            elif e.state == "optitype_submitted" or (e.state == "extracted" and e.optitype_job):
+                ids.add(e.optitype_job)
+        return sorted(ids - {""})
+
+    def reconcile(self, states: Optional[Dict[str, str]], force: bool = False) -> List[str]:
+        """
+        Requeue submitted samples whose LSF job is gone or ended without reporting
+        back: extract_submitted -> extract_failed, optitype_submitted ->
+        optitype_failed, and an extracted sample's DAG-held OptiType job that
+        ended without a result is forgotten. `states` is lsf_submit.job_states()
+        for job_ids(); when LSF could not be asked (None) in-flight entries are
+        kept unless force.
+        Returns the requeued samples.
+        """
+        lost = []
+        now = int(time.time())
+        for sample, e in sorted(self.entries.items()):
+            if e.state == "extract_submitted":
+                job, stage, failed = e.extract_job, "extract", "extract_failed"
+            elif e.state == "optitype_submitted":
+                job, stage, failed = e.optitype_job, "optitype", "optitype_failed"
+            elif e.state == "extracted" and e.optitype_job:
+                job, stage, failed = e.optitype_job, "optitype", "extracted"
+            else:
+                continue
+            if states is None and not force:
+                continue
+            if states is not None and job and states.get(job) in LSF_ACTIVE:
+                continue
+            if (self.fragments / f"{sample}.{stage}.tsv").exists():
+                continue  # reported after load(); folded in next time
+            e.state, e.updated_at = failed, now
+            if failed == "extracted":
+                e.optitype_job = ""
+            lost.append(sample)
+        if lost:
+            self.save()
+        return lost
+
+    def mark(self, samples: Iterable[str], state: str, **values: str) -> None:
+        """Submission-side update (e.g. state=extract_submitted, extract_job=<id>)."""
+        now = int(time.time())
+        for s in samples:
+            e = self.entry(s)
+            e.state, e.updated_at = state, now
+            for k, v in values.items():
+                setattr(e, k, v)
+
+
+def fragment_line(sample: str, **values: str) -> str:
+    """One fragment row: given columns filled, the rest empty (= unchanged)."""
+    return "\t".join([sample] + [str(values.get(c, "")) for c in COLUMNS[1:]])
+
+
+def write_fragment(bam_dir: Path, stage: str, sample: str, **values: str) -> None:
+    frag = bam_dir / FRAGMENT_DIR / f"{sample}.{stage}.tsv"
+    frag.parent.mkdir(parents=True, exist_ok=True)
+    tmp = frag.with_name(frag.name + ".tmp")
+    tmp.write_text(fragment_line(sample, updated_at=str(int(time.time())), **values) + "\n")
+    tmp.replace(frag)
+
+
+def fragment_shell(stage: str, sample: str, **values: str) -> str:
+    """bash that writes a fragment from inside a job (run in the bams dir; values may use $VARS)."""
+    cols = [sample] + [values.get(c, "$(date +%s)" if c == "updated_at" else "") for c in COLUMNS[1:]]
+    frag = f"{FRAGMENT_DIR}/{sample}.{stage}.tsv"
+    fmt = "\\t".join(["%s"] * len(cols)) + "\\n"
+    return (f"mkdir -p {FRAGMENT_DIR} && printf '{fmt}' "
+            + " ".join(f'"{v}"' for v in cols) + f" > {shlex.quote(frag)}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-bams-directory HLA stage manifest")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("refresh", help="Reconcile the manifest with the directory")
+    r.add_argument("bam_dir")
+    r.add_argument("--jobs", type=int, default=8, help="Parallel checksum workers")
+    s = sub.add_parser("show", help="Print manifest rows")
+    s.add_argument("bam_dir")
+    s.add_argument("--state", choices=STATES)
+    args = ap.parse_args()
+
+    if args.cmd == "refresh":
+        counts = HlaManifest.load(Path(args.bam_dir)).refresh(args.jobs)
+        print("  ".join(f"{k}={v}" for k, v in counts.items() if v) or "no BAMs")
+        return
+    m = HlaManifest.load(Path(args.bam_dir))
+    print("\t".join(COLUMNS))
+    for sample in sorted(m.entries):
+        e = m.entries[sample]
+        if not args.state or e.state == args.state:
+            print("\t".join(e.row()))
+
+
+if __name__ == "__main__":
+    main()
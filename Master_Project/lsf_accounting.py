@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+LSF accounting harvester – per-job CPU / memory / walltime history.
+
+Every LSF output file we write ends (or, with -o, repeatedly ends) with a
+report: "Successfully completed." / "Exited with exit code N.", TERM_* reason,
+CPU time, Max Memory, Total Requested Memory, Run time. `harvest` walks every
+logs/ directory under the project root, parses those reports in a process
+pool and loads them into <root>/lsf_accounting.sqlite (LSF_ACCOUNTING_DB).
+Files already loaded are skipped while their size and mtime are unchanged.
+
+Job types come from the log names the workflows use:
+  fastq     logs/fastq_<SRR>.out.txt            (core_fastq_workflow)
+  chr6      logs/<jobid>.out                    (run_hla_workflow extract; sample = job name)
+  optitype  logs/OptiType_<sample>_<jobid>.out  (run_hla_workflow optitype)
+  star      logs/STAR2pass_<sample>.out         (STAR-new_2pass_submit.sh)
+Job-array elements (logs/arrays/<array>.<jobid>_<i>.out, see lsf_submit.py)
+are mapped back to their sample through the array's index file; the per-task
+symlinks pointing at them are not counted twice.
+
+Usage:
+  lsf_accounting.py harvest --root <POSEIDON> [--jobs N]
+  lsf_accounting.py report  --root <POSEIDON> [cpu|memory|runtime|all]
+                            [--since DAYS] [--cohort 'Tumors/*'] [--tsv]
+"""
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import mmap
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DB_NAME = "lsf_accounting.sqlite"
+REPORT_MARK = b"Sender: LSF System"
+OUTPUT_MARK = "The output (if any) follows"  # job stdout after this may say anything
+REPORT_SPAN = 65536  # a report (header, echoed command, summary) fits inside this
+# Directories never worth descending into while looking for logs/
+SKIP_DIRS = {"fastqs", "processed", "__pycache__"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    reports INTEGER NOT NULL, harvested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT NOT NULL, seq INTEGER NOT NULL,
+    cohort TEXT NOT NULL, job_type TEXT NOT NULL, sample TEXT,
+    job_id INTEGER, job_index INTEGER, job_name TEXT,
+    outcome TEXT NOT NULL, exit_code INTEGER, term TEXT,
+    slots INTEGER, req_mem_mb REAL, max_mem_mb REAL, cpu_s REAL, run_s REAL, turnaround_s REAL,
+    started_at REAL, finished_at REAL,
+    PRIMARY KEY (path, seq)
+);
+CREATE INDEX IF NOT EXISTS jobs_type ON jobs(job_type);
+CREATE INDEX IF NOT EXISTS jobs_cohort ON jobs(cohort);
+"""
+
+# ----------------------------
+# Report parsing
+# ----------------------------
+MEM_SCALE = {"KB": 1 / 1024, "MB": 1.0, "GB": 1024.0, "TB": 1024.0 * 1024}
+REPORT_RE = {
+    "subject": re.compile(r"Subject: Job (\d+)(?:\[(\d+)\])?: <(.*?)> in cluster"),
+    "hosts": re.compile(r"executed on host\(s\) <(?:(\d+)\*)?[^>]*>"),
+    "started": re.compile(r"Started at (.+)"),
+    "terminated": re.compile(r"Terminated at (.+)"),
+    "exit": re.compile(r"Exited with (?:exit code (\d+)|signal termination: (\w+))"),
+    "term": re.compile(r"\b(TERM_[A-Z_]+)"),
+    "cpu_s": re.compile(r"CPU time\s*:\s*([\d.]+)\s*sec"),
+    "max_mem": re.compile(r"Max Memory\s*:\s*([\d.]+)\s*(\w+)"),
+    "req_mem": re.compile(r"Total Requested Memory\s*:\s*([\d.]+)\s*(\w+)"),
+    "run_s": re.compile(r"Run time\s*:\s*([\d.]+)\s*sec"),
+    "turnaround_s": re.compile(r"Turnaround time\s*:\s*([\d.]+)\s*sec"),
+}
+
+
+@dataclass
+class JobRecord:
+    seq: int
+    job_id: Optional[int] = None
+    job_index: Optional[int] = None
+    job_name: str = ""
+    outcome: str = "unknown"   # ok | exit | memlimit | runlimit | killed
+    exit_code: Optional[int] = None
+    term: Optional[str] = None
+    slots: Optional[int] = None
+    req_mem_mb: Optional[float] = None
+    max_mem_mb: Optional[float] = None
+    cpu_s: Optional[float] = None
+    run_s: Optional[float] = None
+    turnaround_s: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+def _lsf_time(text: str) -> Optional[float]:
+    try:
+        return time.mktime(time.strptime(text.strip(), "%a %b %d %H:%M:%S %Y"))
+    except ValueError:
+        return None
+
+
+def _mem_mb(m: Optional[re.Match]) -> Optional[float]:
+    if not m:
+        return None
+    return float(m.group(1)) * MEM_SCALE.get(m.group(2).upper(), 1.0)
+
+
+def parse_report(text: str, seq: int = 0) -> Optional[JobRecord]:
+    """One LSF report (starting at "Sender: LSF System"); None if it is not finished."""
+    if "Resource usage summary" not in text and "Exited with" not in text \
+            and "Successfully completed." not in text:
+        return None
+    rec = JobRecord(seq=seq)
+    m = REPORT_RE["subject"].search(text)
+    if m:
+        rec.job_id = int(m.group(1))
+        rec.job_index = int(m.group(2)) if m.group(2) else 0
+        rec.job_name = m.group(3)
+    m = REPORT_RE["hosts"].search(text)
+    if m:
+        rec.slots = int(m.group(1) or 1)
+    for key in ("started", "terminated"):
+        m = REPORT_RE[key].search(text)
+        if m:
+            setattr(rec, "started_at" if key == "started" else "finished_at", _lsf_time(m.group(1)))
+    # Outcome and usage come after the echoed job command, which may mention anything
+    cmd = text.find("# LSBATCH: User input")
+    if cmd >= 0:
+        end = text.find("-" * 60, cmd)
+        text = text[end:] if end >= 0 else text[cmd:]
+    m = REPORT_RE["term"].search(text)
+    rec.term = m.group(1) if m else None
+    if "Successfully completed." in text:
+        rec.outcome, rec.exit_code = "ok", 0
+    else:
+        m = REPORT_RE["exit"].search(text)
+        if m and m.group(1):
+            rec.exit_code = int(m.group(1))
+        rec.outcome = {"TERM_MEMLIMIT": "memlimit", "TERM_RUNLIMIT": "runlimit",
+                       "TERM_OWNER": "killed", "TERM_ADMIN": "killed"}.get(rec.term or "", "exit")
+    for key in ("cpu_s", "run_s", "turnaround_s"):
+        m = REPORT_RE[key].search(text)
+        if m:
+            setattr(rec, key, float(m.group(1)))
+    rec.max_mem_mb = _mem_mb(REPORT_RE["max_mem"].search(text))
+    rec.req_mem_mb = _mem_mb(REPORT_RE["req_mem"].search(text))
+    return rec
+
+
+def last_report(text: str) -> Optional[JobRecord]:
+    """The newest report in an LSF output file's text (-oo overwrites, but -o appends)."""
+    pos = text.rfind(REPORT_MARK.decode())
+    chunk = text[pos:] if pos >= 0 else text
+    cut = chunk.find(OUTPUT_MARK)
+    return parse_report(chunk[:cut] if cut >= 0 else chunk)
+
+
+def parse_file(path: str) -> Tuple[str, int, int, List[JobRecord]]:
+    """Every report in one output file (-o appends one per run).
+
+    The file is mmapped and only the bytes around each report marker are
+    decoded, so large job outputs cost a memchr scan, not a parse.
+    """
+    st = os.stat(path)
+    records: List[JobRecord] = []
+    if st.st_size == 0:
+        return path, st.st_size, st.st_mtime_ns, records
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = mm.find(REPORT_MARK)
+        while pos >= 0:
+            nxt = mm.find(REPORT_MARK, pos + len(REPORT_MARK))
+            end = min(pos + REPORT_SPAN, nxt if nxt >= 0 else len(mm))
+            chunk = mm[pos:end].decode("utf-8", errors="replace")
+            cut = chunk.find(OUTPUT_MARK)
+            rec = parse_report(chunk[:cut] if cut >= 0 else chunk, seq=len(records))
+            if rec is not None:
+                records.append(rec)
+            pos = nxt
+    return path, st.st_size, st.st_mtime_ns, records
+
+
+# ----------------------------
+# Log discovery / classification
+# ----------------------------
+NAME_RULES = [
+    ("fastq", re.compile(r"^fastq_(?P<sample>.+?)\.out\.txt$")),
+    ("star", re.compile(r"^STAR2pass_(?P<sample>.+)\.out$")),
+    ("optitype", re.compile(r"^OptiType_(?P<sample>.+?)_(?:\d+|%J)(?:_\d+)?\.out$")),
+    ("chr6", re.compile(r"^(?:\d+|%J)(?:_\d+)?\.out$")),
+]
+ARRAY_FILE_RE = re.compile(r"^(?P<stem>.+)\.(?P<jobid>\d+)_(?P<index>\d+)\.out$")
+ARRAY_PREFIXES = {"fastq_": "fastq", "chr6_": "chr6", "OptiType_": "optitype", "align_": "star"}
+
+
+def classify(name: str, job_name: str) -> Tuple[str, str]:
+    """(job_type, sample) from a log file name; chr6 logs carry the sample in the job name."""
+    for job_type, rx in NAME_RULES:
+        m = rx.match(name)
+        if m:
+            return job_type, (m.groupdict().get("sample") or job_name)
+    return "other", job_name or name.split(".")[0]
+
+
+def _array_index(arrays_dir: Path, stem: str, cache: Dict[str, Dict[str, Tuple[str, str]]]
+                 ) -> Dict[str, Tuple[str, str]]:
+    """{index: (key, out template)} from logs/arrays/<stem>.tsv."""
+    if stem not in cache:
+        out: Dict[str, Tuple[str, str]] = {}
+        try:
+            for line in (arrays_dir / f"{stem}.tsv").read_text().splitlines():
+                parts = line.split("\t")
+                if len(parts) >= 3:
+                    out[parts[0]] = (parts[1], parts[2])
+        except OSError:
+            pass
+        cache[stem] = out
+    return cache[stem]
+
+
+def classify_array(path: Path, job_name: str, cache: Dict[str, Dict[str, Tuple[str, str]]]) -> Tuple[str, str]:
+    m = ARRAY_FILE_RE.match(path.name)
+    if not m:
+        return "other", job_name
+    key, template = _array_index(path.parent, m.group("stem"), cache).get(m.group("index"), ("", ""))
+    job_type, sample = classify(Path(template).name, key) if template else ("other", key)
+    if job_type == "other":
+        job_type = next((t for p, t in ARRAY_PREFIXES.items() if m.group("stem").startswith(p)), "other")
+    return job_type, sample or job_name
+
+
+def find_logs(root: Path) -> Iterator[Path]:
+    """Every LSF output file under any logs/ directory (symlinks skipped)."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            entries = list(os.scandir(d))
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            continue
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                if e.name == "logs":
+                    yield from _logs_in(Path(e.path))
+                elif e.name not in SKIP_DIRS and not e.name.startswith("."):
+                    stack.append(Path(e.path))
+
+
+def _logs_in(logs: Path) -> Iterator[Path]:
+    for sub in (logs, logs / "arrays"):
+        try:
+            entries = list(os.scandir(sub))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for e in entries:
+            if (e.name.endswith(".out") or e.name.endswith(".out.txt")) and e.is_file(follow_symlinks=False):
+                yield Path(e.path)
+
+
+def cohort_of(path: Path, root: Path) -> str:
+    """Directory that owns the logs/ folder, relative to the root (e.g. Tumors/Tongue/bams)."""
+    logs = path.parent.parent if path.parent.name == "arrays" else path.parent
+    try:
+        return str(logs.parent.relative_to(root))
+    except ValueError:
+        return str(logs.parent)
+
+
+# ----------------------------
+# History DB
+# ----------------------------
+
+def db_path(root: Path) -> Path:
+    return Path(os.environ.get("LSF_ACCOUNTING_DB", str(root / DB_NAME)))
+
+
+def open_db(path: Path) -> sqlite3.Connection:
+    db = sqlite3.connect(str(path), timeout=60)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def harvest(root: Path, jobs: int = 0) -> Dict[str, int]:
+    """Parse new or changed LSF outputs under root into the history DB."""
+    root = root.resolve()
+    db = open_db(db_path(root))
+    known = {p: (s, m) for p, s, m in db.execute("SELECT path, size, mtime_ns FROM files")}
+    todo: List[str] = []
+    seen = 0
+    for p in find_logs(root):
+        seen += 1
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        if known.get(str(p)) != (st.st_size, st.st_mtime_ns):
+            todo.append(str(p))
+    stats = {"files": seen, "parsed": 0, "reports": 0, "unchanged": seen - len(todo), "errors": 0}
+    cache: Dict[str, Dict[str, Tuple[str, str]]] = {}
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 4) as pool:
+        results = pool.map(_parse_safe, todo, chunksize=64)
+        with db:
+            for path, size, mtime_ns, records in results:
+                if size < 0:
+                    stats["errors"] += 1
+                    continue
+                p = Path(path)
+                cohort = cohort_of(p, root)
+                db.execute("DELETE FROM jobs WHERE path=?", (path,))
+                for r in records:
+                    if p.parent.name == "arrays":
+                        job_type, sample = classify_array(p, r.job_name, cache)
+                    else:
+                        job_type, sample = classify(p.name, r.job_name)
+                    db.execute(
+                        "INSERT INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                        (path, r.seq, cohort, job_type, sample, r.job_id, r.job_index, r.job_name,
+                         r.outcome, r.exit_code, r.term, r.slots, r.req_mem_mb, r.max_mem_mb,
+                         r.cpu_s, r.run_s, r.turnaround_s, r.started_at, r.finished_at))
+                db.execute("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?)",
+                           (path, size, mtime_ns, len(records), time.time()))
+                stats["parsed"] += 1
+                stats["reports"] += len(records)
+    db.close()
+    return stats
+
+
+def _parse_safe(path: str) -> Tuple[str, int, int, List[JobRecord]]:
+    try:
+        return parse_file(path)
+    except (OSError, ValueError):
+        return path, -1, 0, []
+
+# ----------------------------
+# Reports
+# ----------------------------
+
+def _pct(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100)."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[max(0, min(len(s) - 1, int(round(q / 100 * len(s) + 0.5)) - 1))]
+
+
+def _hms(seconds: float) -> str:
+    m = int(round(seconds / 60))
+    return f"{m // 60}:{m % 60:02d}"
+
+
+def load_rows(db: sqlite3.Connection, since_days: Optional[float], cohort: Optional[str]) -> List[sqlite3.Row]:
+    db.row_factory = sqlite3.Row
+    q, args = "SELECT * FROM jobs", []
+    if since_days is not None:
+        q += " WHERE finished_at >= ?"
+        args.append(time.time() - since_days * 86400)
+    rows = db.execute(q, args).fetchall()
+    if cohort:
+        rows = [r for r in rows if fnmatch.fnmatchcase(r["cohort"], cohort)]
+    return rows
+
+
+def _emit(header: List[str], table: List[List[str]], tsv: bool) -> None:
+    if tsv:
+        print("\t".join(header))
+        for row in table:
+            print("\t".join(row))
+        return
+    widths = [max(len(x) for x in col) for col in zip(header, *table)]
+    for row in [header] + table:
+        print("  ".join(c.rjust(w) if i else c.ljust(w) for i, (c, w) in enumerate(zip(row, widths))))
+
+
+def report_cpu(rows: List[sqlite3.Row], tsv: bool) -> None:
+    """CPU-hours and slot-hours per cohort (slot-hours = run time × -n)."""
+    agg: Dict[str, List[float]] = {}
+    for r in rows:
+        a = agg.setdefault(r["cohort"], [0, 0, 0.0, 0.0])
+        a[0] += 1
+        a[1] += r["outcome"] != "ok"
+        a[2] += (r["cpu_s"] or 0) / 3600
+        a[3] += (r["run_s"] or 0) * (r["slots"] or 1) / 3600
+    table = [[c, str(int(n)), str(int(f)), f"{cpu:.1f}", f"{slot:.1f}",
+              f"{100 * cpu / slot:.0f}%" if slot else "-"]
+             for c, (n, f, cpu, slot) in sorted(agg.items(), key=lambda kv: -kv[1][3])]
+    tot = [sum(v[i] for v in agg.values()) for i in range(4)]
+    table.append(["TOTAL", str(int(tot[0])), str(int(tot[1])), f"{tot[2]:.1f}", f"{tot[3]:.1f}",
+                  f"{100 * tot[2] / tot[3]:.0f}%" if tot[3] else "-"])
+    _emit(["cohort", "jobs", "failed", "cpu_h", "slot_h", "cpu_eff"], table, tsv)
+
+
+def report_memory(rows: List[sqlite3.Row], tsv: bool) -> None:
+    """Requested vs used memory per job type; suggests -M from p95 usage + 20%."""
+    by_type: Dict[str, List[sqlite3.Row]] = {}
+    for r in rows:
+        if r["req_mem_mb"] and r["max_mem_mb"] is not None:
+            by_type.setdefault(r["job_type"], []).append(r)
+    table = []
+    for t, rs in sorted(by_type.items()):
+        req = [r["req_mem_mb"] for r in rs]
+        used = [r["max_mem_mb"] for r in rs]
+        idle_gbh = sum(max(0.0, r["req_mem_mb"] - r["max_mem_mb"]) / 1024 * (r["run_s"] or 0) / 3600 for r in rs)
+        p95 = _pct(used, 95)
+        suggest = int(-(-p95 * 1.2 // 1000) * 1000) or 1000
+        table.append([t, str(len(rs)), f"{_pct(req, 50):.0f}", f"{_pct(used, 50):.0f}", f"{p95:.0f}",
+                      f"{max(used):.0f}", f"{_pct(req, 50) / p95:.1f}x" if p95 else "-",
+                      f"{idle_gbh:.1f}", str(suggest),
+                      str(sum(1 for r in rs if r["outcome"] == "memlimit"))])
+    _emit(["job_type", "jobs", "req_mb_p50", "used_mb_p50", "used_mb_p95", "used_mb_max",
+           "over_req", "idle_GBh", "suggest_M", "memlimit"], table, tsv)
+
+
+def report_runtime(rows: List[sqlite3.Row], tsv: bool) -> None:
+    """Run-time percentiles per stage, with failure counts by reason."""
+    by_type: Dict[str, List[sqlite3.Row]] = {}
+    for r in rows:
+        by_type.setdefault(r["job_type"], []).append(r)
+    table = []
+    for t, rs in sorted(by_type.items()):
+        ok = [r["run_s"] for r in rs if r["outcome"] == "ok" and r["run_s"] is not None]
+        fails: Dict[str, int] = {}
+        for r in rs:
+            if r["outcome"] != "ok":
+                fails[r["outcome"]] = fails.get(r["outcome"], 0) + 1
+        table.append([t, str(len(rs)), str(len(ok)),
+                      _hms(_pct(ok, 50)) if ok else "-", _hms(_pct(ok, 95)) if ok else "-",
+                      _hms(max(ok)) if ok else "-",
+                      ",".join(f"{k}={v}" for k, v in sorted(fails.items())) or "-"])
+    _emit(["job_type", "jobs", "ok", "run_p50", "run_p95", "run_max", "failures"], table, tsv)
+
+
+REPORTS = {"cpu": report_cpu, "memory": report_memory, "runtime": report_runtime}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Harvest LSF job reports into a history DB and summarise them")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    h = sub.add_parser("harvest", help="Parse LSF outputs under --root into the DB")
+    h.add_argument("--root", type=Path, required=True, help="POSEIDON root (searched for logs/ dirs)")
+    h.add_argument("--jobs", type=int, default=0, help="Parser processes (default: all cores)")
+    r = sub.add_parser("report", help="CPU-hours, memory right-sizing and run-time percentiles")
+    r.add_argument("what", nargs="?", default="all", choices=sorted(REPORTS) + ["all"])
+    r.add_argument("--root", type=Path, required=True)
+    r.add_argument("--since", type=float, default=None, help="Only jobs finished in the last N days")
+    r.add_argument("--cohort", default=None, help="Glob on cohort path, e.g. 'Tumors/*'")
+    r.add_argument("--tsv", action="store_true", help="Tab-separated output")
+    args = ap.parse_args()
+
+    if args.cmd == "harvest":
+        t0 = time.monotonic()
+        stats = harvest(args.root, args.jobs)
+        print(f"— {stats['files']} LSF outputs, {stats['parsed']} parsed ({stats['reports']} job reports), "
+              f"{stats['unchanged']} unchanged, {stats['errors']} unreadable "
+              f"in {time.monotonic() - t0:.1f}s → {db_path(args.root.resolve())}")
+        return
+    path = db_path(args.root.resolve())
+    if not path.exists():
+        print(f"ERROR: {path} not found; run `harvest --root {args.root}` first")
+        sys.exit(1)
+    db = open_db(path)
+    rows = load_rows(db, args.since, args.cohort)
+    db.close()
+    if not rows:
+        print("No job reports match.")
+        return
+    for i, name in enumerate(sorted(REPORTS) if args.what == "all" else [args.what]):
+        if not args.tsv:
+            print(("\n" if i else "") + f"== {name} ==")
+        REPORTS[name](rows, args.tsv)
+
+
+if __name__ == "__main__":
+    main()
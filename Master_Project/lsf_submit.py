@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Shared LSF submission layer: one bsub per batch instead of one per sample.
+
+A batch is a list of homogeneous tasks (same resources, different command):
+
+  array  – one job array  -J "<name>[1-N]%K"; logs/arrays/<name>.tsv maps each
+           array index to its task (key, log paths, command file under
+           logs/arrays/<name>/) and a small runner script picks its line by
+           $LSB_JOBINDEX. Each element links its LSF
+           report to the task's usual log path, so per-sample logs keep their names.
+           Job names do not: every element is "<stem>[i]", where the stem is
+           <name>_<time>_<pid> (plus _<n> if that directory already exists).
+  pack   – one `bsub -pack` file with a line per task (keeps per-task job names)
+  single – the old behaviour: one bsub per task
+
+LSF_SUBMIT_MODE picks the default mode (array); LSF_ARRAY_LIMIT caps how many
+array elements run at once (%K, 0 = no cap).
+
+Returned job ids are "<jobid>[<index>]" for array elements – the same form
+bjobs_status()/reconcile code sees once element names are parsed.
+
+CLI (used by the STAR-new_2pass_submit.sh scripts):
+  lsf_submit.py array --name align_Mouth --list sample_list.txt \\
+      --cmd '$ROOT/run_star-new.sh {0} {1} {2}' --job-name 'align_{0}' \\
+      --out 'logs/STAR2pass_{0}.out' --err 'logs/STAR2pass_{0}.err' \\
+      -- -W 12:00 -n 2 -M 128000 -R "rusage[mem=16000] span[hosts=1]"
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SUBMIT_MODES = ("array", "pack", "single")
+LSF_SUBMIT_MODE = os.environ.get("LSF_SUBMIT_MODE", "array")
+LSF_ARRAY_LIMIT = int(os.environ.get("LSF_ARRAY_LIMIT", "0"))
+# LSF's own cap on array size (MAX_JOB_ARRAY_SIZE); larger batches are split
+MAX_ARRAY_SIZE = int(os.environ.get("LSF_MAX_ARRAY_SIZE", "1000"))
+JOB_RE = re.compile(r"Job\s*<(?P<id>\d+)>", re.I)
+# LSF states that still hold (or will hold) a slot
+LSF_ACTIVE = frozenset({"PEND", "PROV", "WAIT", "RUN", "PSUSP", "USUSP", "SSUSP"})
+
+
+@dataclass
+class Task:
+    key: str       # SRR / sample – what status and logs are reported against
+    command: str   # bash body, run as `<shell> <command>` (bash -lc by default)
+    out: str       # per-task stdout/LSF report path (may contain %J)
+    err: str
+    name: str = ""  # job name for single/pack (default: key)
+
+
+@dataclass
+class Resources:
+    threads: int = 1
+    mem_mb: int = 0
+    walltime: str = ""                               # "H:MM"
+    select: str = ""                                 # -R string
+    extra: List[str] = field(default_factory=list)   # any other bsub flags
+    shell: List[str] = field(default_factory=lambda: ["bash", "-lc"])
+
+    def options(self) -> List[str]:
+        opts = ["-n", str(self.threads)]
+        if self.mem_mb:
+            opts += ["-M", str(self.mem_mb)]
+        if self.walltime:
+            opts += ["-W", self.walltime]
+        if self.select:
+            opts += ["-R", self.select]
+        return opts + list(self.extra)
+
+
+def _bsub(args: List[str], cwd: Path) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(["bsub", *args], cwd=str(cwd), capture_output=True, text=True)
+    except OSError as e:
+        return subprocess.CompletedProcess(["bsub"], 127, "", str(e))
+
+
+def submit_single(tasks: List[Task], res: Resources, cwd: Path) -> Dict[str, Optional[str]]:
+    ids: Dict[str, Optional[str]] = {}
+    for t in tasks:
+        cp = _bsub(["-J", t.name or t.key, "-oo", t.out, "-eo", t.err, *res.options(),
+                    *res.shell, t.command], cwd)
+        m = JOB_RE.search((cp.stdout or "") + (cp.stderr or ""))
+        ids[t.key] = m.group("id") if cp.returncode == 0 and m else None
+        if ids[t.key] is None:
+            print(f"    bsub failed for {t.key}: {(cp.stderr or cp.stdout).strip()}")
+    return ids
+
+
+def submit_pack(tasks: List[Task], res: Resources, cwd: Path,
+                logs_dir: Optional[Path] = None) -> Dict[str, Optional[str]]:
+    """One `bsub -pack` call; falls back to single submissions if pack is refused."""
+    logs_dir = logs_dir or cwd / "logs"
+    pack_dir = logs_dir / "arrays"
+    pack_dir.mkdir(parents=True, exist_ok=True)
+    pack = pack_dir / f"pack_{os.getpid()}_{int(time.time())}.txt"
+    lines = [shlex.join(["-J", t.name or t.key, "-oo", t.out, "-eo", t.err, *res.options(),
+                         *res.shell, t.command]) for t in tasks]
+    pack.write_text("\n".join(lines) + "\n")
+    cp = _bsub(["-pack", str(pack)], cwd)
+    found = JOB_RE.findall((cp.stdout or "") + (cp.stderr or ""))
+    if not found:
+        print(f"    bsub -pack refused ({(cp.stderr or cp.stdout).strip()[:200]}); submitting one by one")
+        return submit_single(tasks, res, cwd)
+    if len(found) != len(tasks):
+        # Output order is submission order, but failed lines leave gaps we cannot place
+        print(f"    bsub -pack: {len(found)}/{len(tasks)} submitted; job ids not mapped")
+        return {t.key: None for t in tasks}
+    return {t.key: jid for t, jid in zip(tasks, found)}
+
+
+RUNNER = """#!/bin/bash
+# Array runner: task $LSB_JOBINDEX of {index}
+IFS=$'\\t' read -r _ KEY OUT ERR CMD < <(awk -F'\\t' -v i="$LSB_JOBINDEX" '$1==i' {index})
+[[ -f "$CMD" ]] || {{ echo "no task $LSB_JOBINDEX in {index}" >&2; exit 2; }}
+# %J in a task log path becomes <jobid>_<index> so elements never share a file
+OUT=${{OUT//%J/${{LSB_JOBID}}_$LSB_JOBINDEX}}; ERR=${{ERR//%J/${{LSB_JOBID}}_$LSB_JOBINDEX}}
+mkdir -p "$(dirname "$OUT")" "$(dirname "$ERR")"
+# Per-task log names point at this element's LSF output (report included)
+ln -sfn {arrays}/{name}.${{LSB_JOBID}}_${{LSB_JOBINDEX}}.out "$OUT"
+ln -sfn {arrays}/{name}.${{LSB_JOBID}}_${{LSB_JOBINDEX}}.err "$ERR"
+exec {shell} "$(< "$CMD")"
+"""
+
+
+def _claim_stem(arrays: Path, base: str) -> str:
+    """First of <base>, <base>_1, … whose command directory this call creates.
+
+    Two batches with the same name in the same second (e.g. resource tiers
+    with equal threads) would otherwise overwrite each other's index file.
+    """
+    for n in itertools.count():
+        stem = base if n == 0 else f"{base}_{n}"
+        try:
+            (arrays / stem).mkdir()
+        except FileExistsError:
+            continue
+        return stem
+
+
+def submit_array(name: str, tasks: List[Task], res: Resources, cwd: Path,
+                 max_concurrent: int = LSF_ARRAY_LIMIT,
+                 logs_dir: Optional[Path] = None) -> Dict[str, Optional[str]]:
+    """Submit tasks as job array(s) of at most MAX_ARRAY_SIZE elements."""
+    logs_dir = (logs_dir or cwd / "logs").resolve()
+    arrays = logs_dir / "arrays"
+    arrays.mkdir(parents=True, exist_ok=True)
+    ids: Dict[str, Optional[str]] = {}
+    for part, start in enumerate(range(0, len(tasks), MAX_ARRAY_SIZE)):
+        chunk = tasks[start:start + MAX_ARRAY_SIZE]
+        base = f"{name}_{int(time.time())}_{os.getpid()}"
+        stem = _claim_stem(arrays, f"{base}_{part}" if len(tasks) > MAX_ARRAY_SIZE else base)
+        index = arrays / f"{stem}.tsv"
+        cmds = arrays / stem
+        rows = []
+        for i, t in enumerate(chunk, 1):
+            if any(c in s for s in (t.key, t.out, t.err) for c in "\t\n"):
+                raise ValueError(f"task {t.key!r}: tabs/newlines are not allowed in keys or log paths")
+            (cmds / f"{i}.sh").write_text(t.command)
+            rows.append("\t".join([str(i), t.key, t.out, t.err, str(cmds / f"{i}.sh")]))
+        index.write_text("\n".join(rows) + "\n")
+        runner = arrays / f"{stem}.sh"
+        runner.write_text(RUNNER.format(index=shlex.quote(str(index)), arrays=shlex.quote(str(arrays)),
+                                        name=stem, shell=" ".join(res.shell)))
+        runner.chmod(0o755)
+        spec = f"{stem}[1-{len(chunk)}]" + (f"%{max_concurrent}" if max_concurrent > 0 else "")
+        cp = _bsub(["-J", spec, "-oo", f"{arrays}/{stem}.%J_%I.out", "-eo", f"{arrays}/{stem}.%J_%I.err",
+                    *res.options(), str(runner)], cwd)
+        m = JOB_RE.search((cp.stdout or "") + (cp.stderr or ""))
+        if cp.returncode != 0 or not m:
+            print(f"    bsub array {stem} failed: {(cp.stderr or cp.stdout).strip()[:200]}")
+            ids.update({t.key: None for t in chunk})
+            continue
+        ids.update({t.key: f"{m.group('id')}[{i}]" for i, t in enumerate(chunk, 1)})
+    return ids
+
+
+def submit(tasks: List[Task], res: Resources, cwd: Path, name: str,
+           mode: str = LSF_SUBMIT_MODE, max_concurrent: int = LSF_ARRAY_LIMIT,
+           logs_dir: Optional[Path] = None) -> Dict[str, Optional[str]]:
+    """Submit a homogeneous batch; returns {task key: job id or None}."""
+    if not tasks:
+        return {}
+    if mode not in SUBMIT_MODES:
+        raise ValueError(f"Unknown LSF submit mode {mode!r}; expected one of {SUBMIT_MODES}")
+    if mode == "single" or len(tasks) == 1:
+        return submit_single(tasks, res, cwd)
+    if mode == "pack":
+        return submit_pack(tasks, res, cwd, logs_dir)
+    return submit_array(name, tasks, res, cwd, max_concurrent, logs_dir)
+
+
+ARRAY_NAME_RE = re.compile(r"^(?P<name>.+)\[(?P<index>\d+)\]$")
+
+
+def array_tasks(logs_dir: Path, job_name: str) -> Dict[str, str]:
+    """{array index: task key} for an array submitted under logs_dir (for status/logs)."""
+    index = logs_dir / "arrays" / f"{job_name}.tsv"
+    out: Dict[str, str] = {}
+    if index.exists():
+        for line in index.read_text().splitlines():
+            parts = line.split("\t")
+            if len(parts) >= 2:
+                out[parts[0]] = parts[1]
+    return out
+
+
+def job_states(job_ids: Iterable[str]) -> Optional[Dict[str, str]]:
+    """{job id as submit() returned it ("123" / "123[4]"): LSF stat}, one `bjobs -a` call.
+
+    Ids LSF no longer reports (finished and cleaned out of mbatchd) are simply
+    absent; None when bjobs itself failed, so callers can tell "gone" from "unknown".
+    """
+    bases = sorted({j.split("[", 1)[0] for j in job_ids if j})
+    if not bases:
+        return {}
+    try:
+        cp = subprocess.run(["bjobs", "-a", "-noheader", "-o", "jobid jobindex stat", *bases],
+                            capture_output=True, text=True)
+    except OSError:
+        return None  # no LSF client on this host
+    states: Dict[str, str] = {}
+    for line in (cp.stdout or "").splitlines():
+        parts = line.split()
+        if len(parts) < 3 or not parts[0].isdigit():
+            continue
+        states[f"{parts[0]}[{parts[1]}]" if parts[1] not in ("0", "-") else parts[0]] = parts[2]
+    if cp.returncode != 0 and not states and "not found" not in (cp.stderr or "") + (cp.stdout or ""):
+        return None
+    return states
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    bsub_args: List[str] = []
+    if "--" in argv:
+        i = argv.index("--")
+        argv, bsub_args = argv[:i], argv[i + 1:]
+    ap = argparse.ArgumentParser(description="Submit one LSF job array / pack for a sample list")
+    ap.add_argument("mode", choices=SUBMIT_MODES, nargs="?", default=LSF_SUBMIT_MODE)
+    ap.add_argument("--name", required=True, help="Array / batch name")
+    ap.add_argument("--list", required=True, help="Whitespace-separated task list (one task per line)")
+    ap.add_argument("--cmd", required=True, help="Command template; {0},{1},… are list columns")
+    ap.add_argument("--job-name", default="{0}", help="Per-task job name template (default {0})")
+    ap.add_argument("--out", default="logs/{0}.out", help="Per-task stdout template")
+    ap.add_argument("--err", default="logs/{0}.err", help="Per-task stderr template")
+    ap.add_argument("--max", type=int, default=LSF_ARRAY_LIMIT, help="Concurrent array elements (0 = no cap)")
+    ap.add_argument("--shell", default="bash -lc", help="How each command is run (default %(default)r)")
+    args = ap.parse_args(argv)
+
+    tasks: List[Task] = []
+    n_fields = 1 + max([int(x) for x in re.findall(r"\{(\d+)\}", args.cmd + args.job_name)] or [0])
+    for line in Path(args.list).read_text().splitlines():
+        if not line.strip():
+            continue
+        cols = line.split(None, n_fields - 1)  # like `read A B C`: last field keeps the rest
+        cols += [""] * (n_fields - len(cols))
+        tasks.append(Task(key=cols[0], command=args.cmd.format(*cols), out=args.out.format(*cols),
+                          err=args.err.format(*cols), name=args.job_name.format(*cols)))
+    res = Resources(threads=1, shell=shlex.split(args.shell))
+    # Raw bsub flags pass through untouched; -n given there overrides the default
+    res.extra = bsub_args
+    if "-n" in bsub_args:
+        res.threads = int(bsub_args[bsub_args.index("-n") + 1])
+        i = bsub_args.index("-n")
+        res.extra = bsub_args[:i] + bsub_args[i + 2:]
+    ids = submit(tasks, res, Path.cwd(), args.name, args.mode, args.max)
+    ok = sum(1 for v in ids.values() if v)
+    print(f"Submitted {ok}/{len(tasks)} tasks ({args.mode})")
+    sys.exit(0 if ok == len(tasks) else 1)
+
+
+if __name__ == "__main__":
+    main()
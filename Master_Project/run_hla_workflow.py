@@ -6,16 +6,31 @@ Runs the workflow described in HLA-scripts/README.md
 
 import os
 import sys
-import subprocess
 import glob
+import importlib.util
 import shutil
 from pathlib import Path
 
+from hla_genotypes import export_legacy, update as update_genotypes
+from hla_manifest import EMPTY_FASTQ_BYTES, HlaManifest, fragment_shell
+from lsf_submit import Resources, Task, job_states, submit as submit_tasks
+
 # Configuration
 POSEIDON_ROOT = "/data/salomonis-archive/FASTQs/NCI-R01/POSEIDON"
 HLA_SCRIPTS_DIR = f"{POSEIDON_ROOT}/HLA-scripts"
 TUMORS_DIR = f"{POSEIDON_ROOT}/Tumors"
 SCRIPTS_TO_COPY = ["get_hla_all.py", "hla.sh", "run_optiplex_code3.sh"]
+# chr6 extraction: "indexed" (hla_extract.py, many BAMs per job) or "hla.py" (AltAnalyze, one job per BAM);
+# "indexed" falls back to hla.py at submit time when pysam or a BAM index is missing
+HLA_EXTRACTOR = os.environ.get("HLA_EXTRACTOR", "indexed")
+HLA_EXTRACT_SCRIPT = f"{POSEIDON_ROOT}/Master_Project/hla_extract.py"
+HLA_BAMS_PER_JOB = int(os.environ.get("HLA_BAMS_PER_JOB", "24"))
+HLA_EXTRACT_THREADS = int(os.environ.get("HLA_EXTRACT_THREADS", "4"))
+HLA_GENOTYPES_SCRIPT = f"{POSEIDON_ROOT}/Master_Project/hla_genotypes.py"
+OPTITYPE_SIF = "/data/salomonis-archive/BAMs/NCI-R01/TCGA/TCGA-OV/optitype_container.sif"
+# Submitted samples are requeued once bjobs shows their job gone or ended without
+# reporting back; HLA_RESUBMIT=1 also requeues them when bjobs cannot be reached
+HLA_RESUBMIT = os.environ.get("HLA_RESUBMIT", "0") == "1"
 
 
 def find_bam_directories():
@@ -50,8 +65,107 @@ def count_bam_files(directory):
     return len(glob.glob(os.path.join(directory, "*.bam")))
 
 
-def submit_chr6_extraction(directory):
-    """Submit jobs to extract chromosome 6 reads from BAM files."""
+def _batch_name(directory):
+    """<Tumor>_<bams dir> - array names stay unique across cohorts."""
+    return f"{os.path.basename(os.path.dirname(directory))}_{os.path.basename(directory)}"
+
+
+def _sample_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _load_manifest(directory):
+    """hla_manifest.tsv with job fragments folded in, reconciled with the directory and LSF."""
+    manifest = HlaManifest.load(Path(directory))
+    manifest.refresh()
+    states = job_states(manifest.job_ids())
+    lost = manifest.reconcile(states, force=HLA_RESUBMIT)
+    if states is None:
+        print("    WARNING: bjobs unavailable; submitted samples "
+              + ("requeued (HLA_RESUBMIT=1)" if HLA_RESUBMIT else "kept as in flight"))
+    elif lost:
+        print(f"    Requeued {len(lost)} samples whose LSF job ended without reporting back")
+    counts = manifest.counts()
+    print("    Manifest: " + ", ".join(f"{v} {k}" for k, v in counts.items() if v))
+    return manifest
+
+
+def _has_index(bam):
+    """samtools/picard index names: x.bam.bai, x.bai or x.bam.csi."""
+    return any(os.path.exists(p) for p in (bam + ".bai", os.path.splitext(bam)[0] + ".bai", bam + ".csi"))
+
+
+def _extractor(bam_files):
+    """HLA_EXTRACTOR, or "hla.py" when the indexed extractor could only fail inside the job."""
+    if HLA_EXTRACTOR != "indexed":
+        return HLA_EXTRACTOR
+    if importlib.util.find_spec("pysam") is None:
+        print("    WARNING: pysam not importable; extracting with hla.py instead")
+        return "hla.py"
+    unindexed = [b for b in bam_files if not _has_index(b)]
+    if unindexed:
+        print(f"    WARNING: {len(unindexed)} BAMs have no .bai/.csi index (e.g. "
+              f"{os.path.basename(unindexed[0])}); extracting with hla.py instead")
+        return "hla.py"
+    return "indexed"
+
+
+def _extraction_batch(directory, bam_files):
+    """(tasks, resources, {task key: sample names}) extracting these BAMs into fastqs/."""
+    logs_dir = os.path.join(directory, "logs")
+    fastqs_dir = os.path.join(directory, "fastqs")
+    tasks, groups = [], {}
+
+    if _extractor(bam_files) == "hla.py":
+        # One AltAnalyze hla.py job per BAM
+        for bam in bam_files:
+            sample_name = _sample_name(bam)
+            cmd = f"conda activate bio-cli && python3 /data/salomonis2/software/AltAnalyze/import_scripts/hla.py --i {bam} --o {fastqs_dir} && fd --exact-depth 1 --size -50b '{sample_name}_2.fastq.gz' {fastqs_dir} -x rm"
+            tasks.append(Task(key=sample_name, command=cmd, out=f"{logs_dir}/%J.out",
+                              err=f"{logs_dir}/%J.err", name=sample_name))
+            groups[sample_name] = [sample_name]
+        res = Resources(threads=1, mem_mb=16000, walltime="1:00", select="span[ptile=4]",
+                        extra=["-L", "/bin/bash"])
+        return tasks, res, groups
+
+    # A few dense jobs: HLA_BAMS_PER_JOB BAMs each, HLA_EXTRACT_THREADS at a time
+    for i in range(0, len(bam_files), HLA_BAMS_PER_JOB):
+        chunk = bam_files[i:i + HLA_BAMS_PER_JOB]
+        bams = " ".join(f"'{b}'" for b in chunk)
+        cmd = (f"conda activate bio-cli && python3 {HLA_EXTRACT_SCRIPT} --out '{fastqs_dir}' "
+               f"--jobs {HLA_EXTRACT_THREADS} {bams}")
+        key = f"hla{i // HLA_BAMS_PER_JOB + 1:03d}"
+        tasks.append(Task(key=key, command=cmd, out=f"{logs_dir}/%J.out",
+                          err=f"{logs_dir}/%J.err", name=key))
+        groups[key] = [_sample_name(b) for b in chunk]
+    res = Resources(threads=HLA_EXTRACT_THREADS, mem_mb=4000 * HLA_EXTRACT_THREADS, walltime="4:00",
+                    select="span[hosts=1]", extra=["-L", "/bin/bash"])
+    return tasks, res, groups
+
+
+def _submit_extraction(directory, manifest, samples, batch):
+    """Submit extraction for these samples and record the job ids; returns {task key: (id, samples)}."""
+    bam_files = [os.path.join(directory, f"{s}.bam") for s in samples]
+    tasks, res, groups = _extraction_batch(directory, bam_files)
+    ids = submit_tasks(tasks, res, Path(directory), name=f"chr6_{batch}")
+    for key, jid in ids.items():
+        if jid:
+            manifest.mark(groups[key], "extract_submitted", extract_job=jid, optitype_job="")
+    manifest.save()
+    return {key: (jid, groups[key]) for key, jid in ids.items()}
+
+
+def _requested(manifest, samples, force):
+    """Explicitly requested samples the manifest knows; in-flight ones are left out unless force."""
+    todo = set(samples) & set(manifest.entries)
+    busy = set() if force else todo & set(manifest.in_flight())
+    if busy:
+        print(f"    Skipped {len(busy)} samples with a job still queued or running (--force resubmits)")
+    return todo - busy
+
+
+def submit_chr6_extraction(directory, samples=None, force=False):
+    """Submit jobs to extract HLA-region reads from BAM files (only `samples` if given)."""
     print(f"  Submitting chromosome 6 extraction jobs...")
 
     # Create logs and fastqs directories if they don't exist
@@ -61,51 +175,87 @@ def submit_chr6_extraction(directory):
     os.makedirs(fastqs_dir, exist_ok=True)
     print(f"    Created logs and fastqs directories")
 
-    bam_files = glob.glob(os.path.join(directory, "*.bam"))
-    if not bam_files:
+    if not glob.glob(os.path.join(directory, "*.bam")):
         print(f"    No BAM files found!")
         return False
 
-    submitted = 0
-    for bam in bam_files:
-        bam_name = os.path.basename(bam)
-        sample_name = os.path.splitext(bam_name)[0]
+    # Only BAMs the manifest has no extraction (or a failed one) for; an explicit
+    # sample list (e.g. verify_hla_counts.py --audit --resubmit gaps) is taken as-is,
+    # minus samples whose job is still in LSF (all of them with force=True)
+    manifest = _load_manifest(directory)
+    if samples is not None:
+        todo = sorted(_requested(manifest, samples, force))
+    else:
+        todo = manifest.needs_extract()
+    if not todo:
+        print(f"    Nothing to extract")
+        return True
 
-        # Build the actual command to run
-        cmd = f"conda activate bio-cli && python3 /data/salomonis2/software/AltAnalyze/import_scripts/hla.py --i {bam} --o {fastqs_dir} && fd --exact-depth 1 --size -50b '{sample_name}_2.fastq.gz' {fastqs_dir} -x rm"
+    # One job array for the whole directory (LSF_SUBMIT_MODE=single: one bsub per job)
+    jobs = _submit_extraction(directory, manifest, todo, _batch_name(directory))
+    submitted = sum(1 for jid, _ in jobs.values() if jid)
 
-        # Submit directly to bsub with proper arguments
-        try:
-            result = subprocess.run(
-                [
-                    "bsub",
-                    "-L", "/bin/bash",
-                    "-W", "1:00",
-                    "-n", "1",
-                    "-R", "span[ptile=4]",
-                    "-M", "16000",
-                    "-o", f"{logs_dir}/%J.out",
-                    "-e", f"{logs_dir}/%J.err",
-                    "-J", sample_name,
-                    "bash", "-lc", cmd
-                ],
-                cwd=directory,
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0 and "is submitted" in result.stdout:
-                submitted += 1
-            elif result.returncode != 0:
-                print(f"    Failed {bam_name}: {result.stderr}")
-        except Exception as e:
-            print(f"    Error submitting {bam_name}: {e}")
-
-    print(f"    Submitted {submitted}/{len(bam_files)} jobs")
+    print(f"    Submitted {submitted}/{len(jobs)} jobs for {len(todo)} BAMs")
     return submitted > 0
 
 
-def submit_optitype_jobs(directory):
-    """Submit OptiType jobs for fastq files."""
+def _optitype_task(directory, sample_name):
+    """Wrapper script + Task for one sample; paired/single-end is decided when the job runs."""
+    logs_dir = os.path.join(directory, "logs")
+    os.makedirs(os.path.join(directory, "processed", sample_name), exist_ok=True)
+
+    # _2 only counts if it has meaningful content (> 50 bytes; legacy hla.py leaves empty ones).
+    # No usable _1 (its BAM failed in a DAG extraction job): exit without a fragment, the
+    # extraction fragment already says why
+    file1 = f"fastqs/{sample_name}_1.fastq.gz"
+    file2 = f"fastqs/{sample_name}_2.fastq.gz"
+    record = fragment_shell("optitype", sample_name, state="$STATE", result="$RESULT")
+    wrapper_script = os.path.join(logs_dir, f"optitype_{sample_name}.sh")
+    with open(wrapper_script, 'w') as f:
+        f.write(f"""#!/bin/bash
+module load singularity/3.7.0
+cd {directory}
+if [ "$(stat -c %s {file1} 2>/dev/null || echo 0)" -le {EMPTY_FASTQ_BYTES} ]; then
+    echo "No usable {file1}; OptiType skipped"
+    exit 0
+fi
+if [ "$(stat -c %s {file2} 2>/dev/null || echo 0)" -gt {EMPTY_FASTQ_BYTES} ]; then
+    INPUT="{file1} {file2}"
+else
+    INPUT="{file1}"
+fi
+singularity exec -W /mnt -B {directory}:/mnt {OPTITYPE_SIF} /bin/bash -c "cd /mnt && /usr/local/bin/OptiType/OptiTypePipeline.py -i $INPUT --rna -v -o processed/{sample_name}"
+rc=$?
+# Outcome into the HLA manifest (folded in by the next workflow step)
+RESULT=$(ls -t processed/{sample_name}/*_result.tsv processed/{sample_name}/*/*_result.tsv 2>/dev/null | head -1)
+if [ $rc -eq 0 ] && [ -n "$RESULT" ]; then STATE=typed; else STATE=optitype_failed; fi
+{record}
+exit $rc
+""")
+    os.chmod(wrapper_script, 0o755)
+    return Task(key=sample_name, command=wrapper_script,
+                out=f"{logs_dir}/OptiType_{sample_name}_%J.out",
+                err=f"{logs_dir}/OptiType_{sample_name}_%J.err",
+                name=f"OptiType_{sample_name}")
+
+
+def _submit_optitype(directory, sample_names, name, depend=None):
+    """One OptiType array for these samples, optionally held by an LSF -w expression.
+
+    Array elements are named after the array, not OptiType_<sample>; the logs
+    keep the per-sample names and logs/arrays/<array>.tsv maps index -> sample.
+    LSF_SUBMIT_MODE=pack submits one OptiType_<sample> job per sample instead.
+    """
+    tasks = [_optitype_task(directory, s) for s in sample_names]
+    # Wrapper scripts run as-is (no login shell); -ti kills jobs whose dependency can never be met
+    extra = ["-L", "/bin/bash"] + (["-w", depend, "-ti"] if depend else [])
+    res = Resources(threads=4, mem_mb=32000, walltime="8:00", select="span[hosts=1]",
+                    extra=extra, shell=["bash"])
+    return submit_tasks(tasks, res, Path(directory), name=name)
+
+
+def submit_optitype_jobs(directory, samples=None, force=False):
+    """Submit OptiType jobs for fastq files (only `samples` if given)."""
     print(f"  Submitting OptiType jobs...")
 
     fastq_dir = os.path.join(directory, "fastqs")
@@ -113,108 +263,118 @@ def submit_optitype_jobs(directory):
         print(f"    fastqs directory not found!")
         return False
 
-    fastq_files = glob.glob(os.path.join(fastq_dir, "*_1.fastq.gz"))
-    if not fastq_files:
-        print(f"    No *_1.fastq.gz files found in fastqs/")
+    os.makedirs(os.path.join(directory, "logs"), exist_ok=True)
+
+    # Extracted samples without a result or a queued OptiType job
+    manifest = _load_manifest(directory)
+    if samples is not None:
+        todo = sorted(s for s in _requested(manifest, samples, force)
+                      if os.path.exists(os.path.join(fastq_dir, f"{s}_1.fastq.gz")))
+    else:
+        todo = manifest.needs_optitype()
+    if not todo:
+        print(f"    No extracted samples waiting for OptiType")
         return False
 
-    # Create processed directory
-    processed_dir = os.path.join(directory, "processed")
-    os.makedirs(processed_dir, exist_ok=True)
+    ids = _submit_optitype(directory, todo, name=f"OptiType_{_batch_name(directory)}")
+    for sample, jid in ids.items():
+        if jid:
+            manifest.mark([sample], "optitype_submitted", optitype_job=jid)
+    manifest.save()
+    submitted = sum(1 for jid in ids.values() if jid)
+
+    typed = len(manifest.in_state("typed"))
+    if typed > 0:
+        print(f"    Skipped {typed} samples (results already exist)")
+    print(f"    Submitted {submitted}/{len(todo)} jobs")
+    return submitted > 0
+
+
+def _base_job_id(job_id):
+    """'123[4]' -> '123': a dependency on the base id covers the whole array."""
+    return job_id.split("[", 1)[0]
 
+
+def submit_hla_dag(directory):
+    """
+    Submit extract -> OptiType -> aggregate for one bams dir, chained with LSF -w.
+
+    Samples that already have FASTQs go straight to OptiType; the others get an
+    OptiType array per extraction job, released with ended(<job>) as soon as that
+    job finishes. hla_extract.py exits 1 when any of its BAMs fails, so done()
+    would orphan-kill OptiType for the BAMs that did extract; with ended() those
+    run and the failed ones find no FASTQ and exit. One aggregate job updates
+    the project genotype table (hla_genotypes.py) and this directory's
+    aggregated_hla_genotypes.txt once every OptiType job has ended (failures
+    included, so partial cohorts still aggregate).
+    """
+    print(f"  Submitting HLA DAG (extract -> OptiType -> aggregate)...")
+    batch = _batch_name(directory)
     logs_dir = os.path.join(directory, "logs")
     os.makedirs(logs_dir, exist_ok=True)
-
-    sif_path = "/data/salomonis-archive/BAMs/NCI-R01/TCGA/TCGA-OV/optitype_container.sif"
-
-    submitted = 0
-    skipped = 0
-    for file1 in fastq_files:
-        file1_base = os.path.basename(file1)
-        sample_name = file1_base.replace("_1.fastq.gz", "")
-        file2 = file1.replace("_1.fastq.gz", "_2.fastq.gz")
-
-        # Check if results already exist
-        sample_processed_dir = os.path.join(processed_dir, sample_name)
-        if os.path.exists(sample_processed_dir):
-            result_files = glob.glob(os.path.join(sample_processed_dir, "*_result.tsv"))
-            if result_files:
-                skipped += 1
-                continue
-
-        # Create sample processed directory
-        os.makedirs(sample_processed_dir, exist_ok=True)
-
-        # Detect if this is paired-end or single-end
-        # Check if _2.fastq.gz exists AND has meaningful content (> 50 bytes)
-        is_paired_end = os.path.exists(file2) and os.path.getsize(file2) > 50
-
-        # Create temporary wrapper script for this job
-        wrapper_script = os.path.join(logs_dir, f"optitype_{sample_name}.sh")
-        with open(wrapper_script, 'w') as f:
-            if is_paired_end:
-                file2_base = os.path.basename(file2)
-                optitype_cmd = f"/usr/local/bin/OptiType/OptiTypePipeline.py -i fastqs/{file1_base} fastqs/{file2_base} --rna -v -o processed/{sample_name}"
-            else:
-                # Single-end mode - only pass _1.fastq.gz
-                optitype_cmd = f"/usr/local/bin/OptiType/OptiTypePipeline.py -i fastqs/{file1_base} --rna -v -o processed/{sample_name}"
-
-            f.write(f"""#!/bin/bash
-                    module load singularity/3.7.0
-                    cd {directory}
-                    singularity exec -W /mnt -B {directory}:/mnt {sif_path} /bin/bash -c "cd /mnt && {optitype_cmd}"
-                    """)
-        os.chmod(wrapper_script, 0o755)
-
-        # Submit the wrapper script to bsub
-        try:
-            result = subprocess.run(
-                [
-                    "bsub",
-                    "-L", "/bin/bash",
-                    "-W", "8:00",
-                    "-M", "32000",
-                    "-n", "4",
-                    "-R", "span[hosts=1]",
-                    "-o", f"{logs_dir}/OptiType_{sample_name}_%J.out",
-                    "-e", f"{logs_dir}/OptiType_{sample_name}_%J.err",
-                    "-J", f"OptiType_{sample_name}",
-                    wrapper_script
-                ],
-                cwd=directory,
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                submitted += 1
-        except Exception as e:
-            print(f"    Error submitting {sample_name}: {e}")
-
-    if skipped > 0:
-        print(f"    Skipped {skipped} samples (results already exist)")
-    print(f"    Submitted {submitted}/{len(fastq_files)} jobs")
-    return submitted > 0
+    os.makedirs(os.path.join(directory, "fastqs"), exist_ok=True)
+
+    manifest = _load_manifest(directory)
+    ready = manifest.needs_optitype()
+    to_extract = manifest.needs_extract()
+    print(f"    {len(manifest.in_state('typed'))} done, {len(ready)} ready for OptiType, "
+          f"{len(to_extract)} to extract")
+
+    ids = _submit_optitype(directory, ready, name=f"OptiType_{batch}")
+    for sample, jid in ids.items():
+        if jid:
+            manifest.mark([sample], "optitype_submitted", optitype_job=jid)
+    optitype_ids = list(ids.values())
+
+    extract_jobs = _submit_extraction(directory, manifest, to_extract, batch)
+    for key, (jid, samples) in extract_jobs.items():
+        if not jid:
+            print(f"    WARNING: extraction job {key} not submitted ({len(samples)} samples)")
+            continue
+        ids = _submit_optitype(directory, samples, name=f"OptiType_{batch}_{key}",
+                               depend=f"ended({jid})")
+        for sample, ojid in ids.items():
+            if ojid:
+                manifest.entry(sample).optitype_job = ojid  # still extract_submitted
+        optitype_ids += ids.values()
+    manifest.save()
+
+    submitted = [j for j in optitype_ids if j]
+    if not submitted and os.path.exists(os.path.join(directory, "aggregated_hla_genotypes.txt")):
+        print(f"    Nothing new to genotype; aggregated_hla_genotypes.txt kept")
+        return True
+    depend = " && ".join(f"ended({j})" for j in sorted(set(_base_job_id(j) for j in submitted)))
+    cmd = (f"conda activate bio-cli && python3 {HLA_GENOTYPES_SCRIPT} update "
+           f"--root '{_project_root(directory)}' --bam-dir '{directory}' --export")
+    aggregate = Task(key="aggregate", command=cmd,
+                     out=f"{logs_dir}/aggregate_%J.out", err=f"{logs_dir}/aggregate_%J.err",
+                     name=f"aggregate_{batch}")
+    res = Resources(threads=1, mem_mb=4000, walltime="0:30",
+                    extra=["-L", "/bin/bash"] + (["-w", depend] if depend else []))
+    agg_id = submit_tasks([aggregate], res, Path(directory), name=f"aggregate_{batch}")["aggregate"]
+
+    print(f"    Submitted {sum(1 for jid, _ in extract_jobs.values() if jid)} extraction, "
+          f"{len(submitted)} OptiType and {'1' if agg_id else 'no'} aggregate jobs")
+    return agg_id is not None
+
+
+def _project_root(directory):
+    """POSEIDON root of a <root>/Tumors/<cancer>/bams* directory."""
+    return Path(directory).resolve().parents[2]
 
 
 def aggregate_results(directory):
-    """Run get_hla_all.py to aggregate OptiType results."""
+    """Ingest new OptiType results into hla_genotypes.sqlite and rewrite aggregated_hla_genotypes.txt."""
     print(f"  Aggregating HLA results...")
     try:
-        result = subprocess.run(
-            ["bash", "-lc", "conda activate bio-cli && python3 get_hla_all.py"],
-            cwd=directory,
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minutes for large cohorts
-        )
-        if result.returncode == 0:
-            print(f"    Successfully aggregated results")
-            return True
-        else:
-            print(f"    Error: {result.stderr}")
-            return False
+        root = _project_root(directory)
+        stats = update_genotypes(root, [Path(directory)])
+        count = export_legacy(root, Path(directory))
+        print(f"    Ingested {stats['parsed']} new results ({stats['removed']} removed); "
+              f"{count} samples in aggregated_hla_genotypes.txt")
+        return True
     except Exception as e:
-        print(f"    Error running get_hla_all.py: {e}")
+        print(f"    Error aggregating results: {e}")
         return False
 
 
@@ -249,13 +409,16 @@ def process_directory(bam_dir, step="all"):
         print(f"  Skipping (no BAM files)")
         return
 
-    if step in ["all", "copy"]:
+    if step in ["all", "copy", "dag"]:
         copy_scripts(bam_dir)
 
-    if step in ["all", "extract"]:
+    if step in ["all", "dag"]:
+        submit_hla_dag(bam_dir)
+
+    if step == "extract":
         submit_chr6_extraction(bam_dir)
 
-    if step in ["all", "optitype"]:
+    if step == "optitype":
         submit_optitype_jobs(bam_dir)
 
     if step == "aggregate":
@@ -267,13 +430,14 @@ def main():
     """Main workflow."""
     if len(sys.argv) > 1:
         step = sys.argv[1]
-        if step not in ["copy", "extract", "optitype", "aggregate", "all"]:
-            print("Usage: run_hla_workflow.py [copy|extract|optitype|aggregate|all]")
+        if step not in ["copy", "extract", "optitype", "aggregate", "dag", "all"]:
+            print("Usage: run_hla_workflow.py [copy|extract|optitype|aggregate|dag|all]")
             print("\n  copy      - Copy scripts only (Step 1)")
             print("  extract   - Extract chromosome 6 reads (step 2)")
             print("  optitype  - Run OptiType (step 3)")
             print("  aggregate - Aggregate results (step 5-6)")
-            print("  all       - Run all steps (default)")
+            print("  dag       - Submit extract -> OptiType -> aggregate chained with LSF dependencies")
+            print("  all       - Copy scripts, then submit the dag (default)")
             sys.exit(1)
     else:
         step = "all"
@@ -0,0 +1,317 @@
+"""plan/apply end to end against a synthetic cohort, with stub prefetch / fasterq-dump."""
+import gzip
+import os
+import stat
+import time
+from pathlib import Path
+
+import pytest
+
+import core_fastq_workflow as core
+
+RECORD = "@{srr}.{m}.{i}\nACGTACGTACGTACGT\n+\nIIIIIIIIIIIIIIII\n"
+
+# prefetch <SRR> -X <max>: writes <SRR>/<SRR>.sra like the real tool
+PREFETCH = """#!/bin/sh
+mkdir -p "$1" && printf 'SRA stub' > "$1/$1.sra"
+"""
+
+# fasterq-dump --split-files ... -O <dir> <SRR>   (tmpdir engine)
+# fastq-dump --split-files -O <dir> <SRR>         (pipe engine: <dir>/<SRR>_m.fastq are FIFOs)
+DUMP = """#!/bin/sh
+out=.; for a in "$@"; do [ "$prev" = "-O" ] && out=$a; prev=$a; srr=$a; done
+for m in 1 2; do
+  for i in 1 2 3; do printf '@%s.%s.%s\\nACGTACGTACGTACGT\\n+\\nIIIIIIIIIIIIIIII\\n' "$srr" $m $i; done > "$out/${srr}_$m.fastq"
+done
+"""
+
+
+def _tool(bin_dir: Path, name: str, text: str) -> Path:
+    p = bin_dir / name
+    p.write_text(text)
+    p.chmod(p.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return p
+
+
+def _fastq(path: Path, srr: str, m: int) -> None:
+    path.write_bytes(gzip.compress("".join(RECORD.format(srr=srr, m=m, i=i) for i in range(3)).encode()))
+
+
+@pytest.fixture
+def cohort(tmp_path, monkeypatch):
+    """S1: converted; S2: .sra waiting for conversion; S3: nothing downloaded yet."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setattr(core, "PREFETCH_BIN", str(_tool(bin_dir, "prefetch", PREFETCH)))
+    _tool(bin_dir, "fasterq-dump", DUMP)
+    _tool(bin_dir, "fastq-dump", DUMP)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("POSEIDON_STATUS_DB", "off")
+    monkeypatch.setenv("LS_TMPDIR", str(tmp_path / "scratch"))
+    (tmp_path / "scratch").mkdir()
+
+    cancer_dir = tmp_path / "TCGA-XX"
+    cancer_dir.mkdir()
+    _fastq(cancer_dir / "SRR100_1.fastq.gz", "SRR100", 1)
+    _fastq(cancer_dir / "SRR100_2.fastq.gz", "SRR100", 2)
+    (cancer_dir / "SRR200.sra").write_bytes(b"SRA stub")
+    (cancer_dir / "sample_list.txt").write_text(
+        "".join(f"S{i}\tSRR{i}00_1.fastq.gz\tSRR{i}00_2.fastq.gz\n" for i in (1, 2, 3)))
+    monkeypatch.chdir(tmp_path)
+    yield cancer_dir
+    core.set_executor(core.LSFExecutor())
+
+
+def _samples(cancer_dir: Path):
+    return core.parse_sample_list(cancer_dir / "sample_list.txt")
+
+
+def test_plan_is_minimal(cohort):
+    core.set_executor(core.DryRunExecutor())
+    actions = core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    assert sorted((a.kind, a.srr) for a in actions) == [("convert", "SRR200"), ("download", "SRR300")]
+
+
+def test_dry_run_apply_records_commands_and_leaves_cohort_alone(cohort):
+    before = sorted(p.name for p in cohort.iterdir())
+    ex = core.set_executor(core.DryRunExecutor())
+    core.do_apply(cohort, _samples(cohort), use_cache=False, reserve_gb=None)
+    assert [c for c in ex.commands if c[0] == core.PREFETCH_BIN] == \
+        [[core.PREFETCH_BIN, "SRR300", "-X", "35000000"]]
+    # SRR300 is only "downloaded" in dry-run, so SRR200 is the one conversion
+    assert [c[2] for c in ex.commands if c[0] == "bsub"] == ["fastq_SRR200"]
+    assert sorted(p.name for p in cohort.iterdir() if p.name != "logs") == \
+        [n for n in before if n != "logs"]
+    assert not (cohort / "logs" / core.JOURNAL_NAME).exists()
+
+
+@pytest.mark.parametrize("engine", core.FQD_ENGINES)
+def test_local_apply_converts_everything(cohort, monkeypatch, engine):
+    monkeypatch.setenv("FQD_ENGINE", engine)
+    samples = _samples(cohort)
+    # first apply converts SRR200 and downloads SRR300, the second converts SRR300
+    for _ in range(2):
+        core.set_executor(core.LocalExecutor(2))
+        core.do_apply(cohort, samples, use_cache=False, reserve_gb=None)
+
+    manifest = (cohort / core.MANIFEST_NAME).read_text()
+    for srr in ("SRR200", "SRR300"):
+        for m in (1, 2):
+            with gzip.open(cohort / f"{srr}_{m}.fastq.gz", "rt") as f:
+                assert f.readline() == f"@{srr}.{m}.1\n"
+            assert f"{srr}_{m}.fastq.gz\t" in manifest
+        assert not (cohort / f"{srr}.sra").exists()  # cleaned up after a good conversion
+    assert not (cohort / "SRR300").exists()  # prefetch subdir normalised away
+    snapshot = (cohort / "sample_list.with_status.txt").read_text().splitlines()
+    assert len(snapshot) == 3
+
+    core.set_executor(core.DryRunExecutor())
+    assert core.do_plan(cohort, samples, reserve_gb=None) == []
+
+
+def test_local_executor_keeps_lsf_journal_entries(cohort):
+    journal = core.SubmitJournal(cohort)
+    journal.record("SRR200", "4242[3]")
+    journal.save()
+    core.set_executor(core.LocalExecutor(1))
+
+    actions = core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    assert ("running", "SRR200") in [(a.kind, a.srr) for a in actions]
+    assert core.SubmitJournal(cohort).entries["SRR200"].job_id == "4242[3]"
+
+
+def test_local_executor_drops_its_own_stale_entries(cohort):
+    journal = core.SubmitJournal(cohort)
+    journal.record("SRR200", "local-1-1")
+    journal.save()
+    core.set_executor(core.LocalExecutor(1))
+    actions = core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    assert ("convert", "SRR200") in [(a.kind, a.srr) for a in actions]
+    # plan is read-only: the journal is settled by apply, which resubmits SRR200
+    assert core.SubmitJournal(cohort).entries["SRR200"].job_id == "local-1-1"
+    core.do_apply(cohort, _samples(cohort), reserve_gb=None, downloads=1)
+    assert core.SubmitJournal(cohort).entries["SRR200"].job_id != "local-1-1"
+
+
+def test_old_lsf_entries_stop_blocking(cohort):
+    journal = core.SubmitJournal(cohort)
+    journal.record("SRR200", "4242")
+    journal.entries["SRR200"].submitted_at = time.time() - core.JOURNAL_MAX_AGE - 60
+    journal.save()
+    core.set_executor(core.DryRunExecutor())
+    actions = core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    assert ("convert", "SRR200") in [(a.kind, a.srr) for a in actions]
+
+
+# bjobs -a -noheader -o "jobid job_name stat exit_code" -J "fastq_*"
+BJOBS = """#!/bin/sh
+cat <<'OUT'
+201 fastq_SRR200 PEND -
+301 fastq_SRR300 EXIT 137
+401 fastq_SRR400 RUN -
+OUT
+"""
+
+
+def test_reconcile_against_bjobs(cohort):
+    _tool(Path(os.environ["PATH"].split(os.pathsep)[0]), "bjobs", BJOBS)
+    (cohort / "SRR300.sra").write_bytes(b"SRA stub")
+    journal = core.SubmitJournal(cohort)
+    journal.record("SRR100", "101")  # finished and aged out of bjobs; its FASTQs are on disk
+    journal.record("SRR200", "201")
+    journal.record("SRR300", "301")
+    journal.save()
+
+    journal = core.SubmitJournal(cohort)
+    inv = core._inventory_samples(cohort, _samples(cohort))
+    running = journal.reconcile(core.bjobs_bulk(), set(inv))
+    assert running == {"SRR200": "201 PEND"}  # SRR400 belongs to another cohort
+    assert [e.srr for e in journal.finished] == ["SRR300"]
+    assert sorted((a.kind, a.srr) for a in core.plan_actions(inv, running)) == [
+        ("convert", "SRR300"), ("running", "SRR200")]
+    journal.save()
+    assert list(core.SubmitJournal(cohort).entries) == ["SRR200"]
+
+
+def test_plan_writes_no_journal_or_resource_history(cohort):
+    _tool(Path(os.environ["PATH"].split(os.pathsep)[0]), "bjobs",
+          "#!/bin/sh\necho '4242 fastq_SRR200 DONE -'\n")
+    (cohort / "logs").mkdir(exist_ok=True)
+    (cohort / "logs" / "fastq_SRR200.out.txt").write_text(
+        "Sender: LSF System <lsfadmin@node1>\nSubject: Job 4242: <fastq_SRR200> in cluster <c> Done\n\n"
+        "Successfully completed.\n\nResource usage summary:\n\n"
+        "    Max Memory :                                 900 MB\n"
+        "    Run time :                                   60 sec.\n")
+    journal = core.SubmitJournal(cohort)
+    journal.record("SRR200", "4242", core.JobResources(threads=2, mem_mb=4000, walltime_min=120,
+                                                       sra_bytes=8))
+    journal.save()
+    before = journal.path.read_text()
+
+    core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    assert journal.path.read_text() == before
+    assert not core.ResourceHistory.path(cohort).exists()
+
+    journal, _running = core._running_conversions(cohort, {"SRR200"})
+    journal.save()  # what apply does with the reconciled journal
+    assert "SRR200" not in core.SubmitJournal(cohort).entries
+    assert [o.outcome for o in core.ResourceHistory.load([cohort]).observations] == ["ok"]
+
+
+def test_budget_uses_the_inventory_sra_size(cohort, monkeypatch):
+    samples = _samples(cohort)
+    inv = core._inventory_samples(cohort, samples)
+    actions = core.plan_actions(inv)
+    (cohort / "SRR200.sra").unlink()  # a stat now would say 0 bytes
+    sized = []
+    estimate = core.estimate_footprint
+
+    def spy(srr, sra_bytes, runinfo):
+        sized.append((srr, sra_bytes))
+        return estimate(srr, sra_bytes, runinfo)
+
+    monkeypatch.setattr(core, "estimate_footprint", spy)
+    core.budget_conversions(cohort, inv, actions, {}, core.DiskBudget(cohort, 0))
+    assert sized == [("SRR200", len(b"SRA stub"))]
+
+
+def test_executor_is_abstract():
+    with pytest.raises(TypeError):
+        core.Executor()
+
+    class Half(core.Executor):
+        pass
+
+    with pytest.raises(TypeError):
+        Half()
+
+
+def _vouch(cancer_dir: Path, name: str) -> None:
+    """Manifest fragment for a file, as a conversion job would write it."""
+    st = (cancer_dir / name).stat()
+    core.Manifest.write_fragment(cancer_dir, core.ManifestEntry(name, st.st_size, int(st.st_mtime),
+                                                                md5="0" * 32, records=3))
+
+
+def test_plan_reads_manifest_fragments_without_merging(cohort):
+    _vouch(cohort, "SRR100_1.fastq.gz")
+    core.set_executor(core.LocalExecutor(1))
+    core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    core.do_status(cohort, _samples(cohort))
+    assert (cohort / "logs" / "manifest" / "SRR100_1.fastq.gz.tsv").exists()
+    assert not (cohort / core.MANIFEST_NAME).exists()
+
+    core.Manifest.load(cohort)  # apply/watch/manifest fold them in
+    assert not (cohort / "logs" / "manifest" / "SRR100_1.fastq.gz.tsv").exists()
+    assert "SRR100_1.fastq.gz\t" in (cohort / core.MANIFEST_NAME).read_text()
+
+
+def test_no_cache_resniffs_manifest_entries(cohort):
+    bad = cohort / "SRR100_1.fastq.gz"
+    bad.write_bytes(gzip.compress(b"not a fastq\n" * 8))
+    _vouch(cohort, bad.name)
+    core.set_executor(core.DryRunExecutor())
+    trusted = core.do_plan(cohort, _samples(cohort), reserve_gb=None)
+    assert "SRR100" not in [a.srr for a in trusted]
+    resniffed = core.do_plan(cohort, _samples(cohort), use_cache=False, reserve_gb=None)
+    assert ("download", "SRR100") in [(a.kind, a.srr) for a in resniffed]
+
+
+def test_project_apply_budgets_from_the_plan_inventory(cohort, monkeypatch, capsys):
+    root = cohort.parent
+    (root / "Tumors").mkdir()
+    cohort.rename(root / "Tumors" / "X")
+    (root / "Tumors" / "X" / "SRR100.sra").write_bytes(b"converted already")
+
+    def rescan(*args, **kwargs):
+        raise AssertionError("cohort inventoried twice")
+
+    monkeypatch.setattr(core, "inventory", rescan)
+    ex = core.set_executor(core.DryRunExecutor())
+    core.do_project(root, apply=True, priorities={}, reserve_gb=0.0)
+    assert [c[2] for c in ex.commands if c[0] == "bsub"] == ["fastq_SRR200"]
+    assert [core.PREFETCH_BIN, "SRR300", "-X", "35000000"] in ex.commands
+    assert f"[dry-run] rm {root / 'Tumors' / 'X' / 'SRR100.sra'}" in capsys.readouterr().out
+
+
+def test_status_store_uses_the_snapshot_done_rule(cohort, monkeypatch):
+    db = cohort / "status.sqlite"
+    monkeypatch.setenv("POSEIDON_STATUS_DB", str(db))
+    (cohort / "SRR200_1.fastq.gz").write_bytes((cohort / "SRR100_1.fastq.gz").read_bytes())
+    (cohort / "SRR200_2.fastq.gz").write_bytes(b"")  # conversion died while writing R2
+    core.do_status(cohort, _samples(cohort))
+    snapshot = (cohort / "sample_list.with_status.txt").read_text().splitlines()
+    assert [line.split("\t")[-1].startswith("FASTQ_DONE") for line in snapshot] == [True, False, False]
+
+    store = core.StatusStore(db)
+    try:
+        cols, rows = store.query(core.STATUS_QUERIES["summary"])
+        assert dict(zip(cols, rows[0]))["fastq_done"] == 1
+        _cols, rows = store.query(core.STATUS_QUERIES["sra-no-fastq"])
+        assert [r[3] for r in rows] == ["SRR200"]
+        assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    finally:
+        store.close()
+
+
+def test_status_store_migrates_wal_stores_without_fastq_done(tmp_path):
+    import sqlite3
+
+    db = tmp_path / "old.sqlite"
+    conn = sqlite3.connect(str(db))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE runs (category TEXT NOT NULL, cohort TEXT NOT NULL, sample TEXT NOT NULL,"
+                 " srr TEXT NOT NULL, sra_ok INTEGER NOT NULL, r1_ok INTEGER NOT NULL,"
+                 " r2_ok INTEGER NOT NULL, sra_bytes INTEGER NOT NULL, r1_bytes INTEGER NOT NULL,"
+                 " r2_bytes INTEGER NOT NULL, last_checked REAL NOT NULL,"
+                 " PRIMARY KEY (category, cohort, sample, srr))")
+    conn.execute("INSERT INTO runs VALUES ('', 'X', 'S1', 'SRR1', 0, 1, 1, 0, 10, 10, 0)")
+    conn.commit()
+    conn.close()
+
+    store = core.StatusStore(db)
+    try:
+        assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert store.query("SELECT srr, fastq_done FROM runs")[1] == [("SRR1", 1)]
+    finally:
+        store.close()
@@ -0,0 +1,219 @@
+"""ena_download against a local HTTP stand-in server with Range support."""
+import hashlib
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import ena_download
+
+PART = 64 * 1024
+PAYLOAD = bytes(range(256)) * (PART * 5 // 256 + 3)  # six segments, the last one partial
+
+
+class StandIn:
+    """Serves `files` with single-range GETs.
+
+    faults[start] / garbage[start] = how many more requests for that range get a
+    body cut off mid-segment / a malformed status line (http.client.BadStatusLine).
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.faults = {}
+        self.garbage = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                data = stand_in.files.get(self.path.lstrip("/"))
+                if data is None:
+                    self.send_error(404)
+                    return
+                rng = self.headers.get("Range")
+                if not rng:
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                lo, _, hi = rng.split("=", 1)[1].partition("-")
+                start, end = int(lo), min(int(hi) if hi else len(data) - 1, len(data) - 1)
+                with stand_in.lock:
+                    stand_in.requests.append(start)
+                    short = stand_in.faults.get(start, 0) > 0
+                    if short:
+                        stand_in.faults[start] -= 1
+                    bad = stand_in.garbage.get(start, 0) > 0
+                    if bad:
+                        stand_in.garbage[start] -= 1
+                if bad:
+                    self.wfile.write(b"NOT-HTTP garbage\r\n\r\n")
+                    self.close_connection = True
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.send_header("Content-Length", str(end + 1 - start))
+                self.end_headers()
+                body = data[start:end + 1]
+                if short:
+                    # Drop the connection mid-segment: the client sees IncompleteRead
+                    self.wfile.write(body[:len(body) // 2])
+                    self.wfile.flush()
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/{name}"
+
+    def segment_requests(self):
+        """Segment starts requested so far (the 1-byte probe is ignored)."""
+        return sorted(s for s in self.requests if s)
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    monkeypatch.setattr(ena_download, "PART_BYTES", PART)
+    monkeypatch.setattr(ena_download, "CHUNK", 16 * 1024)
+    monkeypatch.setattr(ena_download, "TIMEOUT", 5)
+    monkeypatch.setattr(ena_download, "WAIT_POLL", 0.2)
+    monkeypatch.setattr(ena_download.time, "sleep", lambda s: None)  # no retry backoff
+    srv = StandIn({"SRR1_1.fastq.gz": PAYLOAD, "SRR1_2.fastq.gz": PAYLOAD[::-1]})
+    srv.thread.start()
+    yield srv
+    srv.server.shutdown()
+    srv.server.server_close()
+
+
+class Source(ena_download.MetadataSource):
+    def __init__(self, files):
+        self.files = files
+
+    def lookup(self, run):
+        return self.files.get(run, [])
+
+
+def _file(srv, name, data, md5=None):
+    return ena_download.FastqFile(srv.url(name), md5 or hashlib.md5(data).hexdigest(), len(data))
+
+
+def _fetch(tmp_path, srv, source, run="SRR1", timeout=30):
+    """fetch_run() in a thread so a hang fails the test instead of blocking it."""
+    out = {}
+    t = threading.Thread(target=lambda: out.setdefault(
+        "state", ena_download.fetch_run(tmp_path, run, source, connections=3)), daemon=True)
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), "fetch_run hung"
+    return out["state"]
+
+
+def test_paired_download_verifies_md5(tmp_path, stand_in):
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD),
+                              _file(stand_in, "SRR1_2.fastq.gz", PAYLOAD[::-1])]})
+    assert _fetch(tmp_path, stand_in, source) == "ok"
+    assert (tmp_path / "SRR1_1.fastq.gz").read_bytes() == PAYLOAD
+    assert (tmp_path / "SRR1_2.fastq.gz").read_bytes() == PAYLOAD[::-1]
+    assert not list(tmp_path.glob("*.part*"))
+
+
+def test_single_end_is_renamed_to_r1(tmp_path, stand_in):
+    stand_in.files["SRR1.fastq.gz"] = PAYLOAD
+    source = Source({"SRR1": [_file(stand_in, "SRR1.fastq.gz", PAYLOAD)]})
+    assert _fetch(tmp_path, stand_in, source) == "ok"
+    assert (tmp_path / "SRR1_1.fastq.gz").read_bytes() == PAYLOAD
+    assert not (tmp_path / "SRR1_2.fastq.gz").exists()
+
+
+def test_mid_segment_disconnect_is_retried(tmp_path, stand_in):
+    stand_in.faults[2 * PART] = 1
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD)]})
+    assert _fetch(tmp_path, stand_in, source) == "ok"
+    assert (tmp_path / "SRR1_1.fastq.gz").read_bytes() == PAYLOAD
+    assert stand_in.segment_requests().count(2 * PART) == 2
+
+
+def test_persistent_disconnect_fails_without_hanging(tmp_path, stand_in):
+    stand_in.faults[3 * PART] = ena_download.SEGMENT_RETRIES
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD)]})
+    assert _fetch(tmp_path, stand_in, source) == "failed"
+    assert not (tmp_path / "SRR1_1.fastq.gz").exists()
+    assert (tmp_path / "SRR1_1.fastq.gz.part").exists()
+
+
+def test_bad_status_line_is_retried(tmp_path, stand_in):
+    stand_in.garbage[PART] = 1
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD)]})
+    assert _fetch(tmp_path, stand_in, source) == "ok"
+    assert (tmp_path / "SRR1_1.fastq.gz").read_bytes() == PAYLOAD
+
+
+def test_persistent_bad_status_line_fails_without_hanging(tmp_path, stand_in):
+    # HTTPException is not an OSError: the segment worker used to die silently
+    stand_in.garbage[4 * PART] = ena_download.SEGMENT_RETRIES
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD)]})
+    assert _fetch(tmp_path, stand_in, source, timeout=15) == "failed"
+    assert not (tmp_path / "SRR1_1.fastq.gz").exists()
+
+
+def test_resume_fetches_only_missing_segments(tmp_path, stand_in):
+    stand_in.faults[3 * PART] = ena_download.SEGMENT_RETRIES
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD)]})
+    assert _fetch(tmp_path, stand_in, source) == "failed"
+    stand_in.requests.clear()
+    assert _fetch(tmp_path, stand_in, source) == "ok"
+    assert stand_in.segment_requests() == [3 * PART]
+    assert (tmp_path / "SRR1_1.fastq.gz").read_bytes() == PAYLOAD
+    assert not (tmp_path / "SRR1_1.fastq.gz.part.json").exists()
+
+
+def test_md5_mismatch_discards_part(tmp_path, stand_in):
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD, md5="0" * 32)]})
+    assert _fetch(tmp_path, stand_in, source) == "failed"
+    assert not list(tmp_path.iterdir())
+
+
+def test_run_without_ena_files_is_absent(tmp_path, stand_in):
+    assert _fetch(tmp_path, stand_in, Source({}), run="SRR9") == "absent"
+
+
+def test_tsv_source(tmp_path, stand_in):
+    tsv = tmp_path / "files.tsv"
+    url = stand_in.url("SRR1_1.fastq.gz")
+    tsv.write_text("run_accession\tfastq_ftp\tfastq_md5\tfastq_bytes\n"
+                   f"SRR1\t{url}\t{hashlib.md5(PAYLOAD).hexdigest().upper()}\t{len(PAYLOAD)}\n")
+    files = ena_download.make_source(f"tsv:{tsv}").lookup("SRR1")
+    assert [(f.url, f.md5, f.size) for f in files] == [(url, hashlib.md5(PAYLOAD).hexdigest(), len(PAYLOAD))]
+
+
+def test_metadata_source_is_abstract():
+    with pytest.raises(TypeError):
+        ena_download.MetadataSource()
+
+
+def test_failed_mate_leaves_no_lone_r1(tmp_path, stand_in):
+    source = Source({"SRR1": [_file(stand_in, "SRR1_1.fastq.gz", PAYLOAD),
+                              _file(stand_in, "SRR1_2.fastq.gz", PAYLOAD[::-1], md5="0" * 32)]})
+    assert _fetch(tmp_path, stand_in, source) == "failed"
+    assert not (tmp_path / "SRR1_1.fastq.gz").exists()
+    assert (tmp_path / "SRR1_1.fastq.gz.part").read_bytes() == PAYLOAD  # verified, kept for next time
+    assert not (tmp_path / "SRR1_2.fastq.gz").exists()
+
+    source.files["SRR1"][1] = _file(stand_in, "SRR1_2.fastq.gz", PAYLOAD[::-1])
+    assert _fetch(tmp_path, stand_in, source) == "ok"
+    assert (tmp_path / "SRR1_1.fastq.gz").read_bytes() == PAYLOAD
+    assert (tmp_path / "SRR1_2.fastq.gz").read_bytes() == PAYLOAD[::-1]
+    assert not list(tmp_path.glob("*.part*"))
@@ -0,0 +1,80 @@
+"""Fake LSF: job arrays, bjobs -o output and -w dependency ordering."""
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import fake_lsf
+from lsf_submit import job_states
+
+
+@pytest.fixture
+def lsf(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    subprocess.run([sys.executable, fake_lsf.__file__, "install", str(bin_dir)],
+                   check=True, capture_output=True)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_LSF_HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("FAKE_LSF_SLOTS", "4")
+    monkeypatch.setenv("FAKE_LSF_DELAY", "0")
+    monkeypatch.setenv("FAKE_LSF_IDLE", "1")  # scheduler exits soon after the test
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    subprocess.run(["bkill", "0"], capture_output=True)
+
+
+def bsub(*args):
+    cp = subprocess.run(["bsub", *args], capture_output=True, text=True)
+    assert cp.returncode == 0, cp.stderr
+    return re.match(r"Job <(\d+)>", cp.stdout).group(1)
+
+
+def bjobs(*ids):
+    cp = subprocess.run(["bjobs", "-a", "-noheader", "-o", "jobid jobindex stat", *ids],
+                        capture_output=True, text=True)
+    return [line.split() for line in cp.stdout.splitlines()]
+
+
+def wait(*ids, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        rows = bjobs(*ids)
+        if rows and not any(stat in fake_lsf.ACTIVE for _id, _idx, stat in rows):
+            return rows
+        time.sleep(0.1)
+    raise AssertionError(f"jobs {ids} still active: {bjobs(*ids)}")
+
+
+def test_job_array_runs_every_index(lsf):
+    jid = bsub("-J", "arr[1-3]", "-o", "logs/%J_%I.out", "echo index $LSB_JOBINDEX")
+    assert wait(jid) == [[jid, str(i), "DONE"] for i in (1, 2, 3)]
+    for i in (1, 2, 3):
+        out = (lsf / "logs" / f"{jid}_{i}.out").read_text()
+        assert f"index {i}" in out and "Successfully completed." in out
+    # lsf_submit reads the same output into per-element states
+    assert job_states([jid]) == {f"{jid}[{i}]": "DONE" for i in (1, 2, 3)}
+
+
+def test_bjobs_output_for_a_single_job_and_a_failed_one(lsf):
+    ok = bsub("-J", "ok", "true")
+    bad = bsub("-J", "bad", "exit 3")
+    wait(ok, bad)
+    assert bjobs(ok, bad) == [[ok, "0", "DONE"], [bad, "0", "EXIT"]]
+    cp = subprocess.run(["bjobs", "-a", "-noheader", "-o", "job_name exit_code", bad],
+                        capture_output=True, text=True)
+    assert cp.stdout.split() == ["bad", "3"]
+    assert job_states([ok, bad, "999999"]) == {ok: "DONE", bad: "EXIT"}
+
+
+def test_ended_dependency_waits_and_unmeetable_done_orphans(lsf):
+    first = bsub("-J", "first", "sleep 0.5; date +%s.%N > first.t; exit 1")
+    after = bsub("-J", "after", "-w", f"ended({first})", "date +%s.%N > after.t")
+    orphan = bsub("-J", "orphan", "-w", f"done({first})", "-ti", "touch orphan.t")
+    rows = {r[0]: r[2] for r in wait(first, after, orphan)}
+    assert rows == {first: "EXIT", after: "DONE", orphan: "EXIT"}
+    assert float(Path("after.t").read_text()) >= float(Path("first.t").read_text())
+    assert not Path("orphan.t").exists()
@@ -0,0 +1,76 @@
+"""Fingerprint cache: unchanged FASTQs are not re-sniffed, changed ones are."""
+import gzip
+import os
+
+import pytest
+
+import core_fastq_workflow as core
+
+RUNS = ("SRR1", "SRR2")
+
+
+def _fastq(path, reads=3):
+    path.write_bytes(gzip.compress("".join(f"@r{i}\nACGT\n+\nIIII\n" for i in range(reads)).encode()))
+
+
+@pytest.fixture
+def cohort(tmp_path, monkeypatch):
+    monkeypatch.setenv("POSEIDON_STATUS_DB", "off")
+    for srr in RUNS:
+        for m in (1, 2):
+            _fastq(tmp_path / f"{srr}_{m}.fastq.gz")
+    (tmp_path / "SRR3.sra").write_bytes(b"SRA stub")
+    (tmp_path / "notes.txt").write_text("not inventoried")
+    (tmp_path / "SRR3_1.fastq.gz").write_bytes(b"")
+    sniffed = []
+    header_ok = core._fastq_header_ok
+
+    def spy(path):
+        sniffed.append(path.name)
+        return header_ok(path)
+
+    monkeypatch.setattr(core, "_fastq_header_ok", spy)
+    return tmp_path, sniffed
+
+
+def _inventory(cancer_dir):
+    """One plan's worth of inventory with a freshly opened cache, as the CLI does."""
+    stats = core.InventoryStats()
+    cache = core.FingerprintCache.open(cancer_dir)
+    try:
+        inv = core.inventory(cancer_dir, list(RUNS) + ["SRR3"], stats, workers=4, cache=cache,
+                             trust_manifest=False)
+    finally:
+        cache.close()
+    return inv, stats
+
+
+def test_cache_hit_skips_the_sniff(cohort):
+    cancer_dir, sniffed = cohort
+    inv, stats = _inventory(cancer_dir)
+    assert (stats.sniffed, stats.cache_hits) == (4, 0)  # the empty SRR3_1 is never opened
+    assert sorted(sniffed) == [f"{s}_{m}.fastq.gz" for s in RUNS for m in (1, 2)]
+
+    sniffed.clear()
+    again, stats = _inventory(cancer_dir)
+    assert (stats.sniffed, stats.cache_hits, sniffed) == (0, 4, [])
+    assert again == inv and all(inv[s].r1_ok and inv[s].r2_ok for s in RUNS)
+
+
+def test_size_or_mtime_change_invalidates_the_entry(cohort):
+    cancer_dir, sniffed = cohort
+    _inventory(cancer_dir)
+    sniffed.clear()
+
+    (cancer_dir / "SRR1_1.fastq.gz").write_bytes(b"truncated")  # new size
+    r2 = cancer_dir / "SRR2_2.fastq.gz"
+    st = r2.stat()
+    os.utime(r2, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # same bytes, touched
+    inv, stats = _inventory(cancer_dir)
+    assert sorted(sniffed) == ["SRR1_1.fastq.gz", "SRR2_2.fastq.gz"]
+    assert (stats.sniffed, stats.cache_hits) == (2, 2)
+    assert not inv["SRR1"].r1_ok and inv["SRR2"].r2_ok
+
+    sniffed.clear()
+    inv, stats = _inventory(cancer_dir)  # the failed sniff is cached too
+    assert (sniffed, stats.cache_hits, inv["SRR1"].r1_ok) == ([], 4, False)
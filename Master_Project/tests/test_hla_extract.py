@@ -0,0 +1,85 @@
+"""Indexed HLA extraction from a small coordinate-sorted BAM."""
+import gzip
+
+import pytest
+
+pysam = pytest.importorskip("pysam")
+
+import hla_extract  # noqa: E402  (needs pysam)
+from hla_manifest import HlaManifest, fastq_path, md5_file  # noqa: E402
+
+GRCH38_CHR6 = 170805979
+MHC = 29_000_000
+
+
+def _read(header, name, read1, ref, pos, mate_ref, mate_pos):
+    a = pysam.AlignedSegment(header)
+    a.query_name = name
+    a.flag = 0x1 | 0x2 | (0x40 if read1 else 0x80)
+    a.reference_id, a.reference_start = ref, pos
+    a.next_reference_id, a.next_reference_start = mate_ref, mate_pos
+    a.mapping_quality = 60
+    a.cigarstring = "10M"
+    a.query_sequence = "ACGTACGTAC"
+    a.query_qualities = pysam.qualitystring_to_array("IIIIIIIIII")
+    return a
+
+
+@pytest.fixture
+def bam_dir(tmp_path):
+    """S1.bam: 'in' pairs inside the MHC, 'far' has its mate on chr1, 'before' has its
+    mate on chr6 ahead of the region, 'out' lies wholly on chr1."""
+    header = pysam.AlignmentHeader.from_dict({
+        "HD": {"VN": "1.6", "SO": "unsorted"},
+        "SQ": [{"SN": "chr1", "LN": 1_000_000}, {"SN": "chr6", "LN": GRCH38_CHR6}]})
+    chr1, chr6 = 0, 1
+    reads = [
+        _read(header, "in", True, chr6, MHC, chr6, MHC + 200),
+        _read(header, "in", False, chr6, MHC + 200, chr6, MHC),
+        _read(header, "far", True, chr6, MHC + 1000, chr1, 500),
+        _read(header, "far", False, chr1, 500, chr6, MHC + 1000),
+        _read(header, "before", True, chr6, 1_000_000, chr6, MHC + 2000),
+        _read(header, "before", False, chr6, MHC + 2000, chr6, 1_000_000),
+        _read(header, "out", True, chr1, 100, chr1, 300),
+        _read(header, "out", False, chr1, 300, chr1, 100),
+    ]
+    unsorted = tmp_path / "unsorted.bam"
+    with pysam.AlignmentFile(str(unsorted), "wb", header=header) as out:
+        for r in reads:
+            out.write(r)
+    d = tmp_path / "bams"
+    d.mkdir()
+    pysam.sort("-o", str(d / "S1.bam"), str(unsorted))
+    return d
+
+
+def _names(path):
+    with gzip.open(path, "rt") as f:
+        return [line[1:].strip() for i, line in enumerate(f) if i % 4 == 0]
+
+
+def test_mhc_fetch_rescues_mates_outside_the_region(bam_dir):
+    pysam.index(str(bam_dir / "S1.bam"))
+    res = hla_extract.extract(bam_dir / "S1.bam", bam_dir / "fastqs")
+    assert res.ok, res.error
+    assert (res.layout, res.pairs, res.rescued, res.dropped) == ("paired", 3, 2, 0)
+    r1, r2 = _names(fastq_path(bam_dir, "S1", 1)), _names(fastq_path(bam_dir, "S1", 2))
+    assert sorted(r1) == ["before", "far", "in"] and r1 == r2  # mates stay in step
+    assert not list((bam_dir / "fastqs").glob("*.tmp"))
+
+
+def test_extraction_reports_to_the_manifest(bam_dir):
+    pysam.index(str(bam_dir / "S1.bam"))
+    hla_extract.extract(bam_dir / "S1.bam", bam_dir / "fastqs")
+    assert (bam_dir / "logs" / "hla_manifest" / "S1.extract.tsv").exists()
+    e = HlaManifest.load(bam_dir).entry("S1")
+    assert (e.state, e.layout, e.records) == ("extracted", "paired", 3)
+    for mate in (1, 2):  # md5 taken while writing matches the committed file
+        assert getattr(e, f"fastq{mate}_md5") == md5_file(fastq_path(bam_dir, "S1", mate))
+
+
+def test_unindexed_bam_fails_without_partial_output(bam_dir):
+    res = hla_extract.extract(bam_dir / "S1.bam", bam_dir / "fastqs")
+    assert not res.ok and "index" in res.error
+    assert list((bam_dir / "fastqs").iterdir()) == []
+    assert HlaManifest.load(bam_dir).entry("S1").state == "extract_failed"
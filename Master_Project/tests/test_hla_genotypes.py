@@ -0,0 +1,78 @@
+"""Project genotype table: incremental updates, newest result per sample, symlinked bams dirs."""
+import os
+
+import pytest
+
+import hla_genotypes as hg
+
+HEADER = "\tA1\tA2\tB1\tB2\tC1\tC2\tReads\tObjective\n"
+
+
+def _result(path, a1="A*01:01", reads=100):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(HEADER + f"0\t{a1}\tA*02:01\tB*07:02\tB*08:01\tC*07:01\tC*07:02\t{reads}\t95.5\n")
+    return path
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.delenv("HLA_GENOTYPES_DB", raising=False)
+    r = tmp_path / "POSEIDON"
+    bams = r / "Tumors" / "OV" / "bams"
+    _result(bams / "processed" / "S1" / "S1_result.tsv")
+    _result(bams / "processed" / "S2" / "2024_01_01" / "S2_result.tsv")
+    return r
+
+
+def _db(root):
+    db = hg.open_db(hg.db_path(root))
+    rows = {r["sample"]: dict(r) for r in hg.genotypes(db)}
+    db.close()
+    return rows
+
+
+def test_second_update_parses_only_changed_files(root):
+    assert hg.update(root)["parsed"] == 2
+    stats = hg.update(root)
+    assert (stats["files"], stats["parsed"], stats["removed"]) == (2, 0, 0)
+
+    s1 = root / "Tumors" / "OV" / "bams" / "processed" / "S1" / "S1_result.tsv"
+    _result(s1, a1="A*03:01", reads=250)
+    (root / "Tumors" / "OV" / "bams" / "processed" / "S2" / "2024_01_01" / "S2_result.tsv").unlink()
+    stats = hg.update(root)
+    assert (stats["files"], stats["parsed"], stats["removed"]) == (1, 1, 1)
+    rows = _db(root)
+    assert list(rows) == ["S1"] and (rows["S1"]["A1"], rows["S1"]["reads"]) == ("A*03:01", 250.0)
+
+
+def test_view_keeps_the_newest_typed_result(root):
+    sample = root / "Tumors" / "OV" / "bams" / "processed" / "S2"
+    newer = _result(sample / "2024_02_01" / "S2_result.tsv", a1="A*11:01")
+    untyped = sample / "2024_03_01" / "S2_result.tsv"
+    untyped.parent.mkdir()
+    untyped.write_text(HEADER + "0\t\t\t\t\t\t\t0\t0\n")
+    t = newer.stat().st_mtime
+    os.utime(newer, (t + 10, t + 10))
+    os.utime(untyped, (t + 20, t + 20))
+    hg.update(root)
+    assert _db(root)["S2"]["source"] == "Tumors/OV/bams/processed/S2/2024_02_01/S2_result.tsv"
+    assert hg.export_legacy(root, root / "Tumors" / "OV" / "bams") == 2
+    assert "S2_1.bed\tHLA-A*11:01," in (root / "Tumors" / "OV" / "bams" / hg.LEGACY_NAME).read_text()
+
+
+def test_symlinked_bams_dirs(root, tmp_path):
+    outside = tmp_path / "archive" / "BR_bams"
+    _result(outside / "processed" / "S3" / "S3_result.tsv")
+    (root / "Tumors" / "BR").mkdir()
+    (root / "Tumors" / "BR" / "bams").symlink_to(outside)
+    inside = root / "store" / "LU_bams1"
+    _result(inside / "processed" / "S4" / "S4_result.tsv")
+    (root / "Tumors" / "LU").mkdir()
+    (root / "Tumors" / "LU" / "bams1").symlink_to(inside)
+
+    assert hg.update(root)["parsed"] == 4
+    rows = _db(root)
+    assert (rows["S3"]["bam_dir"], rows["S3"]["cohort"]) == ("Tumors/BR/bams", "BR")
+    assert (rows["S4"]["bam_dir"], rows["S4"]["cohort"]) == ("store/LU_bams1", "LU")
+    assert hg.update(root, [root / "Tumors" / "BR" / "bams"])["parsed"] == 0
+    assert hg.export_legacy(root, root / "Tumors" / "BR" / "bams") == 1
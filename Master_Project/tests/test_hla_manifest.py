@@ -0,0 +1,130 @@
+"""HLA manifest: fragment folding, refresh against the bams dir, reconcile with LSF."""
+import gzip
+import os
+import stat
+
+import pytest
+
+from hla_manifest import EMPTY_FASTQ_BYTES, HlaManifest, fastq_path, write_fragment
+from lsf_submit import job_states
+
+# What `bjobs -a -noheader -o "jobid jobindex stat"` prints for the submitted jobs
+BJOBS = """#!/bin/sh
+cat <<'OUT'
+101 0 DONE
+102 0 EXIT
+300 1 RUN
+300 2 EXIT
+OUT
+"""
+
+
+@pytest.fixture
+def bam_dir(tmp_path):
+    d = tmp_path / "bams"
+    d.mkdir()
+    for s in ("S1", "S2", "S3", "S4", "S5", "S6"):
+        (d / f"{s}.bam").write_bytes(b"BAM")
+    return d
+
+
+@pytest.fixture
+def bjobs(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    p = bin_dir / "bjobs"
+    p.write_text(BJOBS)
+    p.chmod(p.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def _fastqs(bam_dir, sample, mates=(1, 2), reads=20, age=0):
+    for mate in mates:
+        p = fastq_path(bam_dir, sample, mate)
+        p.parent.mkdir(exist_ok=True)
+        p.write_bytes(gzip.compress(b"".join(b"@r%d\nACGT\n+\nIIII\n" % i for i in range(reads))))
+        if age:
+            t = p.stat().st_mtime - age
+            os.utime(p, (t, t))
+
+
+def _submitted(bam_dir):
+    """S1/S2 extraction jobs 101/102, S3/S4 OptiType array 300[1]/[2], S5 extracted with
+    a DAG-held OptiType job 300[3] LSF no longer reports, S6 OptiType job 400 gone."""
+    m = HlaManifest.load(bam_dir)
+    m.refresh()
+    m.mark(["S1"], "extract_submitted", extract_job="101")
+    m.mark(["S2"], "extract_submitted", extract_job="102")
+    m.mark(["S3"], "optitype_submitted", optitype_job="300[1]")
+    m.mark(["S4"], "optitype_submitted", optitype_job="300[2]")
+    m.mark(["S5"], "extracted", optitype_job="300[3]")
+    m.mark(["S6"], "optitype_submitted", optitype_job="400")
+    m.save()
+    return m
+
+
+def test_fragments_fold_in_and_are_removed(bam_dir):
+    m = _submitted(bam_dir)
+    write_fragment(bam_dir, "extract", "S1", state="extracted", layout="paired", records="20")
+    frag = bam_dir / "logs" / "hla_manifest" / "S1.extract.tsv"
+
+    e = HlaManifest.load(bam_dir, persist=False).entry("S1")
+    assert (e.state, e.layout, e.records, e.extract_job) == ("extracted", "paired", 20, "101")
+    assert frag.exists() and HlaManifest.load(bam_dir, persist=False).path.read_text() == m.path.read_text()
+
+    assert HlaManifest.load(bam_dir).entry("S1").state == "extracted"
+    assert not frag.exists()
+    assert HlaManifest.load(bam_dir).entry("S1").records == 20  # persisted in the manifest
+
+
+def test_reconcile_requeues_jobs_that_ended_without_reporting(bam_dir, bjobs):
+    m = _submitted(bam_dir)
+    states = job_states(m.job_ids())
+    assert states == {"101": "DONE", "102": "EXIT", "300[1]": "RUN", "300[2]": "EXIT"}
+
+    # S1's job finished and reported back after this manifest was loaded
+    write_fragment(bam_dir, "extract", "S1", state="extracted")
+    lost = m.reconcile(states)
+    assert lost == ["S2", "S4", "S5", "S6"]
+    assert {s: e.state for s, e in m.entries.items()} == {
+        "S1": "extract_submitted", "S2": "extract_failed", "S3": "optitype_submitted",
+        "S4": "optitype_failed", "S5": "extracted", "S6": "optitype_failed"}
+    assert m.entries["S5"].optitype_job == ""
+    assert m.needs_extract() == ["S2"] and m.needs_optitype() == ["S4", "S5", "S6"]
+    assert HlaManifest.load(bam_dir).entry("S1").state == "extracted"
+
+
+def test_reconcile_without_bjobs_keeps_in_flight_unless_forced(bam_dir):
+    m = _submitted(bam_dir)
+    assert m.reconcile(None) == []
+    assert m.in_flight() == ["S1", "S2", "S3", "S4", "S5", "S6"]
+    assert m.reconcile(None, force=True) == ["S1", "S2", "S3", "S4", "S5", "S6"]
+    assert m.in_flight() == []
+
+
+def test_refresh_follows_the_directory(bam_dir):
+    _fastqs(bam_dir, "S1", age=3600)  # extracted before the BAM was copied in: adopted
+    _fastqs(bam_dir, "S2", mates=(1,))
+    fastq_path(bam_dir, "S3", 1).write_bytes(gzip.compress(b""))
+    assert fastq_path(bam_dir, "S3", 1).stat().st_size <= EMPTY_FASTQ_BYTES
+    result = bam_dir / "processed" / "S4" / "S4_result.tsv"
+    result.parent.mkdir(parents=True)
+    result.write_text("A1\tA2\n")
+
+    m = HlaManifest.load(bam_dir)
+    counts = m.refresh()
+    states = {s: (e.state, e.layout) for s, e in m.entries.items()}
+    assert states == {"S1": ("extracted", "paired"), "S2": ("extracted", "single"),
+                      "S3": ("empty_extract", "empty"), "S4": ("typed", ""),
+                      "S5": ("new", ""), "S6": ("new", "")}
+    assert (counts["extracted"], counts["new"]) == (2, 2)
+    assert m.entries["S4"].result == "processed/S4/S4_result.tsv"
+
+    # A replaced BAM (new fingerprint) starts over; its old FASTQs predate it
+    (bam_dir / "S1.bam").write_bytes(b"BAM v2")
+    (bam_dir / "S6.bam").unlink()
+    m = HlaManifest.load(bam_dir)
+    m.refresh()
+    assert m.entries["S1"].state == "new" and m.entries["S1"].fastq1_md5  # hashed, but too old
+    assert "S6" not in m.entries
+    assert HlaManifest.load(bam_dir).entry("S2").state == "extracted"
@@ -0,0 +1,61 @@
+"""Inventory fast path: one directory scan, parallel sniffs."""
+import gzip
+
+import pytest
+
+import core_fastq_workflow as core
+
+RUNS = ("SRR1", "SRR2")
+
+
+def _fastq(path, reads=3):
+    path.write_bytes(gzip.compress("".join(f"@r{i}\nACGT\n+\nIIII\n" for i in range(reads)).encode()))
+
+
+@pytest.fixture
+def cohort(tmp_path, monkeypatch):
+    monkeypatch.setenv("POSEIDON_STATUS_DB", "off")
+    for srr in RUNS:
+        for m in (1, 2):
+            _fastq(tmp_path / f"{srr}_{m}.fastq.gz")
+    (tmp_path / "SRR3.sra").write_bytes(b"SRA stub")
+    (tmp_path / "notes.txt").write_text("not inventoried")
+    (tmp_path / "SRR3_1.fastq.gz").write_bytes(b"")
+    sniffed = []
+    header_ok = core._fastq_header_ok
+
+    def spy(path):
+        sniffed.append(path.name)
+        return header_ok(path)
+
+    monkeypatch.setattr(core, "_fastq_header_ok", spy)
+    return tmp_path, sniffed
+
+
+def test_scan_dir_lists_only_inventory_files(cohort):
+    cancer_dir, _ = cohort
+    stats = core.InventoryStats()
+    listing = core._scan_dir(cancer_dir, stats)
+    assert sorted(listing) == ["SRR1_1.fastq.gz", "SRR1_2.fastq.gz", "SRR2_1.fastq.gz",
+                               "SRR2_2.fastq.gz", "SRR3.sra", "SRR3_1.fastq.gz"]
+    assert stats.statted == 6 and listing["SRR3.sra"].st_size == 8
+
+
+def test_sniff_many_matches_serial_sniffs(cohort):
+    cancer_dir, _ = cohort
+    (cancer_dir / "SRR2_2.fastq.gz").write_bytes(b"not gzip")
+    paths = sorted(cancer_dir.glob("SRR[12]_*.fastq.gz"))
+    assert core._sniff_many(paths, 4) == core._sniff_many(paths, 1) == {
+        p: p.name != "SRR2_2.fastq.gz" for p in paths}
+    assert core._sniff_many([], 4) == {}
+
+
+def test_inventory_sniffs_each_nonempty_fastq_once(cohort):
+    cancer_dir, sniffed = cohort
+    stats = core.InventoryStats()
+    inv = core.inventory(cancer_dir, ["SRR1", "SRR2", "SRR3", "SRR1"], stats, workers=4,
+                         trust_manifest=False)
+    assert sorted(sniffed) == [f"{s}_{m}.fastq.gz" for s in RUNS for m in (1, 2)]
+    assert (stats.statted, stats.sniffed) == (6, 4)
+    assert all(inv[s].r1_ok and inv[s].r2_ok for s in RUNS)
+    assert (inv["SRR3"].sra_bytes, inv["SRR3"].r1_ok, inv["SRR3"].r1_bytes) == (8, False, 0)
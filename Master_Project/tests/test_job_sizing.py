@@ -0,0 +1,84 @@
+"""Conversion job sizing: size tiers, learned history, TERM_MEMLIMIT feedback."""
+import pytest
+
+import core_fastq_workflow as core
+
+GB = 10 ** 9
+
+
+def _report(outcome, max_mem="5000 MB", run_s=1800):
+    """Tail of an LSF -o file as LSF writes it."""
+    return ("Sender: LSF System <lsfadmin@node1>\n"
+            "Subject: Job 42: <fastq_SRR1> in cluster <c> Exited\n\n"
+            "------------------------------------------------------------\n"
+            "# LSBATCH: User input\nfasterq-dump SRR1\n"
+            "------------------------------------------------------------\n\n"
+            f"{outcome}\n\nResource usage summary:\n\n"
+            "    CPU time :                                   3000.00 sec.\n"
+            f"    Max Memory :                                 {max_mem}\n"
+            f"    Run time :                                   {run_s} sec.\n\n"
+            "The output (if any) follows:\n\n")
+
+
+@pytest.fixture
+def cancer_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("FQD_THREADS", raising=False)
+    monkeypatch.delenv("FQD_TIERS", raising=False)
+    monkeypatch.setattr(core, "FQD_SIZE_JOBS", True)
+    core.set_executor(core.LSFExecutor())
+    (tmp_path / "logs").mkdir()
+    return tmp_path
+
+
+@pytest.mark.parametrize("sra_bytes, expected", [
+    (GB // 2, (2, 4000, 120)),
+    (3 * GB, (4, 8000, 240)),
+    (15 * GB, (8, 16000, 480)),
+    (500 * GB, (16, 64000, 2880)),
+])
+def test_tier_is_picked_by_sra_size(sra_bytes, expected, cancer_dir):
+    res = core.ResourceHistory().size(sra_bytes)
+    assert (res.threads, res.mem_mb, res.walltime_min, res.basis) == expected + ("tier",)
+
+
+def test_tiers_can_come_from_a_tsv(cancer_dir, monkeypatch):
+    tiers = cancer_dir / "tiers.tsv"
+    tiers.write_text("max_gb\tthreads\tmem_mb\twalltime_min\n50\t6\t12000\t600\n2\t1\t2000\t60\n")
+    monkeypatch.setenv("FQD_TIERS", str(tiers))
+    assert [t.max_gb for t in core.load_size_tiers()] == [2.0, 50.0]
+    res = core.ResourceHistory().size(3 * GB)
+    assert (res.threads, res.mem_mb, res.walltime_min) == (6, 12000, 600)
+
+
+def test_successful_jobs_tune_memory_and_walltime(cancer_dir):
+    ok = core.JobObservation("SRR9", 2 * GB, 4, 8000, 240, max_mem_mb=3000, run_s=1200, outcome="ok")
+    res = core.ResourceHistory([ok]).size(4 * GB)
+    # 1.25 x 3000 + 512 rounded up to a GB; 1.5 x 600 s/GB x 4 GB + 15 min
+    assert (res.mem_mb, res.walltime_min, res.basis) == (5000, 75, "learned (1)")
+    # Observations from another tier do not count
+    assert core.ResourceHistory([ok]).size(10 * GB).basis == "tier"
+
+
+def test_memlimit_exit_raises_the_next_request(cancer_dir):
+    (cancer_dir / "logs" / "fastq_SRR1.out.txt").write_text(
+        _report("TERM_MEMLIMIT: job killed after reaching LSF memory usage limit.\n"
+                "Exited with exit code 130.", max_mem="8.1 GB"))
+    entry = core.JournalEntry("SRR1", "42", 0.0, state="EXIT", sra_bytes=3 * GB,
+                              threads=4, mem_mb=8000, walltime_min=240)
+    assert core.ResourceHistory.harvest(cancer_dir, [entry]) == 1
+
+    history = core.ResourceHistory.load([cancer_dir])
+    [obs] = history.observations
+    assert (obs.srr, obs.outcome, obs.req_mem_mb, obs.max_mem_mb) == ("SRR1", "memlimit", 8000, 8294)
+    res = core.size_conversion(cancer_dir, "SRR2", sra_bytes=3 * GB)
+    assert (res.mem_mb, res.basis) == (16000, "learned (0+kill)")
+    assert res.lsf_args()[:4] == ["-M", "16000", "-R", "rusage[mem=16000] span[hosts=1]"]
+
+
+def test_parse_lsf_summary(cancer_dir):
+    assert core.parse_lsf_summary("spots read: 10\n") is None  # still running: no report yet
+    assert core.parse_lsf_summary(_report("Successfully completed.")) == {
+        "outcome": "ok", "max_mem_mb": 5000.0, "run_s": 1800.0, "cpu_s": 3000.0}
+    runlimit = core.parse_lsf_summary(_report("TERM_RUNLIMIT: job killed after reaching LSF run time limit.\n"
+                                              "Exited with exit code 140."))
+    assert runlimit["outcome"] == "runlimit"
@@ -0,0 +1,113 @@
+"""LSF report parsing and the incremental accounting harvest."""
+import sqlite3
+
+import pytest
+
+import lsf_accounting as acct
+
+# As LSF writes it with -o (the echoed command mentions things the parser must not trust)
+MEMLIMIT = """Sender: LSF System <lsfadmin@bmi-r740-07>
+Subject: Job 8812345[3]: <fastq_SRR1> in cluster <bmi_cluster> Exited
+
+Job <fastq_SRR1> was submitted from host <bmiclusterp2> by user <someone> in cluster <bmi_cluster> at Tue Mar  5 10:01:02 2024
+Job was executed on host(s) <8*bmi-r740-07>, in queue <normal>, as user <someone> in cluster <bmi_cluster> at Tue Mar  5 10:02:00 2024
+</users/someone> was used as the home directory.
+</data/Tumors/OV> was used as the working directory.
+Started at Tue Mar  5 10:02:00 2024
+Terminated at Tue Mar  5 11:02:30 2024
+Results reported at Tue Mar  5 11:02:30 2024
+
+Your job looked like:
+
+------------------------------------------------------------
+# LSBATCH: User input
+echo "Successfully completed. TERM_RUNLIMIT"; fasterq-dump SRR1
+------------------------------------------------------------
+
+TERM_MEMLIMIT: job killed after reaching LSF memory usage limit.
+Exited with exit code 130.
+
+Resource usage summary:
+
+    CPU time :                                   7012.50 sec.
+    Max Memory :                                 15.6 GB
+    Average Memory :                             9000.00 MB
+    Total Requested Memory :                     16000.00 MB
+    Delta Memory :                               -
+    Max Swap :                                   -
+    Max Processes :                              5
+    Max Threads :                                21
+    Run time :                                   3630 sec.
+    Turnaround time :                            3688 sec.
+
+The output (if any) follows:
+
+spots read: 1000
+"""
+
+DONE = """Sender: LSF System <lsfadmin@bmi-r740-08>
+Subject: Job 8812399: <fastq_SRR1> in cluster <bmi_cluster> Done
+
+Job was executed on host(s) <bmi-r740-08>, in queue <normal>, as user <someone> in cluster <bmi_cluster> at Tue Mar  5 12:00:00 2024
+Started at Tue Mar  5 12:00:00 2024
+Terminated at Tue Mar  5 12:40:00 2024
+------------------------------------------------------------
+# LSBATCH: User input
+fasterq-dump SRR1
+------------------------------------------------------------
+
+Successfully completed.
+
+Resource usage summary:
+
+    CPU time :                                   4000.00 sec.
+    Max Memory :                                 20480 MB
+    Total Requested Memory :                     32000.00 MB
+    Run time :                                   2400 sec.
+    Turnaround time :                            2410 sec.
+
+The output (if any) follows:
+
+Exited with exit code 1.  <- job output, not LSF
+"""
+
+
+def test_parse_report_reads_an_lsf_summary_block():
+    rec = acct.parse_report(MEMLIMIT.split(acct.OUTPUT_MARK)[0])
+    assert (rec.job_id, rec.job_index, rec.job_name) == (8812345, 3, "fastq_SRR1")
+    assert (rec.outcome, rec.exit_code, rec.term, rec.slots) == ("memlimit", 130, "TERM_MEMLIMIT", 8)
+    assert rec.max_mem_mb == pytest.approx(15.6 * 1024)
+    assert (rec.req_mem_mb, rec.cpu_s, rec.run_s, rec.turnaround_s) == (16000.0, 7012.5, 3630.0, 3688.0)
+    assert rec.finished_at - rec.started_at == 3630
+    assert acct.parse_report("Sender: LSF System\nSubject: Job 1: <x> in cluster <c>\n") is None
+
+
+def test_last_report_takes_the_newest_run_and_ignores_job_output():
+    rec = acct.last_report(MEMLIMIT + DONE)
+    assert (rec.job_id, rec.job_index, rec.outcome, rec.exit_code) == (8812399, 0, "ok", 0)
+    assert (rec.slots, rec.max_mem_mb, rec.run_s) == (1, 20480.0, 2400.0)
+
+
+def test_harvest_is_incremental(tmp_path, monkeypatch):
+    monkeypatch.delenv("LSF_ACCOUNTING_DB", raising=False)
+    logs = tmp_path / "Tumors" / "OV" / "logs"
+    logs.mkdir(parents=True)
+    (logs / "fastq_SRR1.out.txt").write_text(MEMLIMIT)
+    (logs / "fastq_SRR2.out.txt").write_text(DONE)
+    (tmp_path / "Tumors" / "OV" / "fastqs").mkdir()
+
+    assert acct.harvest(tmp_path, jobs=1) == {
+        "files": 2, "parsed": 2, "reports": 2, "unchanged": 0, "errors": 0}
+    assert acct.harvest(tmp_path, jobs=1) == {
+        "files": 2, "parsed": 0, "reports": 0, "unchanged": 2, "errors": 0}
+
+    with (logs / "fastq_SRR1.out.txt").open("a") as f:  # the resubmitted job appends (-o)
+        f.write(DONE)
+    stats = acct.harvest(tmp_path, jobs=1)
+    assert (stats["parsed"], stats["reports"], stats["unchanged"]) == (1, 2, 1)
+
+    db = sqlite3.connect(str(tmp_path / acct.DB_NAME))
+    rows = db.execute("SELECT cohort, job_type, sample, outcome FROM jobs ORDER BY sample, seq").fetchall()
+    db.close()
+    assert rows == [("Tumors/OV", "fastq", "SRR1", "memlimit"), ("Tumors/OV", "fastq", "SRR1", "ok"),
+                    ("Tumors/OV", "fastq", "SRR2", "ok")]
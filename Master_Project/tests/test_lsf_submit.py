@@ -0,0 +1,44 @@
+"""lsf_submit array bookkeeping against a stub bsub."""
+import os
+import stat
+
+import pytest
+
+import lsf_submit
+
+BSUB = """#!/bin/sh
+n=$(cat "$0.n" 2>/dev/null || echo 100); echo $((n + 1)) > "$0.n"
+echo "Job <$((n + 1))> is submitted to default queue <normal>."
+"""
+
+
+@pytest.fixture
+def bsub(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    p = bin_dir / "bsub"
+    p.write_text(BSUB)
+    p.chmod(p.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return p
+
+
+def _tasks(prefix, n):
+    return [lsf_submit.Task(key=f"{prefix}{i}", command=f"echo {prefix}{i}",
+                            out=f"logs/{prefix}{i}.out", err=f"logs/{prefix}{i}.err") for i in range(n)]
+
+
+def test_same_name_same_second_gets_separate_arrays(tmp_path, bsub, monkeypatch):
+    monkeypatch.setattr(lsf_submit.time, "time", lambda: 1700000000.0)
+    small = lsf_submit.submit_array("fastq_X_n4", _tasks("a", 2), lsf_submit.Resources(4, mem_mb=8000),
+                                    tmp_path)
+    big = lsf_submit.submit_array("fastq_X_n4", _tasks("b", 3), lsf_submit.Resources(4, mem_mb=64000),
+                                  tmp_path)
+    assert small == {"a0": "101[1]", "a1": "101[2]"}
+    assert big == {"b0": "102[1]", "b1": "102[2]", "b2": "102[3]"}
+    logs = tmp_path / "logs"
+    stems = sorted(p.stem for p in (logs / "arrays").glob("*.tsv"))
+    assert len(stems) == 2 and stems[1] == stems[0] + "_1"
+    assert lsf_submit.array_tasks(logs, stems[0]) == {"1": "a0", "2": "a1"}
+    assert lsf_submit.array_tasks(logs, stems[1]) == {"1": "b0", "2": "b1", "3": "b2"}
+    assert (logs / "arrays" / stems[0] / "2.sh").read_text() == "echo a1"
@@ -0,0 +1,84 @@
+"""Prefetch queue: retry with backoff, the retry cap, resuming an interrupted queue."""
+import json
+import stat
+
+import pytest
+
+import core_fastq_workflow as core
+
+# Fails the first $STUB_DIR/<SRR>.fail attempts, then writes <SRR>/<SRR>.sra like prefetch;
+# every attempt's time goes to $STUB_DIR/<SRR>.times
+PREFETCH = """#!/bin/sh
+echo "$(date +%s.%N)" >> "$STUB_DIR/$1.times"
+n=$(wc -l < "$STUB_DIR/$1.times")
+[ "$n" -le "$(cat "$STUB_DIR/$1.fail" 2>/dev/null || echo 0)" ] && exit 1
+mkdir -p "$1" && printf 'SRA stub' > "$1/$1.sra"
+"""
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    stub_dir = tmp_path / "stub"
+    stub_dir.mkdir()
+    p = stub_dir / "prefetch"
+    p.write_text(PREFETCH)
+    p.chmod(p.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setattr(core, "PREFETCH_BIN", str(p))
+    monkeypatch.setenv("STUB_DIR", str(stub_dir))
+    core.set_executor(core.LSFExecutor())
+    cancer_dir = tmp_path / "cohort"
+    cancer_dir.mkdir()
+
+    def fail(srr, times):
+        (stub_dir / f"{srr}.fail").write_text(str(times))
+
+    def attempts(srr):
+        path = stub_dir / f"{srr}.times"
+        return [float(t) for t in path.read_text().split()] if path.exists() else []
+
+    return cancer_dir, fail, attempts
+
+
+def _queue(cancer_dir):
+    path = cancer_dir / "logs" / core.PREFETCH_QUEUE
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def test_transient_failure_is_retried_with_backoff(stub):
+    cancer_dir, fail, attempts = stub
+    fail("SRR1", 2)
+    ok, failed = core.run_prefetch_queue(cancer_dir, ["SRR1", "SRR2"], concurrency=2,
+                                         retries=3, backoff=0.2)
+    assert (ok, failed) == (2, 0)
+    assert (cancer_dir / "SRR1.sra").exists() and not (cancer_dir / "SRR1").exists()
+    times = attempts("SRR1")
+    assert len(times) == 3 and len(attempts("SRR2")) == 1
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert gaps[0] >= 0.2 and gaps[1] >= 0.4  # backoff doubles per attempt
+    assert _queue(cancer_dir) == {}
+
+
+def test_retry_cap_marks_the_run_failed(stub):
+    cancer_dir, fail, attempts = stub
+    fail("SRR1", 99)
+    ok, failed = core.run_prefetch_queue(cancer_dir, ["SRR1"], retries=2, backoff=0.01)
+    assert (ok, failed) == (0, 1)
+    assert len(attempts("SRR1")) == 3  # first try + 2 retries
+    entry = _queue(cancer_dir)["SRR1"]
+    assert (entry["state"], entry["attempts"]) == ("failed", 3)
+    assert not (cancer_dir / "SRR1.sra").exists()
+
+
+def test_interrupted_queue_is_resumed(stub):
+    cancer_dir, _fail, attempts = stub
+    # What a Ctrl-C / crash leaves behind: SRR1 finished and was dropped, SRR2/SRR3 pending
+    (cancer_dir / "logs").mkdir()
+    (cancer_dir / "logs" / core.PREFETCH_QUEUE).write_text(json.dumps({
+        "SRR2": {"state": "pending", "attempts": 0, "error": ""},
+        "SRR3": {"state": "pending", "attempts": 1, "error": ""},
+        "SRR9": {"state": "failed", "attempts": 4, "error": "sra download failed (attempt 4)"}}))
+    ok, failed = core.run_prefetch_queue(cancer_dir, ["SRR4"], backoff=0.01)
+    assert (ok, failed) == (3, 0)
+    assert sorted(p.name for p in cancer_dir.glob("*.sra")) == ["SRR2.sra", "SRR3.sra", "SRR4.sra"]
+    assert attempts("SRR9") == []  # failed runs wait until a plan asks for them again
+    assert list(_queue(cancer_dir)) == ["SRR9"]
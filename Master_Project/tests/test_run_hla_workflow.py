@@ -0,0 +1,107 @@
+"""HLA workflow submission: extractor choice, the extract -> OptiType -> aggregate DAG."""
+import gzip
+import importlib.util
+import itertools
+
+import pytest
+
+import run_hla_workflow as hla
+
+
+@pytest.fixture
+def bams(tmp_path, monkeypatch):
+    monkeypatch.setattr(hla, "HLA_EXTRACTOR", "indexed")
+    d = tmp_path / "Tumor" / "bams"
+    d.mkdir(parents=True)
+    paths = []
+    for s in ("S1", "S2"):
+        (d / f"{s}.bam").write_bytes(b"BAM")
+        paths.append(str(d / f"{s}.bam"))
+    return d, paths
+
+
+def _pysam(monkeypatch, importable):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec",
+                        lambda name, *a: (object() if importable else None) if name == "pysam"
+                        else find_spec(name, *a))
+
+
+def test_indexed_extractor_when_pysam_and_indexes_exist(bams, monkeypatch):
+    d, paths = bams
+    _pysam(monkeypatch, True)
+    (d / "S1.bam.bai").write_bytes(b"")
+    (d / "S2.bai").write_bytes(b"")  # picard naming
+    tasks, res, groups = hla._extraction_batch(str(d), paths)
+    assert [t.key for t in tasks] == ["hla001"] and groups == {"hla001": ["S1", "S2"]}
+    assert hla.HLA_EXTRACT_SCRIPT in tasks[0].command
+
+
+def test_missing_index_falls_back_to_hla_py(bams, monkeypatch, capsys):
+    d, paths = bams
+    _pysam(monkeypatch, True)
+    (d / "S1.bam.bai").write_bytes(b"")
+    tasks, _res, groups = hla._extraction_batch(str(d), paths)
+    assert groups == {"S1": ["S1"], "S2": ["S2"]}
+    assert all("hla.py --i" in t.command for t in tasks)
+    assert "1 BAMs have no .bai/.csi index (e.g. S2.bam)" in capsys.readouterr().out
+
+
+def test_missing_pysam_falls_back_to_hla_py(bams, monkeypatch, capsys):
+    d, paths = bams
+    _pysam(monkeypatch, False)
+    for p in paths:
+        open(p + ".bai", "wb").close()
+    tasks, _res, _groups = hla._extraction_batch(str(d), paths)
+    assert [t.key for t in tasks] == ["S1", "S2"]
+    assert "pysam not importable" in capsys.readouterr().out
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """submit_tasks stand-in: every call is one LSF array <id>[1..n]; records (name, extra, keys)."""
+    calls, ids = [], itertools.count(500)
+
+    def submit(tasks, res, cwd, name, mode=None):
+        calls.append((name, list(res.extra), [t.key for t in tasks]))
+        jid = next(ids)
+        if len(tasks) == 1 and tasks[0].key == "aggregate":
+            return {"aggregate": str(jid)}
+        return {t.key: f"{jid}[{i}]" for i, t in enumerate(tasks, 1)}
+
+    monkeypatch.setattr(hla, "submit_tasks", submit)
+    monkeypatch.setattr(hla, "job_states", lambda ids: {})
+    return calls
+
+
+def test_dag_holds_optitype_on_its_extraction_and_aggregate_on_all(tmp_path, monkeypatch, recorded):
+    monkeypatch.setattr(hla, "HLA_EXTRACTOR", "indexed")
+    monkeypatch.setattr(hla, "HLA_BAMS_PER_JOB", 2)
+    _pysam(monkeypatch, True)
+    d = tmp_path / "root" / "Tumors" / "OV" / "bams"
+    (d / "fastqs").mkdir(parents=True)
+    for s in ("S1", "S2", "S3", "S4"):
+        (d / f"{s}.bam").write_bytes(b"BAM")
+        (d / f"{s}.bam.bai").write_bytes(b"")
+    for m in (1, 2):  # S4 is already extracted
+        (d / "fastqs" / f"S4_{m}.fastq.gz").write_bytes(
+            gzip.compress(b"".join(b"@r%d\nACGT\n+\nIIII\n" % i for i in range(20))))
+
+    assert hla.submit_hla_dag(str(d))
+    shell = ["-L", "/bin/bash"]
+    assert [(name, extra) for name, extra, _keys in recorded] == [
+        ("OptiType_OV_bams", shell),
+        ("chr6_OV_bams", shell),
+        ("OptiType_OV_bams_hla001", shell + ["-w", "ended(501[1])", "-ti"]),
+        ("OptiType_OV_bams_hla002", shell + ["-w", "ended(501[2])", "-ti"]),
+        ("aggregate_OV_bams", shell + ["-w", "ended(500) && ended(502) && ended(503)"]),
+    ]
+    assert [keys for _name, _extra, keys in recorded[:4]] == [
+        ["S4"], ["hla001", "hla002"], ["S1", "S2"], ["S3"]]
+
+    m = hla.HlaManifest.load(d)
+    assert {s: (e.state, e.extract_job, e.optitype_job) for s, e in m.entries.items()} == {
+        "S1": ("extract_submitted", "501[1]", "502[1]"),
+        "S2": ("extract_submitted", "501[1]", "502[2]"),
+        "S3": ("extract_submitted", "501[2]", "503[1]"),
+        "S4": ("optitype_submitted", "", "500[1]")}
@@ -0,0 +1,67 @@
+"""Deep FASTQ verification and how its failures feed back into the plan."""
+import gzip
+
+import pytest
+
+import core_fastq_workflow as core
+
+
+def _fastq_bytes(srr, m, n):
+    return gzip.compress("".join(f"@{srr}.{m}.{i}\nACGT\n+\nIIII\n" for i in range(n)).encode())
+
+
+@pytest.fixture
+def cohort(tmp_path, monkeypatch):
+    """SRR1 good pair; SRR2 R1/R2 disagree; SRR3 R1 gzip cut short. SRR2/3 still have .sra."""
+    monkeypatch.setenv("POSEIDON_STATUS_DB", "off")
+    core.set_executor(core.DryRunExecutor())
+    d = tmp_path / "cohort"
+    d.mkdir()
+    for m in (1, 2):
+        (d / f"SRR1_{m}.fastq.gz").write_bytes(_fastq_bytes("SRR1", m, 50))
+    (d / "SRR2_1.fastq.gz").write_bytes(_fastq_bytes("SRR2", 1, 50))
+    (d / "SRR2_2.fastq.gz").write_bytes(_fastq_bytes("SRR2", 2, 49))
+    good = _fastq_bytes("SRR3", 1, 2000)
+    (d / "SRR3_1.fastq.gz").write_bytes(good[:len(good) * 2 // 3])
+    (d / "SRR3_2.fastq.gz").write_bytes(_fastq_bytes("SRR3", 2, 2000))
+    for srr in ("SRR2", "SRR3"):
+        (d / f"{srr}.sra").write_bytes(b"SRA stub")
+    (d / "sample_list.txt").write_text(
+        "".join(f"S{i}\tSRR{i}_1.fastq.gz\tSRR{i}_2.fastq.gz\n" for i in (1, 2, 3)))
+    yield d
+    core.set_executor(core.LSFExecutor())
+
+
+def test_truncated_gzip_fails_verify_but_passes_the_sniff(cohort):
+    path = cohort / "SRR3_1.fastq.gz"
+    assert core._fastq_header_ok(path)
+    res = core._verify_fastq(path)
+    assert not res.ok and res.error
+    ok = core._verify_fastq(cohort / "SRR1_1.fastq.gz")
+    assert (ok.ok, ok.records) == (True, 50)
+
+
+def test_record_count_mismatch_fails_the_pair(cohort):
+    found = {srr: (None, cohort / f"{srr}_1.fastq.gz", cohort / f"{srr}_2.fastq.gz")
+             for srr in ("SRR1", "SRR2")}
+    verified = {p.name: core._verify_fastq(p) for _s, r1, r2 in found.values() for p in (r1, r2)}
+    assert core.verify_failures(found, verified) == {
+        "SRR2": "R1/R2 record count mismatch (50 vs 49)"}
+
+
+def test_failed_verify_sends_runs_back_to_conversion(cohort):
+    samples = core.parse_sample_list(cohort / "sample_list.txt")
+    inv = core._inventory_samples(cohort, samples)
+    assert core.plan_actions(inv) == []  # header sniffs alone find nothing wrong
+
+    assert core.do_verify(cohort, samples, jobs=1) == 2
+    inv = core._inventory_samples(cohort, samples)
+    actions = core.plan_actions(inv)
+    assert sorted((a.kind, a.srr, a.detail) for a in actions) == [
+        ("convert", "SRR2", "fastq-dump, verify failed"),
+        ("convert", "SRR3", "fastq-dump, verify failed")]
+
+    # Re-converted files get a new fingerprint, so the old verdict no longer applies
+    (cohort / "SRR2_2.fastq.gz").write_bytes(_fastq_bytes("SRR2", 2, 50))
+    inv = core._inventory_samples(cohort, samples)
+    assert [a.srr for a in core.plan_actions(inv)] == ["SRR3"]
@@ -0,0 +1,94 @@
+"""HLA audit stages and gap resubmission (recorded, never sent to LSF)."""
+import gzip
+import itertools
+
+import pytest
+
+import run_hla_workflow as hla
+import verify_hla_counts as vhc
+from hla_manifest import HlaManifest
+
+STAGES = {
+    "E1": ("no_extract", "new"),
+    "E2": ("no_extract", "extract_submitted"),       # job 900 still running
+    "M1": ("empty_extract", "empty_extract"),
+    "O1": ("no_optitype", "extracted"),
+    "O2": ("no_optitype", "optitype_submitted"),     # job 901 still running
+    "F1": ("failed_optitype", "extracted"),          # processed/F1 but no result
+    "N1": ("not_aggregated", "typed"),
+    "A1": ("aggregated", "typed"),
+}
+
+
+def _fastq(path, reads):
+    path.write_bytes(gzip.compress(b"".join(b"@r%d\nACGT\n+\nIIII\n" % i for i in range(reads))))
+
+
+@pytest.fixture
+def bam_dir(tmp_path):
+    d = tmp_path / "Tumors" / "OV" / "bams"
+    (d / "fastqs").mkdir(parents=True)
+    for sample in STAGES:
+        (d / f"{sample}.bam").write_bytes(b"BAM")
+    for sample in ("O1", "O2", "F1", "N1", "A1"):
+        for m in (1, 2):
+            _fastq(d / "fastqs" / f"{sample}_{m}.fastq.gz", 20)
+    _fastq(d / "fastqs" / "M1_1.fastq.gz", 0)
+    for sample in ("O2", "F1", "N1", "A1"):
+        (d / "processed" / sample).mkdir(parents=True)
+    for sample in ("N1", "A1"):
+        (d / "processed" / sample / f"{sample}_result.tsv").write_text("\tA1\nx\tA*01:01\n")
+    (d / "aggregated_hla_genotypes.txt").write_text("sample\thla\nA1_1.bed\tHLA-A*01:01\n")
+    m = HlaManifest.load(d)
+    m.refresh()
+    m.mark(["E2"], "extract_submitted", extract_job="900")
+    m.mark(["O2"], "optitype_submitted", optitype_job="901")
+    m.save()
+    return d
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Submissions and aggregations as (what, [keys]); bjobs says every job is still running."""
+    calls, ids = [], itertools.count(1000)
+
+    def submit(tasks, res, cwd, name, mode=None):
+        calls.append((name, sorted(t.key for t in tasks)))
+        jid = next(ids)
+        return {t.key: f"{jid}[{i}]" for i, t in enumerate(tasks, 1)}
+
+    monkeypatch.setattr(hla, "HLA_EXTRACTOR", "hla.py")  # one task per BAM: keys are samples
+    monkeypatch.setattr(hla, "submit_tasks", submit)
+    monkeypatch.setattr(hla, "job_states", lambda ids: {i: "RUN" for i in ids})
+    monkeypatch.setattr(hla, "aggregate_results", lambda d: calls.append(("aggregate", [])) or True)
+    return calls
+
+
+def test_audit_dir_reports_the_stage_each_sample_stopped_at(bam_dir):
+    assert vhc.audit_dir(str(bam_dir)) == [(s, *STAGES[s]) for s in sorted(STAGES)]
+
+
+def test_resubmit_skips_live_jobs_and_empty_extracts(bam_dir, recorded):
+    rows = [r for r in vhc.audit_dir(str(bam_dir)) if r[1] != "aggregated"]
+    vhc.resubmit_gaps(str(bam_dir), rows)
+    assert recorded == [("chr6_OV_bams", ["E1"]), ("OptiType_OV_bams", ["F1", "O1"]),
+                        ("aggregate", [])]
+
+
+def test_force_and_include_empty_widen_the_selection(bam_dir, recorded):
+    rows = [r for r in vhc.audit_dir(str(bam_dir)) if r[1] != "aggregated"]
+    vhc.resubmit_gaps(str(bam_dir), rows, include_empty=True, force=True)
+    assert recorded == [("chr6_OV_bams", ["E1", "E2", "M1"]), ("OptiType_OV_bams", ["F1", "O1", "O2"]),
+                        ("aggregate", [])]
+    states = {s: e.state for s, e in HlaManifest.load(bam_dir).entries.items()}
+    assert [s for s in sorted(states) if states[s] == "extract_submitted"] == ["E1", "E2", "M1"]
+
+
+def test_audit_writes_the_gap_list(bam_dir, tmp_path, capsys):
+    gaps = tmp_path / "gaps.tsv"
+    vhc.audit(str(tmp_path / "Tumors"), jobs=2, gaps_file=str(gaps))
+    lines = gaps.read_text().splitlines()
+    assert lines[0] == "bam_dir\tsample\tstage\tmanifest_state"
+    assert sorted(lines[1:]) == sorted(f"OV/bams\t{s}\t{stage}\t{state}"
+                                       for s, (stage, state) in STAGES.items() if s != "A1")
+    assert "8 BAMs in 1 directories audited" in capsys.readouterr().out
@@ -1,8 +1,22 @@
 #!/usr/bin/env python3
-"""Verify aggregated_hla_genotypes.txt sample counts match BAM file counts."""
+"""Verify aggregated_hla_genotypes.txt sample counts match BAM file counts.
 
+--audit: one parallel scan of BAMs, extracted FASTQs, OptiType outputs and
+aggregated rows across Tumors/*/bams*, with the stage every sample stopped at
+(no_extract / empty_extract / no_optitype / failed_optitype / not_aggregated /
+aggregated). --gaps writes the per-sample gap list; --resubmit sends just those
+samples back to extraction / OptiType / aggregation, skipping samples whose
+job is still queued or running in LSF unless --force is given.
+"""
+
+import argparse
 import os
 import glob
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from hla_manifest import EMPTY_FASTQ_BYTES, MANIFEST_NAME, HlaManifest
 
 TUMORS_DIR = "/data/salomonis-archive/FASTQs/NCI-R01/POSEIDON/Tumors"
 
@@ -18,16 +32,23 @@ def count_aggregated_samples(agg_file):
         lines = [l for l in f if l.strip() and not l.startswith("#")]
         return len(lines) - 1 if lines else 0
 
-def main():
-    print(f"{'Directory':<30} {'BAMs':<8} {'Aggregated':<12} {'Status'}")
-    print("=" * 70)
+def manifest_summary(bam_dir):
+    """Stage counts from hla_manifest.tsv (read-only), e.g. 'typed 210, extracted 3'."""
+    if not os.path.exists(os.path.join(bam_dir, MANIFEST_NAME)):
+        return "-"
+    counts = HlaManifest.load(Path(bam_dir), persist=False).counts()
+    return ", ".join(f"{k} {v}" for k, v in counts.items() if v and k != "typed") or "all typed"
+
+def count_report(tumors_dir=TUMORS_DIR):
+    print(f"{'Directory':<30} {'BAMs':<8} {'Aggregated':<12} {'Status':<16} {'Manifest'}")
+    print("=" * 90)
     
     total_bams = 0
     total_aggregated = 0
     perfect_match = 0
     
     # Find all bams/bams1 directories
-    for root, dirs, _ in os.walk(TUMORS_DIR):
+    for root, dirs, _ in os.walk(tumors_dir):
         for d in dirs:
             if d in ["bams", "bams1"]:
                 bam_dir = os.path.join(root, d)
@@ -45,12 +66,151 @@ def main():
                 if bam_count == agg_count:
                     perfect_match += 1
                 
-                print(f"{dir_name:<30} {bam_count:<8} {agg_count:<12} {status}")
+                print(f"{dir_name:<30} {bam_count:<8} {agg_count:<12} {status:<16} "
+                      f"{manifest_summary(bam_dir)}")
     
-    print("=" * 70)
+    print("=" * 90)
     print(f"{'TOTAL':<30} {total_bams:<8} {total_aggregated:<12} "
           f"{perfect_match} perfect matches")
     print(f"\nSuccess rate: {total_aggregated}/{total_bams} ({100*total_aggregated/total_bams:.1f}%)")
 
+STAGES = ["no_extract", "empty_extract", "no_optitype", "failed_optitype", "not_aggregated", "aggregated"]
+
+def _names(directory, suffix):
+    """{file name minus suffix: DirEntry} from one scandir ({} if the directory is missing)."""
+    try:
+        with os.scandir(directory) as it:
+            return {e.name[:-len(suffix)]: e for e in it if e.name.endswith(suffix)}
+    except OSError:
+        return {}
+
+def _optitype_output(sample_dir):
+    """(processed/<sample> exists, it holds a *_result.tsv at sample or timestamp level)."""
+    try:
+        with os.scandir(sample_dir) as it:
+            entries = list(it)
+    except OSError:
+        return False, False
+    if any(e.name.endswith("_result.tsv") for e in entries):
+        return True, True
+    for e in entries:
+        if e.is_dir() and any(n.endswith("_result.tsv") for n in os.listdir(e.path)):
+            return True, True
+    return True, False
+
+def _aggregated_samples(agg_file):
+    """Sample names in aggregated_hla_genotypes.txt ('<sample>_1.bed' labels)."""
+    if not os.path.exists(agg_file):
+        return set()
+    with open(agg_file) as f:
+        labels = [l.split("\t", 1)[0] for l in f if l.strip() and not l.startswith(("#", "sample\t"))]
+    return {l[:-len("_1.bed")] if l.endswith("_1.bed") else l for l in labels}
+
+def audit_dir(bam_dir):
+    """[(sample, stage, manifest state)] for every BAM in one bams dir."""
+    bams = _names(bam_dir, ".bam")
+    fastqs = _names(os.path.join(bam_dir, "fastqs"), "_1.fastq.gz")
+    aggregated = _aggregated_samples(os.path.join(bam_dir, "aggregated_hla_genotypes.txt"))
+    manifest = (HlaManifest.load(Path(bam_dir), persist=False)
+                if os.path.exists(os.path.join(bam_dir, MANIFEST_NAME)) else None)
+    rows = []
+    for sample in sorted(bams):
+        entry = manifest.entries.get(sample) if manifest else None
+        state = entry.state if entry else ""
+        fq = fastqs.get(sample)
+        if fq is None:
+            stage = "no_extract"
+        elif fq.stat().st_size <= EMPTY_FASTQ_BYTES:
+            stage = "empty_extract"
+        else:
+            started, typed = _optitype_output(os.path.join(bam_dir, "processed", sample))
+            if typed:
+                stage = "aggregated" if sample in aggregated else "not_aggregated"
+            elif (started and state != "optitype_submitted") or state == "optitype_failed":
+                stage = "failed_optitype"  # processed/<sample> is created at submission
+            else:
+                stage = "no_optitype"
+        rows.append((sample, stage, state))
+    return rows
+
+def resubmit_gaps(bam_dir, rows, include_empty=False, force=False):
+    """Send only the gap samples of one bams dir back to the stage they stopped at.
+
+    Samples in extract_submitted / optitype_submitted show up as no_extract /
+    no_optitype; the submit functions drop those whose job is still live in LSF
+    (force=True resubmits them anyway).
+    """
+    from run_hla_workflow import aggregate_results, submit_chr6_extraction, submit_optitype_jobs
+
+    extract = [s for s, stage, _ in rows
+               if stage == "no_extract" or (include_empty and stage == "empty_extract")]
+    optitype = [s for s, stage, _ in rows if stage in ("no_optitype", "failed_optitype")]
+    if extract:
+        submit_chr6_extraction(bam_dir, samples=extract, force=force)
+    if optitype:
+        submit_optitype_jobs(bam_dir, samples=optitype, force=force)
+    if any(stage == "not_aggregated" for _, stage, _ in rows):
+        aggregate_results(bam_dir)
+
+def audit(tumors_dir, jobs=32, gaps_file=None, resubmit=False, include_empty=False, force=False):
+    t0 = time.monotonic()
+    bam_dirs = sorted(p for p in glob.glob(os.path.join(tumors_dir, "*", "bams*")) if os.path.isdir(p))
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(audit_dir, bam_dirs))
+
+    short = {"no_extract": "no_ext", "empty_extract": "empty", "no_optitype": "no_opti",
+             "failed_optitype": "failed", "not_aggregated": "not_agg", "aggregated": "agg"}
+    print(f"{'Directory':<30} {'BAMs':>6} " + " ".join(f"{short[s]:>8}" for s in STAGES))
+    print("=" * (38 + 9 * len(STAGES)))
+    totals = {s: 0 for s in STAGES}
+    gaps = []
+    for bam_dir, rows in zip(bam_dirs, results):
+        name = os.path.relpath(bam_dir, tumors_dir)
+        counts = {s: 0 for s in STAGES}
+        for sample, stage, state in rows:
+            counts[stage] += 1
+            if stage != "aggregated":
+                gaps.append((name, sample, stage, state))
+        for s in STAGES:
+            totals[s] += counts[s]
+        print(f"{name:<30} {len(rows):>6} " + " ".join(f"{counts[s]:>8}" for s in STAGES))
+    print("=" * (38 + 9 * len(STAGES)))
+    print(f"{'TOTAL':<30} {sum(totals.values()):>6} " + " ".join(f"{totals[s]:>8}" for s in STAGES))
+    print(f"\n— {sum(totals.values())} BAMs in {len(bam_dirs)} directories audited "
+          f"in {time.monotonic() - t0:.1f}s; {len(gaps)} gaps")
+
+    if gaps_file:
+        with open(gaps_file, "w") as f:
+            f.write("bam_dir\tsample\tstage\tmanifest_state\n")
+            for row in gaps:
+                f.write("\t".join(row) + "\n")
+        print(f"✓ {gaps_file}")
+    if resubmit:
+        for bam_dir, rows in zip(bam_dirs, results):
+            gap_rows = [r for r in rows if r[1] != "aggregated"]
+            if gap_rows:
+                print(f"\n{os.path.relpath(bam_dir, tumors_dir)}")
+                resubmit_gaps(bam_dir, gap_rows, include_empty, force)
+
+def main():
+    ap = argparse.ArgumentParser(description="Check HLA genotyping completeness across Tumors/")
+    ap.add_argument("--tumors", default=TUMORS_DIR, help="Tumors directory (default: %(default)s)")
+    ap.add_argument("--audit", action="store_true", help="Per-sample stage audit instead of counts")
+    ap.add_argument("--jobs", type=int, default=32, help="Directories scanned in parallel")
+    ap.add_argument("--gaps", help="Write non-aggregated samples (bam_dir, sample, stage) to this TSV")
+    ap.add_argument("--resubmit", action="store_true",
+                    help="Submit extraction / OptiType / aggregation for just the gap samples")
+    ap.add_argument("--include-empty", action="store_true",
+                    help="With --resubmit, also re-extract samples whose extraction was empty")
+    ap.add_argument("--force", action="store_true",
+                    help="With --resubmit, also resubmit samples whose LSF job is still queued or running")
+    args = ap.parse_args()
+    if args.force and not args.resubmit:
+        ap.error("--force only applies to --resubmit")
+    if args.audit or args.gaps or args.resubmit:
+        audit(args.tumors, args.jobs, args.gaps, args.resubmit, args.include_empty, args.force)
+    else:
+        count_report(args.tumors)
+
 if __name__ == "__main__":
     main()
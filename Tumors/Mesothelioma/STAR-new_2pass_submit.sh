@@ -1,7 +1,7 @@
 #!/bin/bash
 # ================================================================
 # STAR 2-pass alignment LSF submission script
-# Submits one job per sample from a sample list file
+# Submits one job array (one element per sample) from a sample list file
 # Each job runs run_star-new.sh with appropriate FASTQ files.
 # ================================================================
 
@@ -10,6 +10,7 @@ mkdir -p bams logs
 
 # Paths
 ROOT=$PWD
+POSEIDON=${POSEIDON:-/data/salomonis-archive/FASTQs/NCI-R01/POSEIDON}
 SAMPLE_LIST=${ROOT}/Sample_list-all.txt
 
 # ----------------------------------------------------------------
@@ -23,13 +24,17 @@ SAMPLE_LIST=${ROOT}/Sample_list-all.txt
 # Adjust -W or memory values if your cluster has tighter limits.
 # ----------------------------------------------------------------
 
-while read SAMPLE FASTQ1 FASTQ2; do
-    bsub -W 12:00 -n 2 -M 128000 \
-         -R "rusage[mem=16000] span[hosts=1]" \
-         -J "align_${SAMPLE}" \
-         -o logs/STAR2pass_${SAMPLE}.out \
-         -e logs/STAR2pass_${SAMPLE}.err \
-         "$ROOT/run_star-new.sh $SAMPLE $FASTQ1 $FASTQ2"
-done < ${SAMPLE_LIST}
+# One LSF job array for the whole list: element i runs the i-th sample of SAMPLE_LIST
+# (index -> sample map in logs/arrays/). LSF_ARRAY_LIMIT=K caps running
+# elements; LSF_SUBMIT_MODE=single restores one bsub per sample.
+# Elements share the array's job name, so `bjobs -J align_<sample>` finds nothing
+# in array mode; LSF_SUBMIT_MODE=pack keeps one align_<sample> job per sample.
+python3 "${POSEIDON}/Master_Project/lsf_submit.py" "${LSF_SUBMIT_MODE:-array}" \
+    --name "align_$(basename "$ROOT")" --list "${SAMPLE_LIST}" --shell "bash -c" \
+    --job-name 'align_{0}' \
+    --out 'logs/STAR2pass_{0}.out' \
+    --err 'logs/STAR2pass_{0}.err' \
+    --cmd "$ROOT/run_star-new.sh {0} {1} {2}" \
+    -- -W 12:00 -n 2 -M 128000 -R "rusage[mem=16000] span[hosts=1]"
 
 # End of script